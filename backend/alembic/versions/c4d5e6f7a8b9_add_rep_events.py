@@ -0,0 +1,40 @@
+"""add_rep_events
+
+Revision ID: c4d5e6f7a8b9
+Revises: b7c8d9e0f1a2
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = 'c4d5e6f7a8b9'
+down_revision: Union[str, Sequence[str], None] = 'b7c8d9e0f1a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('rep_events',
+        sa.Column('event_id', sa.Integer(), primary_key=True),
+        sa.Column('session_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('workout_sessions.session_id')),
+        sa.Column('exercise_type', sa.String(50), nullable=False),
+        sa.Column('rep_index', sa.Integer(), nullable=False),
+        sa.Column('is_valid', sa.Boolean(), nullable=False),
+        sa.Column('start_time', sa.Float()),
+        sa.Column('end_time', sa.Float()),
+        sa.Column('min_angle', sa.Float()),
+        sa.Column('max_angle', sa.Float()),
+        sa.Column('concentric_seconds', sa.Float()),
+        sa.Column('eccentric_seconds', sa.Float()),
+        sa.Column('feedback', sa.Text()),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()')),
+    )
+    op.create_index('ix_rep_events_event_id', 'rep_events', ['event_id'])
+    op.create_index('ix_rep_events_session_id', 'rep_events', ['session_id'])
+
+
+def downgrade() -> None:
+    op.drop_table('rep_events')
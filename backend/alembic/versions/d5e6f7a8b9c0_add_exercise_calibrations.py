@@ -0,0 +1,36 @@
+"""add_exercise_calibrations
+
+Revision ID: d5e6f7a8b9c0
+Revises: c4d5e6f7a8b9
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = 'd5e6f7a8b9c0'
+down_revision: Union[str, Sequence[str], None] = 'c4d5e6f7a8b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('exercise_calibrations',
+        sa.Column('calibration_id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('users.user_id'), nullable=False),
+        sa.Column('exercise_type', sa.String(50), nullable=False),
+        sa.Column('thresholds', sa.Text(), nullable=False),
+        sa.Column('range_min', sa.Float()),
+        sa.Column('range_max', sa.Float()),
+        sa.Column('sample_count', sa.Integer()),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()')),
+    )
+    op.create_index('ix_exercise_calibrations_calibration_id', 'exercise_calibrations', ['calibration_id'])
+    op.create_index('ix_exercise_calibrations_user_id', 'exercise_calibrations', ['user_id'])
+    op.create_unique_constraint('uq_calibration_user_exercise', 'exercise_calibrations', ['user_id', 'exercise_type'])
+
+
+def downgrade() -> None:
+    op.drop_table('exercise_calibrations')
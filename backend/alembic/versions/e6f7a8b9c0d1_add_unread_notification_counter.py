@@ -0,0 +1,28 @@
+"""add_unread_notification_counter
+
+Revision ID: e6f7a8b9c0d1
+Revises: d5e6f7a8b9c0
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = 'e6f7a8b9c0d1'
+down_revision: Union[str, Sequence[str], None] = 'd5e6f7a8b9c0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('unread_notifications', sa.Integer(), server_default='0', nullable=False))
+    op.execute(
+        "UPDATE users SET unread_notifications = ("
+        "SELECT count(*) FROM notifications "
+        "WHERE notifications.user_id = users.user_id AND notifications.is_read = false)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'unread_notifications')
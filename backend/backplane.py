@@ -0,0 +1,166 @@
+"""
+Cross-worker delivery of live-coaching broadcasts.
+
+Each uvicorn worker only holds its own WebSocket connections, so a patient
+and the doctor watching them are often connected to different workers.
+`ConnectionManager.broadcast_to_session` therefore publishes every message
+once to a backplane, and the backplane hands it to every subscribed manager
+(one per worker, including the publisher's), which sends it to its local
+sockets.
+
+    WS_BACKPLANE=memory    (default) subscribers of this process only; one worker, tests
+    WS_BACKPLANE=postgres  LISTEN/NOTIFY on WS_BACKPLANE_URL (default DATABASE_URL);
+                           needs a direct connection, not a transaction-mode pooler
+"""
+import asyncio
+import logging
+import os
+import threading
+from typing import Callable, List, Optional
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger(__name__)
+
+# deliver(session_id, text): send an already serialized message to local sockets
+Deliver = Callable[[str, str], None]
+
+# NOTIFY payloads must stay below 8000 bytes
+MAX_NOTIFY_BYTES = 7900
+
+
+class Backplane:
+    def __init__(self):
+        self._subscribers: List[Deliver] = []
+
+    def subscribe(self, deliver: Deliver) -> None:
+        self._subscribers.append(deliver)
+
+    def _deliver(self, session_id: str, text: str) -> None:
+        for deliver in self._subscribers:
+            deliver(session_id, text)
+
+    async def publish(self, session_id: str, text: str) -> None:
+        raise NotImplementedError
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+
+class InMemoryBackplane(Backplane):
+    async def publish(self, session_id: str, text: str) -> None:
+        self._deliver(session_id, text)
+
+
+class PostgresBackplane(Backplane):
+    """
+    One LISTEN connection per worker, read from the event loop with
+    add_reader; publishing runs `pg_notify` on a second connection in a
+    thread. The payload is "<session_id>\\n<message>".
+    """
+
+    def __init__(self, url: str, channel: str = "live_coaching", reconnect_delay: float = 2.0):
+        super().__init__()
+        # psycopg2 takes a libpq URL, not SQLAlchemy's "postgresql+driver://"
+        self.dsn = make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self._listener = None
+        self._publisher = None
+        self._publish_lock = threading.Lock()
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _connect(self):
+        import psycopg2
+        conn = psycopg2.connect(self.dsn)
+        conn.autocommit = True
+        return conn
+
+    def _listen(self):
+        conn = self._connect()
+        with conn.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.channel}"')
+        return conn
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._listener = await asyncio.to_thread(self._listen)
+        self._loop.add_reader(self._listener.fileno(), self._on_readable)
+
+    def _on_readable(self) -> None:
+        try:
+            self._listener.poll()
+        except Exception as e:
+            logger.warning("Backplane listener lost, reconnecting: %s", e)
+            self._drop_listener()
+            self._reconnect_task = self._loop.create_task(self._reconnect())
+            return
+        notifies = self._listener.notifies
+        while notifies:
+            session_id, _, text = notifies.pop(0).payload.partition("\n")
+            self._deliver(session_id, text)
+
+    def _drop_listener(self) -> None:
+        if self._listener is None:
+            return
+        try:
+            self._loop.remove_reader(self._listener.fileno())
+            self._listener.close()
+        except Exception:
+            pass
+        self._listener = None
+
+    async def _reconnect(self) -> None:
+        # Messages published while disconnected are lost; live updates are transient
+        while self._listener is None:
+            await asyncio.sleep(self.reconnect_delay)
+            try:
+                await self.start()
+            except Exception as e:
+                logger.error("Backplane reconnect failed: %s", e)
+
+    def _notify(self, payload: str) -> None:
+        with self._publish_lock:
+            for attempt in range(2):
+                try:
+                    if self._publisher is None or self._publisher.closed:
+                        self._publisher = self._connect()
+                    with self._publisher.cursor() as cursor:
+                        cursor.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+                    return
+                except Exception:
+                    # A dropped connection gets one fresh retry
+                    self._publisher = None
+                    if attempt:
+                        raise
+
+    async def publish(self, session_id: str, text: str) -> None:
+        payload = f"{session_id}\n{text}"
+        if len(payload.encode("utf-8")) > MAX_NOTIFY_BYTES:
+            logger.warning(f"Broadcast for session {session_id} too large for NOTIFY, delivering locally")
+            self._deliver(session_id, text)
+            return
+        await asyncio.to_thread(self._notify, payload)
+
+    async def stop(self) -> None:
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        self._drop_listener()
+        with self._publish_lock:
+            if self._publisher is not None:
+                self._publisher.close()
+                self._publisher = None
+
+
+def make_backplane() -> Backplane:
+    kind = os.getenv("WS_BACKPLANE", "memory").lower()
+    if kind == "postgres":
+        url = os.getenv("WS_BACKPLANE_URL") or os.getenv("DATABASE_URL")
+        if url and url.startswith("postgres"):
+            return PostgresBackplane(url)
+        logger.error("WS_BACKPLANE=postgres needs a PostgreSQL URL, using in-memory broadcast")
+    return InMemoryBackplane()
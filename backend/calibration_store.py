@@ -0,0 +1,64 @@
+"""
+Stored per-patient threshold profiles (see logic/calibration.py).
+
+Profiles are read once per workout session start, through a small TTL cache
+keyed by patient, and loaded into the session's strategies; the per-frame
+path never touches the database.
+"""
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Tuple
+from uuid import UUID
+from sqlalchemy.orm import Session
+from models import ExerciseCalibration
+
+Profiles = Dict[str, Dict[str, float]]
+
+
+def save_calibration(db: Session, user_id: UUID, exercise_type: str, result: Dict[str, Any]) -> ExerciseCalibration:
+    """Insert or replace the patient's profile for one exercise (commits)."""
+    row = db.query(ExerciseCalibration).filter(
+        ExerciseCalibration.user_id == user_id,
+        ExerciseCalibration.exercise_type == exercise_type
+    ).first()
+    if row is None:
+        row = ExerciseCalibration(user_id=user_id, exercise_type=exercise_type)
+        db.add(row)
+    row.thresholds = json.dumps(result["thresholds"])
+    row.range_min = result["range_min"]
+    row.range_max = result["range_max"]
+    row.sample_count = result["sample_count"]
+    db.commit()
+    db.refresh(row)
+    return row
+
+
+class CalibrationCache:
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self._profiles: Dict[UUID, Tuple[float, Profiles]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, user_id: UUID) -> Profiles:
+        """Thresholds by exercise for one patient; empty when never calibrated."""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._profiles.get(user_id)
+        if cached is not None and now - cached[0] < self.ttl:
+            return cached[1]
+        rows = db.query(ExerciseCalibration.exercise_type, ExerciseCalibration.thresholds).filter(
+            ExerciseCalibration.user_id == user_id
+        ).all()
+        profiles = {exercise_type: json.loads(thresholds) for exercise_type, thresholds in rows}
+        with self._lock:
+            self._profiles[user_id] = (now, profiles)
+        return profiles
+
+    def invalidate(self, user_id: UUID) -> None:
+        with self._lock:
+            self._profiles.pop(user_id, None)
+
+
+CALIBRATION_CACHE = CalibrationCache(ttl=float(os.getenv("CALIBRATION_CACHE_SECONDS", "300")))
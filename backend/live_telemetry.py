@@ -0,0 +1,142 @@
+"""
+Fixed-rate live-session snapshots for observing doctors.
+
+The patient's client sends a live update whenever its rep count, state or
+feedback changes. Instead of relaying each one, the worker holding the
+patient's socket folds them into one `SessionTelemetry` per session and a
+ticker publishes at most `rate_hz` snapshots per session per second (only
+for sessions that changed, plus a keepalive so late joiners catch up):
+
+    {"type": "snapshot", "session_id": ..., "data": {"exercise", "reps",
+     "state", "feedback", "tempo_s", "age_s"}}
+
+Observers therefore receive traffic proportional to the sessions they
+watch, not to the patients' frame rate.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Rep timestamps kept for the tempo estimate
+TEMPO_WINDOW = 6
+
+
+class SessionTelemetry:
+    __slots__ = ('exercise', 'reps', 'state', 'feedback', 'rep_marks', 'updated_at', 'published_at')
+
+    def __init__(self):
+        self.exercise: Optional[str] = None
+        self.reps = 0
+        self.state: Optional[str] = None
+        self.feedback: Optional[str] = None
+        # (monotonic time, rep count) at each observed increase
+        self.rep_marks: deque = deque(maxlen=TEMPO_WINDOW)
+        self.updated_at = time.monotonic()
+        self.published_at = 0.0
+
+    def update(self, message: Dict[str, Any], now: float) -> None:
+        exercise = message.get("exercise")
+        if exercise is not None and exercise != self.exercise:
+            self.exercise = str(exercise)
+            self.reps = 0
+            self.state = None
+            self.rep_marks.clear()
+        reps = message.get("reps")
+        if isinstance(reps, int) and not isinstance(reps, bool):
+            if reps > self.reps:
+                self.rep_marks.append((now, reps))
+            self.reps = reps
+        if "state" in message:
+            self.state = message["state"]
+        feedback = message.get("feedback")
+        if feedback:
+            self.feedback = str(feedback)[:200]
+        self.updated_at = now
+
+    def tempo(self) -> Optional[float]:
+        """Mean seconds per rep over the recent reps; None until two reps were seen."""
+        if len(self.rep_marks) < 2:
+            return None
+        (t0, r0), (t1, r1) = self.rep_marks[0], self.rep_marks[-1]
+        return round((t1 - t0) / (r1 - r0), 2)
+
+    def snapshot(self, now: float) -> Dict[str, Any]:
+        return {
+            "exercise": self.exercise,
+            "reps": self.reps,
+            "state": self.state,
+            "feedback": self.feedback,
+            "tempo_s": self.tempo(),
+            "age_s": round(now - self.updated_at, 1),
+        }
+
+
+class TelemetryAggregator:
+    def __init__(self, publish: Callable[[str, Dict[str, Any]], Awaitable[None]],
+                 rate_hz: float = float(os.getenv("LIVE_SNAPSHOT_HZ", "2")),
+                 keepalive: float = float(os.getenv("LIVE_SNAPSHOT_KEEPALIVE_SECONDS", "5"))):
+        # publish(session_id, message), e.g. ConnectionManager.broadcast_to_session
+        self.publish = publish
+        self.interval = 1.0 / rate_hz
+        self.keepalive = keepalive
+        self.sessions: Dict[str, SessionTelemetry] = {}
+        self._dirty: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, session_id: str, message: Dict[str, Any]) -> None:
+        """Fold one live update into the session's state; published on the next tick."""
+        telemetry = self.sessions.get(session_id)
+        if telemetry is None:
+            telemetry = self.sessions[session_id] = SessionTelemetry()
+        telemetry.update(message, time.monotonic())
+        self._dirty.add(session_id)
+
+    def snapshot(self, session_id: str) -> Optional[Dict[str, Any]]:
+        telemetry = self.sessions.get(session_id)
+        return telemetry.snapshot(time.monotonic()) if telemetry is not None else None
+
+    async def end(self, session_id: str) -> None:
+        """The patient left; observers get a final notice."""
+        self._dirty.discard(session_id)
+        if self.sessions.pop(session_id, None) is not None:
+            await self.publish(session_id, {"type": "session_ended", "session_id": session_id})
+
+    async def flush(self) -> int:
+        """Publish changed sessions, and unchanged ones due a keepalive; returns how many."""
+        now = time.monotonic()
+        due = [
+            session_id for session_id, telemetry in self.sessions.items()
+            if session_id in self._dirty or now - telemetry.published_at >= self.keepalive
+        ]
+        self._dirty.clear()
+        for session_id in due:
+            telemetry = self.sessions.get(session_id)
+            if telemetry is None:
+                continue
+            telemetry.published_at = now
+            await self.publish(session_id, {
+                "type": "snapshot", "session_id": session_id, "data": telemetry.snapshot(now),
+            })
+        return len(due)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Live snapshot publish failed: %s", e)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
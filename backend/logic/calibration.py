@@ -0,0 +1,45 @@
+"""
+Per-patient threshold calibration.
+
+While calibrating, a strategy collects its primary angle (the one its
+RepTracker follows) over a few comfortable reps. The patient's range is the
+5th..95th percentile of those samples, and every threshold the strategy
+declares in `CALIBRATION` as (fraction, op) is placed at
+`low + fraction * (high - low)`:
+
+    op '<'  the angle must drop below the threshold (e.g. curl up, squat
+            depth); calibration may only raise it
+    op '>'  the angle must exceed the threshold (e.g. arm raised, standing
+            straight); calibration may only lower it
+
+so a calibrated profile is never stricter than the defaults.
+"""
+from typing import Dict, List, Tuple
+import numpy as np
+
+MIN_SAMPLES = 30
+MIN_RANGE_DEG = 20.0
+MAX_SAMPLES = 5000
+
+
+class CalibrationError(ValueError):
+    pass
+
+
+def patient_range(samples: List[float]) -> Tuple[float, float]:
+    if len(samples) < MIN_SAMPLES:
+        raise CalibrationError(f"Not enough frames recorded ({len(samples)} of {MIN_SAMPLES})")
+    low, high = np.percentile(samples, [5, 95]).tolist()
+    if high - low < MIN_RANGE_DEG:
+        raise CalibrationError(f"Range of motion too small to calibrate ({high - low:.0f} degrees)")
+    return low, high
+
+
+def derive_thresholds(low: float, high: float, rules: Dict[str, Tuple[float, str]],
+                      defaults: Dict[str, float]) -> Dict[str, float]:
+    thresholds = {}
+    for name, (fraction, op) in rules.items():
+        value = low + fraction * (high - low)
+        loosest = max if op == '<' else min
+        thresholds[name] = round(loosest(defaults[name], value), 1)
+    return thresholds
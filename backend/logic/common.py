@@ -1,3 +1,6 @@
+from typing import Iterator, Sequence, Union
+import numpy as np
+
 class SquatState:
     IDLE = 0
     SQUAT_START = 1
@@ -30,8 +33,67 @@ class FeedbackPriority:
     HIGH = 3
 
 class Landmark:
+    __slots__ = ('x', 'y', 'z', 'visibility')
+
     def __init__(self, x: float, y: float, z: float = 0, visibility: float = 0):
         self.x = x
         self.y = y
         self.z = z
         self.visibility = visibility
+
+
+class LandmarkView:
+    """Read-only landmark backed by one row of a LandmarkFrame; nothing is copied."""
+    __slots__ = ('_values', '_base')
+
+    def __init__(self, values: memoryview, base: int):
+        self._values = values
+        self._base = base
+
+    @property
+    def x(self) -> float: return self._values[self._base]
+    @property
+    def y(self) -> float: return self._values[self._base + 1]
+    @property
+    def z(self) -> float: return self._values[self._base + 2]
+    @property
+    def visibility(self) -> float: return self._values[self._base + 3]
+
+
+class LandmarkFrame(Sequence):
+    """
+    One frame of landmarks stored as a single contiguous (N, 4) float64 array
+    of x, y, z, visibility. Indexing yields LandmarkView objects, so the
+    strategies keep their `landmarks[23].x` access while the angle kernel
+    reads `array` directly.
+    """
+    __slots__ = ('array', '_values', 'angle_cache')
+
+    def __init__(self, array):
+        array = np.ascontiguousarray(array, dtype=np.float64)
+        self.array = array if array.ndim == 2 else array.reshape(-1, 4)
+        self._values = memoryview(self.array).cast('B').cast('d')
+        # Angle features already computed for this frame (see kernel.frame_angles)
+        self.angle_cache = {}
+
+    @classmethod
+    def from_values(cls, values) -> "LandmarkFrame":
+        """Build a frame from an iterable of (x, y, z, visibility) tuples."""
+        return cls(np.array(values, dtype=np.float64))
+
+    def __len__(self) -> int:
+        return self.array.shape[0]
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return LandmarkFrame(self.array[index])
+        n = self.array.shape[0]
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("landmark index out of range")
+        return LandmarkView(self._values, index * 4)
+
+    def __iter__(self) -> Iterator[LandmarkView]:
+        values = self._values
+        return (LandmarkView(values, base) for base in range(0, len(values), 4))
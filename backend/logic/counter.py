@@ -1,18 +1,44 @@
-from typing import List, Tuple
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+from .common import SquatState, BicepCurlState, ShoulderFlexionState, KneeRaiseState
+from .utils import state_names
 from .strategies.squat import SquatStrategy
 from .strategies.bicep_curl import BicepCurlStrategy
 from .strategies.shoulder_flexion import ShoulderFlexionStrategy
 from .strategies.knee_raise import KneeRaiseStrategy
+from .spec import SpecStrategy, load_specs
+from .reps import RepEvent
+from .calibration import CalibrationError
+from .strategies.base import BaseExerciseStrategy
+
+EXERCISE_STATES = {
+    'squat': SquatState,
+    'bicep-curl': BicepCurlState,
+    'shoulder-flexion': ShoulderFlexionState,
+    'knee-raise': KneeRaiseState,
+}
+# Resolved once; state_name() runs on every frame
+EXERCISE_STATE_NAMES = {exercise: state_names(states) for exercise, states in EXERCISE_STATES.items()}
+
+# Bound on buffered rep events; far above any real session
+MAX_REP_EVENTS = 5000
 
 class ExerciseCounter:
-    def __init__(self):
+    def __init__(self, filters: Optional[Dict[str, Dict[str, Any]]] = None):
+        # `filters` overrides each strategy's FILTERS, keyed by exercise then signal
+        filters = filters or {}
         self.strategies = {
-            'squat': SquatStrategy(),
-            'bicep-curl': BicepCurlStrategy(),
-            'shoulder-flexion': ShoulderFlexionStrategy(),
-            'knee-raise': KneeRaiseStrategy()
+            'squat': SquatStrategy(filters.get('squat')),
+            'bicep-curl': BicepCurlStrategy(filters.get('bicep-curl')),
+            'shoulder-flexion': ShoulderFlexionStrategy(filters.get('shoulder-flexion')),
+            'knee-raise': KneeRaiseStrategy(filters.get('knee-raise'))
         }
+        # Exercises defined only as data in logic/specs
+        for exercise, spec in load_specs().items():
+            if exercise not in self.strategies:
+                self.strategies[exercise] = SpecStrategy(spec, filters.get(exercise))
         self.total_reps = 0
+        # Finished rep attempts of every exercise, oldest first, until drained
+        self.rep_events: List[RepEvent] = []
 
     @property
     def squat_counter(self): return self.strategies['squat'].counter
@@ -37,20 +63,88 @@ class ExerciseCounter:
             self.strategies[exercise_name].reset()
         self.total_reps = sum(s.counter for s in self.strategies.values())
 
+    def process_frame(self, exercise_name: str, landmarks: List[Any], angles: Dict[str, Any],
+                      timestamp: Optional[float] = None) -> Tuple[int, List[str]]:
+        """
+        Feed one frame to the strategy of `exercise_name`; unknown exercises are ignored.
+        `timestamp` is the capture time in seconds and drives all duration checks.
+        """
+        strategy = self.strategies.get(exercise_name)
+        if strategy is None:
+            return 0, []
+        state, feedback = strategy.process(landmarks, angles, timestamp)
+        if strategy.rep_events:
+            self.rep_events.extend(event._replace(exercise=exercise_name) for event in strategy.rep_events)
+            strategy.rep_events.clear()
+            if len(self.rep_events) > MAX_REP_EVENTS:
+                del self.rep_events[:-MAX_REP_EVENTS]
+        self.update_total_reps()
+        return state, feedback
+
+    def required_angles(self, exercise_name: str) -> Optional[FrozenSet[str]]:
+        """Angle features the strategy of `exercise_name` reads; None for the full default set."""
+        strategy = self.strategies.get(exercise_name)
+        return strategy.REQUIRED_ANGLES if strategy else frozenset()
+
+    def _strategy(self, exercise_name: str) -> BaseExerciseStrategy:
+        strategy = self.strategies.get(exercise_name)
+        if strategy is None or not strategy.CALIBRATION:
+            raise CalibrationError(f"Calibration is not supported for {exercise_name}")
+        return strategy
+
+    def start_calibration(self, exercise_name: str) -> None:
+        self._strategy(exercise_name).start_calibration()
+
+    def finish_calibration(self, exercise_name: str) -> Dict[str, Any]:
+        return self._strategy(exercise_name).finish_calibration()
+
+    def apply_thresholds(self, profiles: Dict[str, Dict[str, float]]) -> None:
+        """Load calibrated thresholds, keyed by exercise then threshold name."""
+        for exercise_name, thresholds in profiles.items():
+            strategy = self.strategies.get(exercise_name)
+            if strategy is not None:
+                strategy.apply_thresholds(thresholds)
+
+    def drain_rep_events(self) -> List[RepEvent]:
+        events, self.rep_events = self.rep_events, []
+        return events
+
+    def feedback(self, exercise_name: str) -> List[str]:
+        """Current feedback of an exercise without processing a frame."""
+        strategy = self.strategies.get(exercise_name)
+        return strategy.feedback_manager.get_feedback() if strategy else []
+
+    def count(self, exercise_name: str) -> int:
+        strategy = self.strategies.get(exercise_name)
+        return strategy.counter if strategy else 0
+
+    def state_name(self, exercise_name: str) -> str:
+        strategy = self.strategies.get(exercise_name)
+        if strategy is None:
+            return "UNKNOWN"
+        names = EXERCISE_STATE_NAMES.get(exercise_name)
+        if names is None:
+            return strategy.state_name
+        return names.get(strategy.state, "UNKNOWN")
+
+    def state(self, exercise_name: str) -> int:
+        strategy = self.strategies.get(exercise_name)
+        return strategy.state if strategy else 0
+
     def process_bicep_curl(self, **kwargs) -> Tuple[int, List[str]]:
         # For backward compatibility with existing router calls
         # We extract landmarks from kwargs or just call the strategy with specific props
         # In a real refactor, we'd pass landmarks and pre-calculated angles
-        return self.strategies['bicep-curl'].process(kwargs.get('landmarks', []), kwargs)
+        return self.strategies['bicep-curl'].process(kwargs.get('landmarks', []), kwargs, kwargs.get('timestamp'))
 
     def process_squat(self, **kwargs) -> Tuple[int, List[str]]:
-        return self.strategies['squat'].process(kwargs.get('landmarks', []), kwargs)
+        return self.strategies['squat'].process(kwargs.get('landmarks', []), kwargs, kwargs.get('timestamp'))
 
     def process_shoulder_flexion(self, **kwargs) -> Tuple[int, List[str]]:
-        return self.strategies['shoulder-flexion'].process(kwargs.get('landmarks', []), kwargs)
+        return self.strategies['shoulder-flexion'].process(kwargs.get('landmarks', []), kwargs, kwargs.get('timestamp'))
 
     def process_knee_raise(self, **kwargs) -> Tuple[int, List[str]]:
-        return self.strategies['knee-raise'].process(kwargs.get('landmarks', []), kwargs)
+        return self.strategies['knee-raise'].process(kwargs.get('landmarks', []), kwargs, kwargs.get('timestamp'))
 
     def update_total_reps(self):
         self.total_reps = sum(s.counter for s in self.strategies.values())
@@ -0,0 +1,78 @@
+"""
+Off-loop execution of pose processing.
+
+Angle kernels and strategy state machines are CPU-bound; run on the event
+loop they stall every other request of the worker. `PoseExecutor.run()`
+hands a logic.service call to a pool and awaits it instead.
+
+With `workers > 0` there is one single-process pool per worker, and calls
+are routed by a stable hash of the session key, so a session always lands on
+the process that holds its state machines (each process has its own
+SESSION_REGISTRY). With `workers == 0` calls run on the loop's default
+thread pool against this process's registry; that is the default, since it
+needs no child processes (serverless deployments, tests).
+"""
+import asyncio
+import functools
+import logging
+import multiprocessing
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, List, Optional
+from .service import PoseError
+
+logger = logging.getLogger(__name__)
+
+
+class PoseExecutor:
+    def __init__(self, workers: int = 0):
+        self.workers = max(0, workers)
+        self._pools: List[Optional[ProcessPoolExecutor]] = [None] * self.workers
+        # Spawned children import only logic.service, not the API and its DB engine
+        self._context = multiprocessing.get_context("spawn")
+
+    def worker_index(self, key: str) -> int:
+        return zlib.crc32(key.encode("utf-8")) % self.workers
+
+    def _pool(self, index: int) -> ProcessPoolExecutor:
+        pool = self._pools[index]
+        if pool is None:
+            # Started on first use so importing the app never forks
+            pool = ProcessPoolExecutor(max_workers=1, mp_context=self._context)
+            self._pools[index] = pool
+        return pool
+
+    async def run(self, key: str, fn: Callable[..., Any], *args: Any) -> Any:
+        """Await `fn(*args)` on the worker that owns session `key`."""
+        loop = asyncio.get_running_loop()
+        call = functools.partial(fn, *args)
+        if not self.workers:
+            return await loop.run_in_executor(None, call)
+        index = self.worker_index(key)
+        try:
+            return await loop.run_in_executor(self._pool(index), call)
+        except BrokenProcessPool:
+            # The worker died with the state of its sessions; start a clean one
+            logger.error("Pose worker %d crashed, restarting it", index)
+            self._pools[index] = None
+            raise PoseError(503, "Pose worker restarted, please retry")
+
+    async def broadcast(self, fn: Callable[..., Any], *args: Any) -> List[Any]:
+        """
+        `fn(*args)` on every started worker (or inline when `workers == 0`),
+        e.g. to collect per-process metrics; workers that fail are left out.
+        """
+        if not self.workers:
+            return [fn(*args)]
+        loop = asyncio.get_running_loop()
+        call = functools.partial(fn, *args)
+        futures = [loop.run_in_executor(pool, call) for pool in self._pools if pool is not None]
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        return [r for r in results if not isinstance(r, BaseException)]
+
+    def shutdown(self) -> None:
+        for index, pool in enumerate(self._pools):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+                self._pools[index] = None
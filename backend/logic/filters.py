@@ -0,0 +1,125 @@
+"""
+Streaming filters for noisy joint-angle signals.
+
+Every filter takes one sample per frame through `update(value, timestamp)`
+and returns the smoothed value in O(1) without allocating. `value` holds the
+last output (None before the first sample) and `reset()` starts over.
+
+Strategies declare their filters as specs, e.g.
+
+    {'type': 'mean', 'window': 3}
+    {'type': 'ema', 'alpha': 0.5}
+    {'type': 'one_euro', 'min_cutoff': 1.0, 'beta': 0.01}
+
+and `make_filter()` builds them; a None spec means the signal is used raw.
+"""
+import math
+from typing import Any, Dict, Optional
+
+
+class RunningMean:
+    """Mean of the last `window` samples, kept as a ring buffer and running sum."""
+    __slots__ = ('window', '_buffer', '_head', '_count', '_sum', 'value')
+
+    def __init__(self, window: int = 3):
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        self.window = window
+        self._buffer = [0.0] * window
+        self.reset()
+
+    def update(self, value: float, timestamp: Optional[float] = None) -> float:
+        if self._count == self.window:
+            self._sum -= self._buffer[self._head]
+        else:
+            self._count += 1
+        self._buffer[self._head] = value
+        self._head = (self._head + 1) % self.window
+        self._sum += value
+        self.value = self._sum / self._count
+        return self.value
+
+    def reset(self) -> None:
+        self._head = 0
+        self._count = 0
+        self._sum = 0.0
+        self.value: Optional[float] = None
+
+
+class EMA:
+    """Exponential moving average: value = alpha * sample + (1 - alpha) * value."""
+    __slots__ = ('alpha', 'value')
+
+    def __init__(self, alpha: float = 0.5):
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha must be in (0, 1]")
+        self.alpha = alpha
+        self.value: Optional[float] = None
+
+    def update(self, value: float, timestamp: Optional[float] = None) -> float:
+        self.value = value if self.value is None else self.value + self.alpha * (value - self.value)
+        return self.value
+
+    def reset(self) -> None:
+        self.value = None
+
+
+class OneEuro:
+    """
+    One Euro filter (Casiez et al., 2012): a low-pass filter whose cutoff
+    rises with the signal's speed, so slow jitter is smoothed away while fast
+    movements keep little lag. `freq` is the assumed frame rate when frames
+    carry no timestamps.
+    """
+    __slots__ = ('min_cutoff', 'beta', 'd_cutoff', 'freq', 'value', '_dx', '_last_time')
+
+    def __init__(self, min_cutoff: float = 1.0, beta: float = 0.0, d_cutoff: float = 1.0, freq: float = 30.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.freq = freq
+        self.reset()
+
+    @staticmethod
+    def _alpha(cutoff: float, dt: float) -> float:
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def update(self, value: float, timestamp: Optional[float] = None) -> float:
+        if self.value is None:
+            self.value = value
+            self._last_time = timestamp
+            return value
+        dt = 1.0 / self.freq
+        if timestamp is not None and self._last_time is not None and timestamp > self._last_time:
+            dt = timestamp - self._last_time
+        self._last_time = timestamp
+
+        dx = (value - self.value) / dt
+        self._dx += self._alpha(self.d_cutoff, dt) * (dx - self._dx)
+        cutoff = self.min_cutoff + self.beta * abs(self._dx)
+        self.value += self._alpha(cutoff, dt) * (value - self.value)
+        return self.value
+
+    def reset(self) -> None:
+        self.value: Optional[float] = None
+        self._dx = 0.0
+        self._last_time: Optional[float] = None
+
+
+FILTER_TYPES = {
+    'mean': RunningMean,
+    'ema': EMA,
+    'one_euro': OneEuro,
+}
+
+
+def make_filter(spec: Optional[Dict[str, Any]]):
+    """Build a filter from a spec such as {'type': 'ema', 'alpha': 0.5}; None disables filtering."""
+    if spec is None:
+        return None
+    params = dict(spec)
+    kind = params.pop('type')
+    if kind not in FILTER_TYPES:
+        raise ValueError(f"Unknown filter type: {kind}")
+    return FILTER_TYPES[kind](**params)
@@ -0,0 +1,69 @@
+"""
+Cheap pre-filter in front of the angle kernel.
+
+`FrameGate.admit()` looks at the handful of landmarks an exercise actually
+reads and turns a frame away when
+
+  - no angle the exercise needs could be computed: every landmark group
+    (joint triplet, torso line) has a point at or below `min_visibility`,
+    so the strategy would see only missing angles, or
+  - the pose has not moved: no key landmark moved more than `epsilon`
+    (normalized image units) in x or y since the last admitted frame.
+
+Both checks are a few NumPy reductions over at most ~20 values; rejected
+frames skip the kernel and the strategy. The counters give the skip ratio.
+"""
+from typing import Dict, Iterable, Optional
+import numpy as np
+from .kernel import DEFAULT_FEATURES, NUM_LANDMARKS, visibility_groups
+
+
+class FrameGate:
+    __slots__ = (
+        'min_visibility', 'epsilon', 'groups', 'keypoints', '_last',
+        'frames', 'skipped_low_confidence', 'skipped_duplicate'
+    )
+
+    def __init__(self, features: Optional[Iterable[str]] = None, min_visibility: float = 0.6,
+                 epsilon: float = 0.002):
+        groups = visibility_groups(DEFAULT_FEATURES if features is None else features)
+        self.min_visibility = min_visibility
+        self.epsilon = epsilon
+        # Groups padded to three points (a pair repeats its last point) for one vectorized check
+        self.groups = np.array([g + (g[-1],) * (3 - len(g)) for g in groups], dtype=np.intp).reshape(-1, 3)
+        self.keypoints = np.unique(self.groups)
+        self._last: Optional[np.ndarray] = None
+        self.frames = 0
+        self.skipped_low_confidence = 0
+        self.skipped_duplicate = 0
+
+    def admit(self, frame: np.ndarray) -> bool:
+        """True when `frame` (N, 4) should go through the kernel and strategy."""
+        if frame.shape[0] < NUM_LANDMARKS or not len(self.groups):
+            # Malformed frames are rejected (with an error) further down the pipeline
+            return True
+        self.frames += 1
+        if self.min_visibility > 0 and not (frame[self.groups, 3] > self.min_visibility).all(axis=1).any():
+            self.skipped_low_confidence += 1
+            return False
+        points = frame[self.keypoints, :2]
+        if self.epsilon > 0 and self._last is not None and np.abs(points - self._last).max() <= self.epsilon:
+            self.skipped_duplicate += 1
+            return False
+        self._last = points.copy()
+        return True
+
+    def reset(self) -> None:
+        self._last = None
+
+    @property
+    def skip_ratio(self) -> float:
+        return (self.skipped_low_confidence + self.skipped_duplicate) / self.frames if self.frames else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "frames": self.frames,
+            "skipped_low_confidence": self.skipped_low_confidence,
+            "skipped_duplicate": self.skipped_duplicate,
+            "skip_ratio": round(self.skip_ratio, 4),
+        }
@@ -0,0 +1,258 @@
+"""
+Vectorized joint-angle kernel.
+
+Computes the angles used by the exercise strategies from a single (33, 4)
+float array of MediaPipe landmarks (x, y, z, visibility) in one NumPy pass,
+instead of ~15 scalar AngleCalculator calls per frame. Results match the
+scalar AngleCalculator formulas, including the visibility thresholds.
+
+Strategies declare the features they read (REQUIRED_ANGLES); a plan per
+feature set projects only the vectors those features need.
+"""
+import math
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from .common import Landmark, LandmarkFrame
+
+NUM_LANDMARKS = 33
+RAD_TO_DEG = 180.0 / math.pi
+
+# (a, vertex, c) triplets. Every joint angle below is the unsigned angle
+# between the vectors vertex->a and vertex->c.
+_TRIPLETS = (
+    (23, 25, 27),  # 0 left knee (hip, knee, ankle)
+    (24, 26, 28),  # 1 right knee
+    (11, 13, 15),  # 2 left elbow (shoulder, elbow, wrist)
+    (12, 14, 16),  # 3 right elbow
+    (23, 11, 13),  # 4 left elbow-torso (hip, shoulder, elbow)
+    (24, 12, 14),  # 5 right elbow-torso
+    (23, 11, 15),  # 6 left shoulder flexion (hip, shoulder, wrist)
+    (24, 12, 16),  # 7 right shoulder flexion
+    (11, 23, 25),  # 8 left hip (shoulder, hip, knee)
+    (12, 24, 26),  # 9 right hip
+)
+# Triplets measured with AngleCalculator.angle_deg, which reports 0 when a
+# vector has zero length
+_ZERO_LENGTH_IS_ZERO = frozenset((4, 5, 6, 7))
+
+_LEFT_HIP, _RIGHT_HIP = 23, 24
+_LEFT_SHOULDER, _RIGHT_SHOULDER = 11, 12
+_X, _Y, _VIS = 0, 1, 3
+
+# Vertical angles, atan2(dx, -dy) from the bottom points to the top points
+_VERTICALS = {
+    'back': ((_LEFT_SHOULDER, _RIGHT_SHOULDER), (_LEFT_HIP, _RIGHT_HIP)),  # mid-hip -> mid-shoulder
+    'torso': ((_LEFT_SHOULDER,), (_LEFT_HIP,)),                             # left hip -> left shoulder
+}
+
+
+def _joint(t, vt):
+    return lambda j, v, vis: j[t][0] if j[t][1] > vt else None
+
+
+def _elbow_torso(j, v, vis):
+    left = j[4][0] if j[4][1] > 0.6 else None
+    right = j[5][0] if j[5][1] > 0.6 else None
+    if left is not None and right is not None:
+        return (left, right, (left + right) / 2, "front")
+    if left is not None:
+        return (left, None, left, "left_side")
+    if right is not None:
+        return (None, right, right, "right_side")
+    return (None, None, None, "unclear")
+
+
+def _knee_avg(j, v, vis):
+    left = j[0][0] if j[0][1] > 0.6 else None
+    right = j[1][0] if j[1][1] > 0.6 else None
+    if left is not None and right is not None:
+        return (left + right) / 2
+    return left if left is not None else right
+
+
+# feature -> (triplets, verticals, function of (joint angles, vertical angles, visibility))
+FEATURES = {
+    'knee_angle_avg': ((0, 1), (), _knee_avg),
+    'back_angle': ((), ('back',), lambda j, v, vis: v['back']),
+    'left_bicep_angle': ((2,), (), _joint(2, 0.6)),
+    'right_bicep_angle': ((3,), (), _joint(3, 0.6)),
+    'elbow_torso_result': ((4, 5), (), _elbow_torso),
+    'hip_shoulder_angle': ((), ('torso',), lambda j, v, vis: (
+        v['torso'] if vis[_LEFT_HIP] > 0.6 and vis[_LEFT_SHOULDER] > 0.6 else None)),
+    'left_flexion_angle': ((6,), (), _joint(6, 0.7)),
+    'right_flexion_angle': ((7,), (), _joint(7, 0.7)),
+    'left_elbow_angle': ((2,), (), _joint(2, 0.7)),
+    'right_elbow_angle': ((3,), (), _joint(3, 0.7)),
+    'left_knee_angle': ((0,), (), _joint(0, 0.6)),
+    'right_knee_angle': ((1,), (), _joint(1, 0.6)),
+    # Squat-only features
+    'left_knee_angle_strict': ((0,), (), _joint(0, 0.7)),
+    'right_knee_angle_strict': ((1,), (), _joint(1, 0.7)),
+    'left_hip_angle': ((8,), (), _joint(8, 0.6)),
+    'right_hip_angle': ((9,), (), _joint(9, 0.6)),
+}
+# What calculate_all_angles() returns when no features are requested
+DEFAULT_FEATURES = (
+    'knee_angle_avg', 'back_angle', 'left_bicep_angle', 'right_bicep_angle', 'elbow_torso_result',
+    'hip_shoulder_angle', 'left_flexion_angle', 'right_flexion_angle', 'left_elbow_angle',
+    'right_elbow_angle', 'left_knee_angle', 'right_knee_angle',
+)
+
+
+def visibility_groups(features: Iterable[str]) -> Tuple[Tuple[int, ...], ...]:
+    """
+    Landmark groups that must all be visible for at least one of `features`
+    to be computed: the joints' triplets and the visibility-gated torso line.
+    The back line is computed regardless of visibility and is left out.
+    """
+    groups = set()
+    for name in features:
+        triplets, verticals, _ = FEATURES[name]
+        groups.update(_TRIPLETS[t] for t in triplets)
+        if 'torso' in verticals:
+            groups.add((_LEFT_SHOULDER, _LEFT_HIP))
+    return tuple(sorted(groups))
+
+
+class _Plan:
+    """
+    Everything needed to compute one set of features: a constant matrix
+    mapping the flattened (33 * 4) frame to the atan2 arguments of just the
+    vectors those features use (first half "y" arguments, second half "x"),
+    so one matmul gathers and subtracts all landmark coordinates at once.
+    """
+    __slots__ = ('features', 'triplets', 'verticals', 'projection', 'n_vectors', 'triplet_rows', 'zero_rule')
+
+    def __init__(self, features: Tuple[str, ...]):
+        unknown = [name for name in features if name not in FEATURES]
+        if unknown:
+            raise KeyError(f"Unknown angle features: {unknown}")
+        self.features = tuple((name, FEATURES[name][2]) for name in features)
+        self.triplets = tuple(sorted({t for name in features for t in FEATURES[name][0]}))
+        self.verticals = tuple(sorted({v for name in features for v in FEATURES[name][1]}))
+        self.n_vectors = 2 * len(self.triplets) + len(self.verticals)
+        # (row of the vertex->c vector, triplet, a, vertex, c, zero-length rule applies)
+        self.triplet_rows = tuple(
+            (2 * i, t) + _TRIPLETS[t] + (t in _ZERO_LENGTH_IS_ZERO,) for i, t in enumerate(self.triplets)
+        )
+        self.zero_rule = any(row[-1] for row in self.triplet_rows)
+
+        n = self.n_vectors
+        proj = np.zeros((2 * n, NUM_LANDMARKS * 4))
+        # Rows 2i and 2i+1 are the vertex->c and vertex->a vectors of triplet i
+        for i, t in enumerate(self.triplets):
+            a, vertex, c = _TRIPLETS[t]
+            for row, point in ((2 * i, c), (2 * i + 1, a)):
+                proj[row, point * 4 + _Y] += 1
+                proj[row, vertex * 4 + _Y] -= 1
+                proj[n + row, point * 4 + _X] += 1
+                proj[n + row, vertex * 4 + _X] -= 1
+        for k, name in enumerate(self.verticals):
+            row = 2 * len(self.triplets) + k
+            tops, bottoms = _VERTICALS[name]
+            for point in tops:
+                proj[row, point * 4 + _X] += 1 / len(tops)
+                proj[n + row, point * 4 + _Y] -= 1 / len(tops)
+            for point in bottoms:
+                proj[row, point * 4 + _X] -= 1 / len(bottoms)
+                proj[n + row, point * 4 + _Y] += 1 / len(bottoms)
+        self.projection = proj
+
+
+_PLANS: Dict[Union[FrozenSet[str], Tuple[str, ...]], _Plan] = {}
+
+
+def _plan_for(features: Iterable[str]) -> _Plan:
+    # Strategies pass the same frozenset every frame, so try it as a key first
+    plan = _PLANS.get(features) if isinstance(features, (tuple, frozenset)) else None
+    if plan is None:
+        features = tuple(features)
+        key = frozenset(features)
+        plan = _PLANS.get(key)
+        if plan is None:
+            plan = _PLANS[key] = _Plan(tuple(dict.fromkeys(features)))
+        if isinstance(features, tuple):
+            _PLANS[features] = plan
+    return plan
+
+
+def landmarks_to_array(landmarks: Sequence[Landmark]) -> np.ndarray:
+    """Pack Landmark objects into a contiguous (N, 4) float64 array."""
+    if isinstance(landmarks, LandmarkFrame):
+        return landmarks.array
+    flat = [v for lm in landmarks for v in (lm.x, lm.y, lm.z, lm.visibility)]
+    return np.array(flat, dtype=np.float64).reshape(-1, 4)
+
+
+def landmarks_from_array(frame: np.ndarray) -> List[Landmark]:
+    """Unpack a (N, 4) array into Landmark objects for the strategies."""
+    return [Landmark(x, y, z, v) for x, y, z, v in frame.tolist()]
+
+
+def compute_angles(frame: np.ndarray, features: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    Compute joint-angle features for one frame.
+
+    `frame` is a (N >= 33, 4) array of x, y, z, visibility. Only the
+    requested `features` (names in FEATURES) are computed; by default the
+    dictionary layout of `exercise_logic.calculate_all_angles`.
+    """
+    if frame.ndim != 2 or frame.shape[0] < NUM_LANDMARKS:
+        return {'error': 'Not enough landmarks detected'}
+    plan = _plan_for(DEFAULT_FEATURES if features is None else features)
+    flat = frame[:NUM_LANDMARKS].reshape(-1)
+    visibility = flat[_VIS::4].tolist()
+
+    joint = [None] * len(_TRIPLETS)
+    vertical = {}
+    if plan.n_vectors:
+        n = plan.n_vectors
+        args = np.dot(plan.projection, flat)
+        theta = np.arctan2(args[:n], args[n:]).tolist()
+        coords = args.tolist() if plan.zero_rule else None
+        for row, t, a, vertex, c, zero_rule in plan.triplet_rows:
+            angle = abs((theta[row] - theta[row + 1]) * RAD_TO_DEG)
+            if angle > 180:
+                angle = 360 - angle
+            if zero_rule and ((coords[row] == 0 and coords[n + row] == 0) or
+                              (coords[row + 1] == 0 and coords[n + row + 1] == 0)):
+                angle = 0.0
+            joint[t] = (angle, min(visibility[a], visibility[vertex], visibility[c]))
+        base = 2 * len(plan.triplets)
+        for k, name in enumerate(plan.verticals):
+            vertical[name] = abs(theta[base + k] * RAD_TO_DEG)
+
+    return {name: fn(joint, vertical, visibility) for name, fn in plan.features}
+
+
+def frame_angles(frame: LandmarkFrame, features: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    Angle features of a LandmarkFrame, memoized on the frame: features
+    computed by an earlier call are reused and only the missing ones are
+    computed.
+    """
+    wanted = DEFAULT_FEATURES if features is None else features
+    cache = frame.angle_cache
+    missing = [name for name in wanted if name not in cache]
+    if missing:
+        computed = compute_angles(frame.array, missing)
+        if 'error' in computed:
+            return computed
+        cache.update(computed)
+    return {name: cache[name] for name in wanted}
+
+
+def calculate_all_angles(
+    landmarks: Union[Sequence[Landmark], LandmarkFrame, np.ndarray], features: Optional[Iterable[str]] = None
+) -> Dict[str, Any]:
+    """
+    Compute joint angles from Landmark objects, a LandmarkFrame or a packed
+    (33, 4) array; `features` limits the work to the angles a strategy uses.
+    """
+    if isinstance(landmarks, LandmarkFrame):
+        return frame_angles(landmarks, features)
+    if isinstance(landmarks, np.ndarray):
+        return compute_angles(np.asarray(landmarks, dtype=np.float64), features)
+    if len(landmarks) < NUM_LANDMARKS:
+        return {'error': 'Not enough landmarks detected'}
+    return compute_angles(landmarks_to_array(landmarks), features)
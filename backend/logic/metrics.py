@@ -0,0 +1,111 @@
+"""
+Opt-in per-stage timing of the pose pipeline.
+
+Set POSE_METRICS=1 to enable. Hot paths read `METRICS.enabled` once and only
+then take timestamps:
+
+    timed = METRICS.enabled
+    t = perf_counter_ns() if timed else 0
+    ...
+    if timed:
+        t = METRICS.lap('angles', t)
+
+so a disabled build pays one attribute read per stage. Durations go into
+fixed log2 histograms (1 us .. ~1 s buckets), which are cheap to update,
+merge across worker processes and summarize into percentiles.
+"""
+import os
+import threading
+from time import perf_counter_ns
+from typing import Dict, List
+
+# Bucket i counts durations in [2**(i-1), 2**i) microseconds; bucket 0 is < 1 us
+N_BUCKETS = 21
+
+
+class Histogram:
+    __slots__ = ('buckets', 'count', 'total_ns', 'max_ns')
+
+    def __init__(self):
+        self.buckets = [0] * N_BUCKETS
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def observe(self, ns: int) -> None:
+        self.buckets[min((ns // 1000).bit_length(), N_BUCKETS - 1)] += 1
+        self.count += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def merge(self, raw: Dict) -> None:
+        self.buckets = [a + b for a, b in zip(self.buckets, raw["buckets"])]
+        self.count += raw["count"]
+        self.total_ns += raw["total_ns"]
+        self.max_ns = max(self.max_ns, raw["max_ns"])
+
+    def raw(self) -> Dict:
+        return {"buckets": list(self.buckets), "count": self.count, "total_ns": self.total_ns, "max_ns": self.max_ns}
+
+    def _percentile_us(self, q: float) -> float:
+        # Upper bound of the bucket holding the q-th sample
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= rank:
+                return float(2 ** i)
+        return self.max_ns / 1000
+
+    def summary(self) -> Dict[str, float]:
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean_us": round(self.total_ns / self.count / 1000, 2),
+            "p50_us": self._percentile_us(0.5),
+            "p90_us": self._percentile_us(0.9),
+            "p99_us": self._percentile_us(0.99),
+            "max_us": round(self.max_ns / 1000, 2),
+        }
+
+
+class StageMetrics:
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, ns: int) -> None:
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(stage, Histogram())
+        histogram.observe(ns)
+
+    def lap(self, stage: str, start_ns: int) -> int:
+        """Record the time since `start_ns` under `stage`; returns now for the next stage."""
+        now = perf_counter_ns()
+        self.observe(stage, now - start_ns)
+        return now
+
+    def raw(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {stage: h.raw() for stage, h in self._histograms.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms = {}
+
+
+def summarize(raws: List[Dict[str, Dict]]) -> Dict[str, Dict[str, float]]:
+    """Merge raw snapshots (one per process) into per-stage summaries."""
+    merged: Dict[str, Histogram] = {}
+    for raw in raws:
+        for stage, data in raw.items():
+            merged.setdefault(stage, Histogram()).merge(data)
+    return {stage: merged[stage].summary() for stage in sorted(merged)}
+
+
+METRICS = StageMetrics(enabled=os.getenv("POSE_METRICS", "0") == "1")
@@ -0,0 +1,169 @@
+"""
+Landmark stream recording and offline replay.
+
+A recording is one uninterrupted take of a single exercise: the (N, 33, 4)
+landmark frames, the timestamp each frame was processed with and the rep
+count the engine produced live ("golden" count). Frames stay float64, the
+precision of the live path, so no threshold crossing flips on replay, and a
+frame the client sent without a capture time keeps the server-clock time the
+strategies used. Takes are stored as compressed .npz files.
+
+Takes also keep the calibrated thresholds the session ran with.
+
+`replay()` runs a recording through a fresh EngineSession with the live
+registry's frame gate and filter settings, frame by frame through the same
+code as /process_landmarks (gate, angle kernel, then strategy), and reports
+throughput, per-frame latency and whether the final count still matches the
+golden value. `scripts/replay_benchmark.py` wraps it for the command line.
+"""
+import json
+import math
+import os
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+import numpy as np
+from .common import LandmarkFrame
+from .kernel import NUM_LANDMARKS
+
+# Version 2 added the calibration profiles; version 1 files load without them
+FORMAT_VERSION = 2
+
+Profiles = Dict[str, Dict[str, float]]
+
+
+class Recording(NamedTuple):
+    exercise: str
+    frames: np.ndarray          # (N, 33, 4) float64
+    timestamps: np.ndarray      # (N,) float64 capture times, NaN when unknown
+    expected_count: Optional[int] = None
+    profiles: Optional[Profiles] = None  # calibrated thresholds applied during the take
+
+
+class ReplayReport(NamedTuple):
+    exercise: str
+    frames: int
+    fps: float
+    p50_ms: float
+    p99_ms: float
+    count: int
+    expected_count: Optional[int]
+
+    @property
+    def passed(self) -> bool:
+        return self.expected_count is None or self.count == self.expected_count
+
+
+def save_recording(path: str, recording: Recording) -> None:
+    np.savez_compressed(
+        path,
+        version=np.array(FORMAT_VERSION),
+        exercise=np.array(recording.exercise),
+        frames=np.asarray(recording.frames, dtype=np.float64).reshape(-1, NUM_LANDMARKS, 4),
+        timestamps=np.asarray(recording.timestamps, dtype=np.float64),
+        expected_count=np.array(-1 if recording.expected_count is None else recording.expected_count),
+        profiles=np.array(json.dumps(recording.profiles or {})),
+    )
+
+
+def load_recording(path: str) -> Recording:
+    with np.load(path, allow_pickle=False) as data:
+        version = int(data['version'])
+        if version not in (1, FORMAT_VERSION):
+            raise ValueError(f"{path}: unsupported recording version {version}")
+        expected = int(data['expected_count'])
+        return Recording(
+            exercise=str(data['exercise']),
+            frames=data['frames'],
+            timestamps=data['timestamps'],
+            expected_count=None if expected < 0 else expected,
+            profiles=(json.loads(str(data['profiles'])) or None) if version >= 2 else None,
+        )
+
+
+class LandmarkRecorder:
+    """
+    Collects the frames of one engine session, one open take per exercise.
+
+    `cut()` closes the open take of an exercise (e.g. when its state is reset)
+    so that every saved take replays from a fresh counter.
+    """
+
+    def __init__(self):
+        self._frames: Dict[str, List[np.ndarray]] = {}
+        self._timestamps: Dict[str, List[float]] = {}
+        self.takes: List[Recording] = []
+        # Calibrated thresholds loaded into the session (service.apply_profiles)
+        self.profiles: Optional[Profiles] = None
+
+    def add(self, exercise: str, frame: np.ndarray, timestamp: Optional[float] = None) -> None:
+        self._frames.setdefault(exercise, []).append(
+            np.asarray(frame[:NUM_LANDMARKS], dtype=np.float64).copy()
+        )
+        self._timestamps.setdefault(exercise, []).append(math.nan if timestamp is None else timestamp)
+
+    def cut(self, exercise: str, expected_count: Optional[int] = None) -> Optional[Recording]:
+        frames = self._frames.pop(exercise, None)
+        timestamps = self._timestamps.pop(exercise, None)
+        if not frames:
+            return None
+        take = Recording(exercise, np.stack(frames), np.array(timestamps, dtype=np.float64), expected_count,
+                         self.profiles)
+        self.takes.append(take)
+        return take
+
+    def save(self, directory: str, prefix: str, counts: Dict[str, int]) -> List[str]:
+        """Close every open take with its final count and write all takes to `directory`."""
+        for exercise in list(self._frames):
+            self.cut(exercise, counts.get(exercise))
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for index, take in enumerate(self.takes):
+            path = os.path.join(directory, f"{prefix}-{take.exercise}-{index}.npz")
+            save_recording(path, take)
+            paths.append(path)
+        self.takes = []
+        return paths
+
+
+def replay(recording: Recording, repeat: int = 1, filters: Optional[Dict[str, Any]] = None,
+           gate: Optional[Dict[str, float]] = None) -> ReplayReport:
+    """
+    Run a recording through fresh engine sessions `repeat` times and time
+    every frame. `filters` and `gate` default to the live SESSION_REGISTRY's.
+    """
+    # Imported here: the registry imports this module for LandmarkRecorder
+    from .registry import EngineSession
+    from .service import SESSION_REGISTRY, PoseError, _process
+
+    filters = SESSION_REGISTRY.filters if filters is None else filters
+    gate = SESSION_REGISTRY.gate if gate is None else gate
+    frames = np.asarray(recording.frames, dtype=np.float64)
+    timestamps = [None if math.isnan(t) else t for t in recording.timestamps.tolist()]
+    latencies = []
+    count = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        engine = EngineSession("replay", filters=filters, gate=gate)
+        if recording.profiles:
+            engine.counter.apply_thresholds(recording.profiles)
+        for frame, timestamp in zip(frames, timestamps):
+            t0 = time.perf_counter()
+            try:
+                _process(engine, recording.exercise, LandmarkFrame(frame), timestamp)
+            except PoseError:
+                # Rejected live with a 400 as well; the state is unchanged
+                pass
+            latencies.append(time.perf_counter() - t0)
+        count = engine.counter.count(recording.exercise)
+    elapsed = time.perf_counter() - started
+
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000 if latencies else (0.0, 0.0)
+    return ReplayReport(
+        exercise=recording.exercise,
+        frames=len(latencies),
+        fps=len(latencies) / elapsed if elapsed > 0 else 0.0,
+        p50_ms=float(p50),
+        p99_ms=float(p99),
+        count=count,
+        expected_count=recording.expected_count,
+    )
@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from .counter import ExerciseCounter
+from .gate import FrameGate
+from .recording import LandmarkRecorder
+from .tracking import MultiPersonTracker
+
+
+class StepProgress:
+    """The plan step a session is working on: reaching `target` reps completes it."""
+    __slots__ = ('exercise', 'target', 'started_at', 'first_event', 'logged', 'claimed')
+
+    def __init__(self, exercise: str, target: int, first_event: int = 0):
+        self.exercise = exercise
+        self.target = target
+        self.started_at = time.time()
+        # Index into ExerciseCounter.rep_events where this step's reps begin
+        self.first_event = first_event
+        self.logged = False
+        # Set once a client /session/log call has been answered with the server's row
+        self.claimed = False
+
+
+class EngineSession:
+    """Pose-analysis state owned by a single workout session (or user)."""
+
+    def __init__(self, key: str, record: bool = False, filters: Optional[Dict[str, Any]] = None,
+                 gate: Optional[Dict[str, float]] = None):
+        self.key = key
+        self.counter = ExerciseCounter(filters)
+        self.recorder: Optional[LandmarkRecorder] = LandmarkRecorder() if record else None
+        self.filters = filters
+        # Created on the first multi-person frame (group sessions)
+        self.tracker: Optional[MultiPersonTracker] = None
+        self.step: Optional[StepProgress] = None
+        # FrameGate settings (None disables gating) and one gate per exercise
+        self.gate_config = gate
+        self.gates: Dict[str, FrameGate] = {}
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+    def frame_gate(self, exercise: str) -> Optional[FrameGate]:
+        if self.gate_config is None:
+            return None
+        gate = self.gates.get(exercise)
+        if gate is None:
+            gate = self.gates[exercise] = FrameGate(self.counter.required_angles(exercise), **self.gate_config)
+        return gate
+
+    def multi_tracker(self) -> MultiPersonTracker:
+        if self.tracker is None:
+            self.tracker = MultiPersonTracker(filters=self.filters)
+        return self.tracker
+
+
+class SessionRegistry:
+    """
+    Keyed store of per-session ExerciseCounter instances.
+
+    Entries are kept in LRU order: sessions idle for longer than
+    `idle_timeout` seconds are dropped, and when `max_sessions` is reached the
+    least recently used session is evicted to make room for a new one.
+    Callers serialize work on one session with `acquire()`; different
+    sessions never contend with each other. When `record_dir` is set, new
+    sessions also record their landmark streams for offline replay.
+    `filters` overrides the angle smoothing of every new session's strategies
+    and `gate` holds the FrameGate settings of new sessions (None: no gating).
+    `on_evict` is called with each evicted session, under its lock but outside
+    the registry's, so state the session never handed out is not lost.
+    """
+
+    def __init__(self, max_sessions: int = 1000, idle_timeout: float = 900.0, record_dir: Optional[str] = None,
+                 filters: Optional[Dict[str, Any]] = None, gate: Optional[Dict[str, float]] = None,
+                 on_evict: Optional[Callable[[EngineSession], None]] = None):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.record_dir = record_dir
+        self.filters = filters
+        self.gate = gate
+        self.on_evict = on_evict
+        self._sessions: "OrderedDict[str, EngineSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._sessions
+
+    def get(self, key: str) -> EngineSession:
+        now = time.monotonic()
+        evicted: List[EngineSession] = []
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None:
+                self._sessions.move_to_end(key)
+            else:
+                self._evict_idle_locked(now, evicted)
+                while len(self._sessions) >= self.max_sessions:
+                    evicted.append(self._sessions.popitem(last=False)[1])
+                session = EngineSession(key, record=bool(self.record_dir), filters=self.filters, gate=self.gate)
+                self._sessions[key] = session
+            session.last_used = now
+        self._notify_evicted(evicted)
+        return session
+
+    def peek(self, key: str) -> Optional[EngineSession]:
+        return self._sessions.get(key)
+
+    @contextmanager
+    def acquire(self, key: str) -> Iterator[EngineSession]:
+        session = self.get(key)
+        with session.lock:
+            yield session
+
+    def discard(self, key: str) -> Optional[EngineSession]:
+        with self._lock:
+            return self._sessions.pop(key, None)
+
+    def evict_idle(self) -> int:
+        evicted: List[EngineSession] = []
+        with self._lock:
+            self._evict_idle_locked(time.monotonic(), evicted)
+        self._notify_evicted(evicted)
+        return len(evicted)
+
+    def _evict_idle_locked(self, now: float, evicted: List[EngineSession]) -> None:
+        # Entries are in LRU order, so the first non-expired one ends the scan
+        while self._sessions:
+            key, session = next(iter(self._sessions.items()))
+            if now - session.last_used < self.idle_timeout:
+                break
+            evicted.append(self._sessions.popitem(last=False)[1])
+
+    def _notify_evicted(self, evicted: List[EngineSession]) -> None:
+        if self.on_evict is None:
+            return
+        for session in evicted:
+            # Waits out a frame still being processed on the evicted session
+            with session.lock:
+                self.on_evict(session)
@@ -0,0 +1,83 @@
+"""
+Per-rep quality metrics.
+
+A strategy follows one primary angle through every rep attempt with a
+`RepTracker`: `start()` when the attempt begins, `sample()` on every frame,
+`finish()` when the cycle closes, counted or not. The peak of the angle
+(its minimum for knee and elbow flexion, its maximum for shoulder flexion)
+splits the attempt into its concentric and eccentric phases.
+"""
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+
+class RepEvent(NamedTuple):
+    exercise: Optional[str]     # filled in by ExerciseCounter
+    rep_index: int              # the strategy's count after this attempt
+    valid: bool                 # counted, or rejected by the strategy's checks
+    start_time: float
+    end_time: float
+    min_angle: Optional[float]
+    max_angle: Optional[float]
+    concentric_s: Optional[float]
+    eccentric_s: Optional[float]
+    feedback: Tuple[str, ...]
+
+
+class RepTracker:
+    __slots__ = ('peak_is_min', 'concentric_first', 'start_time', 'min_angle', 'max_angle', 'peak_time')
+
+    def __init__(self, peak: str = 'min', concentric_first: bool = True):
+        self.peak_is_min = peak == 'min'
+        self.concentric_first = concentric_first
+        self.start_time: Optional[float] = None
+        self.min_angle: Optional[float] = None
+        self.max_angle: Optional[float] = None
+        self.peak_time: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return self.start_time is not None
+
+    def start(self, now: float) -> None:
+        self.start_time = now
+        self.min_angle = None
+        self.max_angle = None
+        self.peak_time = None
+
+    def sample(self, angle: Optional[float], now: float) -> None:
+        if self.start_time is None or angle is None:
+            return
+        if self.min_angle is None:
+            self.min_angle = self.max_angle = angle
+            self.peak_time = now
+            return
+        if angle < self.min_angle:
+            self.min_angle = angle
+            if self.peak_is_min:
+                self.peak_time = now
+        elif angle > self.max_angle:
+            self.max_angle = angle
+            if not self.peak_is_min:
+                self.peak_time = now
+
+    def finish(self, now: float, rep_index: int, valid: bool, feedback: Sequence[str]) -> Optional[RepEvent]:
+        """Close the attempt; None when no attempt was open."""
+        if self.start_time is None:
+            return None
+        first = second = None
+        if self.peak_time is not None:
+            first, second = self.peak_time - self.start_time, now - self.peak_time
+        concentric, eccentric = (first, second) if self.concentric_first else (second, first)
+        event = RepEvent(
+            None, rep_index, valid, self.start_time, now, self.min_angle, self.max_angle,
+            concentric, eccentric, tuple(feedback),
+        )
+        self.start_time = None
+        return event
+
+
+def accuracy(events: List[RepEvent]) -> Optional[float]:
+    """Share of attempts that counted, in percent; None without attempts."""
+    if not events:
+        return None
+    return round(100.0 * sum(1 for e in events if e.valid) / len(events), 2)
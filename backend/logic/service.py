@@ -0,0 +1,334 @@
+"""
+Session-level pose operations, as run by logic.executor.
+
+Every function takes the session key and plain, picklable arguments
+(landmark arrays rather than schema objects) and returns plain dicts, so the
+same code runs inline or inside a pose worker process. Each process owns its
+own `SESSION_REGISTRY`; the executor routes every call for one session to the
+same process, which keeps that session's state machines local to it.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from time import perf_counter_ns
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from .common import LandmarkFrame
+from .counter import ExerciseCounter
+from .kernel import NUM_LANDMARKS, calculate_all_angles
+from .registry import EngineSession, SessionRegistry, StepProgress
+from .reps import RepEvent, accuracy
+from .calibration import CalibrationError
+from .strategies.base import BaseExerciseStrategy
+from .metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# Rep events of engines evicted before their session ended, returned by end_session
+_EVICTED_EVENTS: "OrderedDict[str, List[RepEvent]]" = OrderedDict()
+_EVICTED_LOCK = threading.Lock()
+
+
+def _on_evict(engine: EngineSession) -> None:
+    """Keep what an evicted engine had not handed out: its rep events and its recording."""
+    events = engine.counter.drain_rep_events()
+    logger.warning("Evicted pose session %s with %d unsaved rep events", engine.key, len(events))
+    if events:
+        with _EVICTED_LOCK:
+            _EVICTED_EVENTS.setdefault(engine.key, []).extend(events)
+            _EVICTED_EVENTS.move_to_end(engine.key)
+            while len(_EVICTED_EVENTS) > SESSION_REGISTRY.max_sessions:
+                key, dropped = _EVICTED_EVENTS.popitem(last=False)
+                logger.warning("Dropped %d rep events of evicted pose session %s", len(dropped), key)
+    if engine.recorder is not None:
+        # Stamped so a later engine of the same session does not overwrite these takes
+        _save_recording(engine, f"evicted-{int(time.time())}")
+
+
+# One ExerciseCounter per workout session so concurrent patients never share state
+SESSION_REGISTRY = SessionRegistry(
+    max_sessions=int(os.getenv("POSE_MAX_SESSIONS", "1000")),
+    idle_timeout=float(os.getenv("POSE_SESSION_IDLE_SECONDS", "900")),
+    # Opt-in capture of landmark streams for scripts/replay_benchmark.py
+    record_dir=os.getenv("POSE_RECORD_DIR") or None,
+    # Per-exercise smoothing overrides, e.g. {"squat": {"knee": {"type": "ema", "alpha": 0.6}}}
+    filters=json.loads(os.getenv("POSE_FILTERS", "{}")),
+    # Frames with no usable key landmarks, or that barely moved, skip the kernel; 0 turns a check off
+    gate={
+        "min_visibility": float(os.getenv("POSE_GATE_VISIBILITY", "0.6")),
+        "epsilon": float(os.getenv("POSE_GATE_EPSILON", "0.002")),
+    },
+    on_evict=_on_evict,
+)
+
+
+class PoseError(Exception):
+    """A frame the engine rejects; the API maps it onto an HTTP error."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def build_response(counter: ExerciseCounter, feedback: List[str]) -> Dict[str, Any]:
+    """Fields of schemas.exercise.ProcessResponse."""
+    return {
+        "squat_count": counter.squat_counter,
+        "curl_count": counter.curl_counter,
+        "shoulder_flexion_count": counter.shoulder_flexion_counter,
+        "knee_raise_count": counter.knee_raise_counter,
+        "total_reps": counter.total_reps,
+        "squat_state_name": counter.state_name('squat'),
+        "curl_state_name": counter.state_name('bicep-curl'),
+        "shoulder_flexion_state_name": counter.state_name('shoulder-flexion'),
+        "knee_raise_state_name": counter.state_name('knee-raise'),
+        "feedback": ", ".join(feedback) if feedback else "",
+    }
+
+
+def build_compact_response(counter: ExerciseCounter, exercise: str, feedback: List[str]) -> Dict[str, Any]:
+    """Fields of schemas.exercise.CompactProcessResponse: the current exercise only."""
+    return {
+        "exercise": exercise,
+        "count": counter.count(exercise),
+        "state": counter.state(exercise),
+        "state_name": counter.state_name(exercise),
+        "feedback": list(feedback),
+    }
+
+
+def _process(engine: EngineSession, exercise: str, landmarks: LandmarkFrame,
+             timestamp: Optional[float] = None) -> List[str]:
+    """Run one frame through the session's strategy and track rep progress."""
+    if engine.recorder is not None:
+        # Resolved here rather than by each strategy so the recording holds the time actually used
+        timestamp = BaseExerciseStrategy._now(timestamp)
+        if len(landmarks) >= NUM_LANDMARKS:
+            # The full stream, gated frames included, so replays see what the client sent
+            engine.recorder.add(exercise, landmarks.array, timestamp)
+    timed = METRICS.enabled
+    t = perf_counter_ns() if timed else 0
+    gate = engine.frame_gate(exercise)
+    admitted = gate is None or gate.admit(landmarks.array)
+    if timed:
+        t = METRICS.lap('gate', t)
+    if not admitted:
+        return engine.counter.feedback(exercise)
+
+    # Only the angles this exercise reads; memoized on the frame
+    angles = calculate_all_angles(landmarks, engine.counter.required_angles(exercise))
+    if timed:
+        t = METRICS.lap('angles', t)
+    if 'error' in angles:
+        raise PoseError(400, angles['error'])
+
+    _, feedback = engine.counter.process_frame(exercise, landmarks, angles, timestamp)
+    if timed:
+        METRICS.lap('strategy', t)
+    return feedback
+
+
+def _complete_step(engine: EngineSession) -> Optional[Dict[str, Any]]:
+    """The SessionDetail fields of the current step, once, when its rep target is reached."""
+    step = engine.step
+    if step is None or step.logged:
+        return None
+    reps = engine.counter.count(step.exercise)
+    if reps < step.target:
+        return None
+    step.logged = True
+    events = [e for e in engine.counter.rep_events[step.first_event:] if e.exercise == step.exercise]
+    return {
+        "exercise_type": step.exercise,
+        "reps_completed": reps,
+        "duration_seconds": int(time.time() - step.started_at),
+        "mistakes_count": sum(1 for e in events if not e.valid),
+        "accuracy_score": accuracy(events),
+    }
+
+
+def process_frame(key: str, exercise: str, landmarks: np.ndarray,
+                  timestamp: Optional[float] = None, compact: bool = False) -> Dict[str, Any]:
+    """
+    One (33, 4) frame; returns the ProcessResponse fields (CompactProcessResponse
+    with `compact`), plus the completed step under "step_completed" on the frame
+    that reaches the step's target.
+    """
+    frame = LandmarkFrame(landmarks)
+    with SESSION_REGISTRY.acquire(key) as engine:
+        feedback = _process(engine, exercise, frame, timestamp)
+        timed = METRICS.enabled
+        t = perf_counter_ns() if timed else 0
+        if compact:
+            response = build_compact_response(engine.counter, exercise, feedback)
+        else:
+            response = build_response(engine.counter, feedback)
+        if timed:
+            METRICS.lap('response', t)
+        step = _complete_step(engine)
+        if step is not None:
+            response["step_completed"] = step
+        return response
+
+
+def process_batch(key: str, exercise: str,
+                  frames: List[Tuple[Optional[float], np.ndarray]]) -> Dict[str, Any]:
+    """Timestamped frames in order; returns the ProcessBatchResponse fields (and "step_completed")."""
+    results = []
+    feedback: List[str] = []
+    step = None
+    with SESSION_REGISTRY.acquire(key) as engine:
+        counter = engine.counter
+        for timestamp, landmarks in frames:
+            feedback = _process(engine, exercise, LandmarkFrame(landmarks), timestamp)
+            step = step or _complete_step(engine)
+            results.append({
+                "timestamp": timestamp,
+                "count": counter.count(exercise),
+                "state_name": counter.state_name(exercise),
+                "feedback": ", ".join(feedback) if feedback else "",
+            })
+        response = {"frames": results, "final": build_response(counter, feedback)}
+        if step is not None:
+            response["step_completed"] = step
+        return response
+
+
+def process_multi(key: str, exercise: str, people: List[np.ndarray],
+                  timestamp: Optional[float] = None) -> List[Dict[str, Any]]:
+    """One frame with several skeletons; returns the TrackState fields per counted person."""
+    skeletons = [LandmarkFrame(person) for person in people]
+    with SESSION_REGISTRY.acquire(key) as engine:
+        results = engine.multi_tracker().process(exercise, skeletons, timestamp)
+    return [
+        {
+            "index": r.index, "track_id": r.track_id, "count": r.count, "state_name": r.state_name,
+            "feedback": ", ".join(r.feedback) if r.feedback else "",
+        }
+        for r in results
+    ]
+
+
+def reset_exercise(key: str, exercise: str, target: Optional[int] = None) -> None:
+    """Start `exercise` from zero; with a `target`, the engine logs the step itself when it is reached."""
+    with SESSION_REGISTRY.acquire(key) as engine:
+        if engine.recorder is not None:
+            engine.recorder.cut(exercise, engine.counter.count(exercise))
+        engine.counter.reset_state(exercise)
+        if exercise in engine.gates:
+            engine.gates[exercise].reset()
+        if engine.tracker is not None:
+            engine.tracker.reset(exercise)
+        engine.step = StepProgress(exercise, target, len(engine.counter.rep_events)) if target else None
+
+
+def start_calibration(key: str, exercise: str) -> None:
+    with SESSION_REGISTRY.acquire(key) as engine:
+        try:
+            engine.counter.start_calibration(exercise)
+        except CalibrationError as e:
+            raise PoseError(400, str(e))
+
+
+def finish_calibration(key: str, exercise: str) -> Dict[str, Any]:
+    """Fit the exercise's thresholds to the range recorded since start_calibration and apply them."""
+    with SESSION_REGISTRY.acquire(key) as engine:
+        try:
+            return engine.counter.finish_calibration(exercise)
+        except CalibrationError as e:
+            raise PoseError(400, str(e))
+
+
+def apply_profiles(key: str, profiles: Dict[str, Dict[str, float]]) -> None:
+    """Load a patient's calibrated thresholds into the session's strategies."""
+    with SESSION_REGISTRY.acquire(key) as engine:
+        engine.counter.apply_thresholds(profiles)
+        if engine.recorder is not None:
+            engine.recorder.profiles = profiles
+
+
+def gate_stats(key: str) -> Dict[str, Dict[str, float]]:
+    """Frames seen and skipped by the frame gate, per exercise."""
+    engine = SESSION_REGISTRY.peek(key)
+    if engine is None:
+        return {}
+    with engine.lock:
+        return {exercise: gate.stats() for exercise, gate in engine.gates.items()}
+
+
+def metrics_snapshot() -> Dict[str, Dict]:
+    """This process's raw stage histograms (see logic.metrics)."""
+    return METRICS.raw()
+
+
+def reset_metrics() -> None:
+    METRICS.reset()
+
+
+def claim_logged_step(key: str, exercise: str) -> bool:
+    """
+    True the first time a client logs a step the engine already logged, so
+    /session/log can answer with the existing row instead of a duplicate.
+    """
+    engine = SESSION_REGISTRY.peek(key)
+    if engine is None:
+        return False
+    with engine.lock:
+        step = engine.step
+        if step is None or step.exercise != exercise or not step.logged or step.claimed:
+            return False
+        step.claimed = True
+        return True
+
+
+def rep_summary(key: str, exercise: str) -> Optional[Dict[str, Any]]:
+    """Attempts, mistakes and accuracy (percent counted) of `exercise` so far; None if none were seen."""
+    engine = SESSION_REGISTRY.peek(key)
+    if engine is None:
+        return None
+    with engine.lock:
+        events = [e for e in engine.counter.rep_events if e.exercise == exercise]
+    if not events:
+        return None
+    valid = sum(1 for e in events if e.valid)
+    return {"attempts": len(events), "mistakes": len(events) - valid, "accuracy": accuracy(events)}
+
+
+def end_session(key: str) -> List[Dict[str, Any]]:
+    """
+    Drop the session's engine state, saving its landmark recording if one was
+    taken; returns the buffered rep events, with those of an engine the registry
+    evicted earlier, for the caller to persist.
+    """
+    with _EVICTED_LOCK:
+        evicted = _EVICTED_EVENTS.pop(key, [])
+    engine = SESSION_REGISTRY.discard(key)
+    if engine is None:
+        return [event._asdict() for event in evicted]
+    events = [event._asdict() for event in evicted + engine.counter.drain_rep_events()]
+    for exercise, gate in engine.gates.items():
+        logger.info("Frame gate %s %s: %s", engine.key, exercise, gate.stats())
+    if engine.recorder is not None:
+        _save_recording(engine)
+    return events
+
+
+def restore_rep_events(key: str, events: List[Dict[str, Any]]) -> None:
+    """Hand end_session's events back when persisting them failed, so the next end_session returns them again."""
+    with SESSION_REGISTRY.acquire(key) as engine:
+        engine.counter.rep_events[:0] = [RepEvent(**dict(e, feedback=tuple(e["feedback"]))) for e in events]
+
+
+def _save_recording(engine: EngineSession, suffix: str = "") -> None:
+    counts = {exercise: engine.counter.count(exercise) for exercise in engine.counter.strategies}
+    prefix = engine.key.replace(":", "-") + (f"-{suffix}" if suffix else "")
+    try:
+        paths = engine.recorder.save(SESSION_REGISTRY.record_dir, prefix, counts)
+        logger.info("Saved %d landmark recordings for %s", len(paths), engine.key)
+    except OSError as e:
+        # A failed capture must never fail the workout itself
+        logger.error("Saving landmark recording failed: %s", e)
@@ -0,0 +1,300 @@
+"""
+Declarative exercise definitions.
+
+An exercise spec (JSON in logic/specs/) lists the angle inputs and their
+smoothing, named threshold params, an optional left/right side selection,
+the phase transitions with their timing constraints, and feedback rules.
+`compile_spec()` turns it once into index-based tables: one tuple of
+transitions per state, conditions as (signal index, operator, param index)
+triples and feedback state sets as frozensets. `SpecStrategy` evaluates
+those tables per frame.
+
+Spec layout:
+
+    exercise     API key, e.g. "knee-raise"
+    aliases      display names mapped onto the key
+    states       state names; the index is the state value, the first is initial
+    params       named thresholds (per-instance, see SpecStrategy.set_param)
+    inputs       signal -> {"angle": key of calculate_all_angles,
+                            "filter": logic.filters spec, "hold": keep the last
+                            smoothed value while the angle is missing}
+    side         optional {"pick": "min" | "max", "of": {"left": s, "right": s},
+                           "signals": {name: {"left": s, "right": s}}}
+    require      signals that must be present for rules to run
+    transitions  [{"from", "to", "when": {signal: [op, param or number]},
+                   "min_duration": seconds in "from", "too_fast": feedback,
+                   "do": ["start_rep" | "count_rep"]}]
+    feedback     [{"states": [...], "when": {...}, "message", "priority",
+                   "invalidate": true to void the rep}]
+    rep          optional {"signal": s, "peak": "min" | "max", "concentric_first":
+                           bool}: the angle logic.reps follows through each rep
+    calibration  optional {param: [fraction, "<" | ">"]} fitted to the patient's
+                 range of the rep signal (see logic.calibration)
+"""
+import json
+import operator
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from .common import FeedbackPriority
+from .strategies.base import BaseExerciseStrategy
+
+SPEC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "specs")
+
+OPERATORS = {
+    '>': operator.gt,
+    '<': operator.lt,
+    '>=': operator.ge,
+    '<=': operator.le,
+}
+SIDES = ('left', 'right')
+
+
+class CompiledSpec:
+    """Index-based tables built from one exercise spec."""
+    __slots__ = (
+        'exercise', 'aliases', 'state_names', 'filters', 'param_index', 'param_defaults',
+        'inputs', 'n_signals', 'side', 'required', 'transitions', 'feedback', 'rep',
+        'calibration'
+    )
+
+
+def _priority(name: str) -> int:
+    return getattr(FeedbackPriority, name.upper())
+
+
+def compile_spec(spec: Dict[str, Any]) -> CompiledSpec:
+    exercise = spec['exercise']
+    compiled = CompiledSpec()
+    compiled.exercise = exercise
+    compiled.aliases = tuple(spec.get('aliases', ()))
+    compiled.state_names = tuple(spec['states'])
+    state_index = {name: i for i, name in enumerate(compiled.state_names)}
+
+    # Named params first, then one anonymous slot per numeric literal
+    compiled.param_index = {name: i for i, name in enumerate(spec.get('params', {}))}
+    compiled.param_defaults = [float(v) for v in spec.get('params', {}).values()]
+
+    def param(value) -> int:
+        if isinstance(value, str):
+            if value not in compiled.param_index:
+                raise ValueError(f"{exercise}: unknown param '{value}'")
+            return compiled.param_index[value]
+        compiled.param_defaults.append(float(value))
+        return len(compiled.param_defaults) - 1
+
+    signals: Dict[str, int] = {}
+    inputs = []
+    compiled.filters = {}
+    for name, definition in spec['inputs'].items():
+        signals[name] = len(inputs)
+        if definition.get('filter') is not None:
+            compiled.filters[name] = definition['filter']
+        inputs.append((definition['angle'], name, bool(definition.get('hold', False))))
+    compiled.inputs = tuple(inputs)
+
+    def signal(name: str) -> int:
+        if name not in signals:
+            raise ValueError(f"{exercise}: unknown signal '{name}'")
+        return signals[name]
+
+    compiled.side = None
+    side = spec.get('side')
+    if side:
+        side_signals = []
+        for name, by_side in side['signals'].items():
+            side_signals.append((signal(by_side['left']), signal(by_side['right'])))
+            signals[name] = len(signals)
+        compiled.side = (
+            signal(side['of']['left']), signal(side['of']['right']),
+            side.get('pick', 'min') == 'min', tuple(side_signals)
+        )
+    compiled.n_signals = len(signals)
+    compiled.required = tuple(signal(name) for name in spec.get('require', ()))
+    rep = spec.get('rep')
+    compiled.rep = (
+        signal(rep['signal']), rep.get('peak', 'min'), bool(rep.get('concentric_first', True))
+    ) if rep else None
+    compiled.calibration = {}
+    for name, (fraction, op) in spec.get('calibration', {}).items():
+        if name not in compiled.param_index:
+            raise ValueError(f"{exercise}: unknown param '{name}'")
+        if op not in ('<', '>'):
+            raise ValueError(f"{exercise}: unknown operator '{op}'")
+        compiled.calibration[name] = (float(fraction), op)
+
+    def conditions(when: Dict[str, List[Any]]) -> Tuple[Tuple[int, Any, int], ...]:
+        compiled_conditions = []
+        for name, (op, threshold) in when.items():
+            if op not in OPERATORS:
+                raise ValueError(f"{exercise}: unknown operator '{op}'")
+            compiled_conditions.append((signal(name), OPERATORS[op], param(threshold)))
+        return tuple(compiled_conditions)
+
+    def state(name: str) -> int:
+        if name not in state_index:
+            raise ValueError(f"{exercise}: unknown state '{name}'")
+        return state_index[name]
+
+    table: List[List[Tuple]] = [[] for _ in compiled.state_names]
+    for t in spec.get('transitions', ()):
+        actions = frozenset(t.get('do', ()))
+        if not actions <= {'start_rep', 'count_rep'}:
+            raise ValueError(f"{exercise}: unknown actions {sorted(actions - {'start_rep', 'count_rep'})}")
+        too_fast = t.get('too_fast')
+        table[state(t['from'])].append((
+            conditions(t['when']), state(t['to']),
+            'start_rep' in actions, 'count_rep' in actions,
+            float(t.get('min_duration', 0)),
+            (too_fast['message'], _priority(too_fast.get('priority', 'HIGH'))) if too_fast else None,
+        ))
+    compiled.transitions = tuple(tuple(transitions) for transitions in table)
+
+    compiled.feedback = tuple(
+        (
+            frozenset(state(s) for s in rule.get('states', compiled.state_names)),
+            conditions(rule.get('when', {})),
+            rule['message'], _priority(rule.get('priority', 'MEDIUM')), bool(rule.get('invalidate', False)),
+        )
+        for rule in spec.get('feedback', ())
+    )
+    return compiled
+
+
+def load_spec(path: str) -> CompiledSpec:
+    with open(path, encoding="utf-8") as f:
+        return compile_spec(json.load(f))
+
+
+_SPECS: Optional[Dict[str, CompiledSpec]] = None
+
+
+def load_specs() -> Dict[str, CompiledSpec]:
+    """All specs shipped in logic/specs, compiled once per process."""
+    global _SPECS
+    if _SPECS is None:
+        specs = {}
+        for filename in sorted(os.listdir(SPEC_DIR)):
+            if filename.endswith(".json"):
+                spec = load_spec(os.path.join(SPEC_DIR, filename))
+                specs[spec.exercise] = spec
+        _SPECS = specs
+    return _SPECS
+
+
+def _holds(conditions, values, params) -> bool:
+    for index, op, param in conditions:
+        value = values[index]
+        if value is None or not op(value, params[param]):
+            return False
+    return True
+
+
+class SpecStrategy(BaseExerciseStrategy):
+    """Runs a compiled exercise spec as a strategy."""
+
+    def __init__(self, spec: CompiledSpec, filters=None):
+        self.spec = spec
+        self.REQUIRED_ANGLES = frozenset(angle for angle, _, _ in spec.inputs)
+        super().__init__({**spec.filters, **(filters or {})})
+        self.params = list(spec.param_defaults)
+        self._values: List[Optional[float]] = [None] * spec.n_signals
+        self.state = 0
+        self.state_enter_time: Optional[float] = None
+        self.rep_valid = True
+        self.active_side: Optional[str] = None
+        # Conditions of the start_rep transition taken, while its state is still at rest
+        self._rest: Optional[Tuple] = None
+        if spec.rep is not None:
+            _, self.REP_PEAK, self.REP_CONCENTRIC_FIRST = spec.rep
+        self.CALIBRATION = spec.calibration
+
+    @property
+    def state_name(self) -> str:
+        return self.spec.state_names[self.state]
+
+    def set_param(self, name: str, value: float) -> None:
+        self.params[self.spec.param_index[name]] = float(value)
+
+    def get_threshold(self, name: str) -> float:
+        return self.params[self.spec.param_index[name]]
+
+    def set_threshold(self, name: str, value: float) -> None:
+        self.set_param(name, value)
+
+    def process(self, landmarks: List[Any], angles: Dict[str, Any],
+                timestamp: Optional[float] = None) -> Tuple[int, List[str]]:
+        now = self._now(timestamp)
+        spec = self.spec
+        values = self._values
+
+        for i, (angle, name, hold) in enumerate(spec.inputs):
+            raw = angles.get(angle)
+            if raw is not None:
+                values[i] = self._smooth(name, raw, now)
+            elif hold and name in self.filters:
+                values[i] = self.filters[name].value
+            else:
+                values[i] = None
+
+        if spec.side is not None:
+            left, right, pick_min, side_signals = spec.side
+            lv, rv = values[left], values[right]
+            if lv is not None and rv is not None:
+                side = 0 if (lv < rv if pick_min else lv > rv) else 1
+            else:
+                side = 0 if lv is not None else 1 if rv is not None else None
+            self.active_side = SIDES[side] if side is not None else None
+            base = len(spec.inputs)
+            for j, by_side in enumerate(side_signals):
+                values[base + j] = values[by_side[side]] if side is not None else None
+
+        for index in spec.required:
+            if values[index] is None:
+                return self.state, self.feedback_manager.get_feedback()
+
+        if spec.rep is not None:
+            if self._rest is not None and _holds(self._rest, values, self.params):
+                # The rep starts when the movement leaves rest, not when rest began
+                self._begin_rep(now)
+            self._sample_rep(values[spec.rep[0]], now)
+
+        params = self.params
+        feedback_manager = self.feedback_manager
+        for states, conditions, message, priority, invalidate in spec.feedback:
+            if self.state in states and _holds(conditions, values, params):
+                feedback_manager.add_feedback(message, priority)
+                if invalidate:
+                    self.rep_valid = False
+
+        for conditions, target, start_rep, count_rep, min_duration, too_fast in spec.transitions[self.state]:
+            if not _holds(conditions, values, params):
+                continue
+            if min_duration and self.state_enter_time is not None and now - self.state_enter_time < min_duration:
+                if too_fast is not None:
+                    feedback_manager.add_feedback(*too_fast)
+                self.rep_valid = False
+            if count_rep:
+                if self.rep_valid:
+                    self.counter += 1
+                    feedback_manager.complete_rep()
+                self._end_rep(now, self.rep_valid)
+                self.rep_valid = True
+            self._rest = conditions if start_rep else None
+            if start_rep:
+                self.rep_valid = True
+                feedback_manager.start_new_rep()
+                self._begin_rep(now)
+            self.state = target
+            self.state_enter_time = now
+            break
+
+        return self.state, feedback_manager.get_feedback()
+
+    def reset(self):
+        super().reset()
+        self.state = 0
+        self.state_enter_time = None
+        self.rep_valid = True
+        self.active_side = None
+        self._rest = None
+        self._values = [None] * self.spec.n_signals
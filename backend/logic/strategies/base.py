@@ -1,21 +1,127 @@
+import time
 from abc import ABC, abstractmethod
-from typing import List, Dict, Tuple, Any
+from typing import List, Dict, FrozenSet, Optional, Tuple, Any
 from ..common import Landmark
 from ..utils import FeedbackManager
+from ..filters import make_filter
+from ..reps import RepEvent, RepTracker
+from ..calibration import MAX_SAMPLES, derive_thresholds, patient_range
 
 class BaseExerciseStrategy(ABC):
-    def __init__(self):
+    # Angle features (logic.kernel.FEATURES) read by process(); None means the default set
+    REQUIRED_ANGLES: Optional[FrozenSet[str]] = None
+    # Smoothing per angle signal, as logic.filters specs; None means raw
+    FILTERS: Dict[str, Optional[Dict[str, Any]]] = {}
+    # Shape of the primary angle over one rep, for logic.reps.RepTracker
+    REP_PEAK = 'min'
+    REP_CONCENTRIC_FIRST = True
+    # Thresholds fitted to a patient's range, as {name: (fraction, op)}; see logic.calibration
+    CALIBRATION: Dict[str, Tuple[float, str]] = {}
+
+    def __init__(self, filters: Optional[Dict[str, Optional[Dict[str, Any]]]] = None):
         self.counter = 0
         self.state = 0
         self.feedback_manager = FeedbackManager()
         self.last_process_time = 0
+        self.filter_config = {**self.FILTERS, **(filters or {})}
+        self.filters = {
+            name: make_filter(spec) for name, spec in self.filter_config.items() if spec is not None
+        }
+        self.rep_trackers: Dict[str, RepTracker] = {}
+        # Finished attempts not yet collected by ExerciseCounter
+        self.rep_events: List[RepEvent] = []
+        # Primary-angle samples while calibrating, else None
+        self.calibration_samples: Optional[List[float]] = None
+        self._threshold_defaults: Optional[Dict[str, float]] = None
 
     @abstractmethod
-    def process(self, landmarks: List[Landmark], angles: Dict[str, Any]) -> Tuple[int, List[str]]:
+    def process(self, landmarks: List[Landmark], angles: Dict[str, Any],
+                timestamp: Optional[float] = None) -> Tuple[int, List[str]]:
         pass
 
+    @staticmethod
+    def _now(timestamp: Optional[float]) -> float:
+        """Capture time of the current frame, falling back to the server clock."""
+        return timestamp if timestamp is not None else time.time()
+
+    def _smooth(self, name: str, value: Optional[float], now: Optional[float] = None) -> Optional[float]:
+        """Feed `value` to the filter of signal `name`; missing samples and unfiltered signals pass through."""
+        f = self.filters.get(name)
+        if f is None or value is None:
+            return value
+        return f.update(value, now)
+
+    def _reset_filter(self, name: str) -> None:
+        f = self.filters.get(name)
+        if f is not None:
+            f.reset()
+
+    def _rep_tracker(self, track: str) -> RepTracker:
+        tracker = self.rep_trackers.get(track)
+        if tracker is None:
+            tracker = self.rep_trackers[track] = RepTracker(self.REP_PEAK, self.REP_CONCENTRIC_FIRST)
+        return tracker
+
+    def _begin_rep(self, now: float, track: str = 'rep') -> None:
+        self._rep_tracker(track).start(now)
+
+    def _sample_rep(self, angle: Optional[float], now: float, track: str = 'rep') -> None:
+        samples = self.calibration_samples
+        if samples is not None and angle is not None and len(samples) < MAX_SAMPLES:
+            samples.append(angle)
+        tracker = self.rep_trackers.get(track)
+        if tracker is not None:
+            tracker.sample(angle, now)
+
+    def _end_rep(self, now: float, counted: bool, track: str = 'rep') -> None:
+        """Close the open attempt on `track`; call after the count and FeedbackManager.complete_rep()."""
+        tracker = self.rep_trackers.get(track)
+        if tracker is None:
+            return
+        event = tracker.finish(now, self.counter, counted, self.feedback_manager.get_feedback())
+        if event is not None:
+            self.rep_events.append(event)
+
+    def get_threshold(self, name: str) -> float:
+        # Transition thresholds are attributes, feedback thresholds live in `self.thresholds`
+        return getattr(self, name) if hasattr(self, name) else self.thresholds[name]
+
+    def set_threshold(self, name: str, value: float) -> None:
+        if hasattr(self, name):
+            setattr(self, name, value)
+        else:
+            self.thresholds[name] = value
+
+    def _defaults(self) -> Dict[str, float]:
+        # Captured before the first change so recalibration starts from the shipped values
+        if self._threshold_defaults is None:
+            self._threshold_defaults = {name: self.get_threshold(name) for name in self.CALIBRATION}
+        return self._threshold_defaults
+
+    def apply_thresholds(self, thresholds: Dict[str, float]) -> None:
+        """Load a calibrated profile; names this strategy does not calibrate are ignored."""
+        self._defaults()
+        for name, value in thresholds.items():
+            if name in self.CALIBRATION:
+                self.set_threshold(name, float(value))
+
+    def start_calibration(self) -> None:
+        self.calibration_samples = []
+
+    def finish_calibration(self) -> Dict[str, Any]:
+        """Fit and apply thresholds to the recorded range; raises CalibrationError."""
+        samples, self.calibration_samples = self.calibration_samples or [], None
+        low, high = patient_range(samples)
+        thresholds = derive_thresholds(low, high, self.CALIBRATION, self._defaults())
+        self.apply_thresholds(thresholds)
+        return {"thresholds": thresholds, "range_min": low, "range_max": high, "sample_count": len(samples)}
+
     @abstractmethod
     def reset(self):
         self.counter = 0
         self.state = 0
         self.feedback_manager.clear_feedback()
+        for f in self.filters.values():
+            f.reset()
+        self.rep_trackers = {}
+        self.rep_events = []
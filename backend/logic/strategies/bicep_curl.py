@@ -1,12 +1,21 @@
-import time
 from typing import List, Dict, Optional, Tuple, Any
 from .base import BaseExerciseStrategy
 from ..common import BicepCurlState, FeedbackPriority
 from ..utils import AngleCalculator
 
 class BicepCurlStrategy(BaseExerciseStrategy):
-    def __init__(self):
-        super().__init__()
+    FILTERS = {'left_elbow': None, 'right_elbow': None}
+    CALIBRATION = {
+        'curl_up_threshold': (0.15, '<'),
+        'curl_start_threshold': (0.9, '>'),
+        'curl_down_threshold': (0.9, '>'),
+        'bicep_curl_not_high_enough': (0.22, '<'),
+        'bicep_curl_not_low_enough': (0.9, '>'),
+    }
+    REQUIRED_ANGLES = frozenset(('left_bicep_angle', 'right_bicep_angle', 'elbow_torso_result', 'hip_shoulder_angle'))
+
+    def __init__(self, filters=None):
+        super().__init__(filters)
         self.state = BicepCurlState.IDLE
         self.curl_start_threshold = 162
         self.curl_up_threshold = 60
@@ -29,12 +38,14 @@ class BicepCurlStrategy(BaseExerciseStrategy):
             'bicep_curl_elbow_dev_max': 25,
         }
 
-    def process(self, landmarks: List[Any], angles: Dict[str, Any]) -> Tuple[int, List[str]]:
+    def process(self, landmarks: List[Any], angles: Dict[str, Any],
+                timestamp: Optional[float] = None) -> Tuple[int, List[str]]:
+        now = self._now(timestamp)
         left_shoulder = landmarks[11]; left_elbow = landmarks[13]; left_wrist = landmarks[15]; left_hip = landmarks[23]
         right_shoulder = landmarks[12]; right_elbow = landmarks[14]; right_wrist = landmarks[16]; right_hip = landmarks[24]
         
-        left_bicep_angle = angles.get('left_bicep_angle')
-        right_bicep_angle = angles.get('right_bicep_angle')
+        left_bicep_angle = self._smooth('left_elbow', angles.get('left_bicep_angle'), now)
+        right_bicep_angle = self._smooth('right_elbow', angles.get('right_bicep_angle'), now)
         elbow_torso_result = angles.get('elbow_torso_result')
         hip_shoulder_angle = angles.get('hip_shoulder_angle')
         
@@ -72,6 +83,10 @@ class BicepCurlStrategy(BaseExerciseStrategy):
             self.active_arm_side = active_side
 
         if active_bicep_angle is not None:
+            if self.state == BicepCurlState.CURL_START and active_bicep_angle > self.curl_start_threshold:
+                # Still resting with the arm straight: the rep starts when the curl leaves rest
+                self._begin_rep(now)
+            self._sample_rep(active_bicep_angle, now)
             if (self.state in [BicepCurlState.IDLE, BicepCurlState.CURL_START]) and active_bicep_angle < self.thresholds['bicep_curl_not_low_enough']:
                 self.feedback_manager.add_feedback("Duỗi thẳng tay", FeedbackPriority.MEDIUM)
             
@@ -85,31 +100,34 @@ class BicepCurlStrategy(BaseExerciseStrategy):
 
             if self.state == BicepCurlState.IDLE and active_bicep_angle > self.curl_start_threshold:
                 self.state = BicepCurlState.CURL_START
-                self.state_enter_time = time.time()
+                self.state_enter_time = now
                 self.elbow_position_valid = True
                 self.feedback_manager.start_new_rep()
+                self._begin_rep(now)
                 
             elif self.state == BicepCurlState.CURL_START and active_bicep_angle < self.curl_up_threshold:
                 if self.state_enter_time is not None:
-                    duration = time.time() - self.state_enter_time
+                    duration = now - self.state_enter_time
                     if duration < self.min_concentric_time:
                         self.feedback_manager.add_feedback("Lên chậm thôi", FeedbackPriority.HIGH)
                         self.pending_rep_valid = False
                 
                 self.state = BicepCurlState.CURL_UP
-                self.state_enter_time = time.time()
+                self.state_enter_time = now
                 self.curl_start_shoulder = {'x': active_shoulder.x, 'y': active_shoulder.y} if active_shoulder else None
                 
             elif self.state == BicepCurlState.CURL_UP and active_bicep_angle > self.curl_down_threshold:
                 if self.state_enter_time is not None:
-                    duration = time.time() - self.state_enter_time
+                    duration = now - self.state_enter_time
                     if duration < self.min_eccentric_time:
                         self.feedback_manager.add_feedback("Xuống chậm thôi", FeedbackPriority.HIGH)
                         self.pending_rep_valid = False
                 
-                if self.pending_rep_valid and self.elbow_position_valid:
+                counted = self.pending_rep_valid and self.elbow_position_valid
+                if counted:
                     self.counter += 1
                     self.feedback_manager.complete_rep()
+                self._end_rep(now, counted)
                 
                 self.pending_rep_valid = True
                 self.elbow_position_valid = True
@@ -117,6 +135,7 @@ class BicepCurlStrategy(BaseExerciseStrategy):
                 self.curl_start_shoulder = None
                 self.state_enter_time = None
                 self.feedback_manager.start_new_rep()
+                self._begin_rep(now)
 
         if hip_shoulder_angle is not None and hip_shoulder_angle > self.thresholds['bicep_curl_body_swing']:
             self.feedback_manager.add_feedback("Đừng đung đưa người", FeedbackPriority.MEDIUM)
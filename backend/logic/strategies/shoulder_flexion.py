@@ -1,11 +1,22 @@
-import time
 from typing import List, Dict, Optional, Tuple, Any
 from .base import BaseExerciseStrategy
 from ..common import ShoulderFlexionState, FeedbackPriority
 
 class ShoulderFlexionStrategy(BaseExerciseStrategy):
-    def __init__(self):
-        super().__init__()
+    FILTERS = {
+        'left_elbow': {'type': 'mean', 'window': 3},
+        'right_elbow': {'type': 'mean', 'window': 3},
+    }
+    # Raised to the highest flexion angle, then lowered; one rep track per arm
+    REP_PEAK = 'max'
+    REP_CONCENTRIC_FIRST = True
+    CALIBRATION = {'flex_up_threshold': (0.9, '>')}
+    REQUIRED_ANGLES = frozenset((
+        'left_flexion_angle', 'right_flexion_angle', 'left_elbow_angle', 'right_elbow_angle', 'hip_shoulder_angle',
+    ))
+
+    def __init__(self, filters=None):
+        super().__init__(filters)
         self.state = ShoulderFlexionState.IDLE
         self.flex_start_threshold = 15
         self.flex_up_threshold = 145
@@ -19,8 +30,6 @@ class ShoulderFlexionStrategy(BaseExerciseStrategy):
         self.right_arm_valid = True
         self.left_arm_straight_valid = True
         self.right_arm_straight_valid = True
-        self.left_elbow_angles = []
-        self.right_elbow_angles = []
         
         self.thresholds = {
             'shoulder_flex_not_high_enough': 105,
@@ -31,16 +40,16 @@ class ShoulderFlexionStrategy(BaseExerciseStrategy):
     def _process_single_arm_flexion(
         self, flexion_angle: Optional[float], elbow_angle: Optional[float],
         arm_state: int, arm_enter_time: Optional[float], arm_valid: bool,
-        arm_straight_valid: bool, elbow_angles_list: List[float], arm_name: str
-    ) -> Tuple[int, Optional[float], bool, bool, List[float]]:
+        arm_straight_valid: bool, arm_name: str, now: float
+    ) -> Tuple[int, Optional[float], bool, bool]:
         if flexion_angle is None:
-            return arm_state, arm_enter_time, arm_valid, arm_straight_valid, elbow_angles_list
+            return arm_state, arm_enter_time, arm_valid, arm_straight_valid
+        elbow_filter = f"{arm_name}_elbow"
+        self._sample_rep(flexion_angle, now, arm_name)
             
         if arm_state in [ShoulderFlexionState.FLEXION_START, ShoulderFlexionState.FLEXION_UP, ShoulderFlexionState.FLEXION_DOWN]:
             if elbow_angle is not None:
-                elbow_angles_list.append(elbow_angle)
-                if len(elbow_angles_list) > 3: elbow_angles_list.pop(0)
-                avg_elbow = sum(elbow_angles_list) / len(elbow_angles_list)
+                avg_elbow = self._smooth(elbow_filter, elbow_angle, now)
                 if avg_elbow < self.thresholds['shoulder_flex_elbow_not_straight']:
                     self.feedback_manager.add_feedback(f"Thẳng tay {arm_name} ra!", FeedbackPriority.MEDIUM)
                     arm_straight_valid = False
@@ -50,28 +59,33 @@ class ShoulderFlexionStrategy(BaseExerciseStrategy):
         # State transitions
         if arm_state == ShoulderFlexionState.IDLE and flexion_angle > self.flex_start_threshold:
             arm_state = ShoulderFlexionState.FLEXION_START
-            arm_enter_time = time.time()
+            arm_enter_time = now
             arm_valid = True
             arm_straight_valid = True
-            elbow_angles_list = []
+            self._reset_filter(elbow_filter)
             self.feedback_manager.start_new_rep()
+            self._begin_rep(now, arm_name)
         elif arm_state == ShoulderFlexionState.FLEXION_START and flexion_angle > self.flex_up_threshold:
             arm_state = ShoulderFlexionState.FLEXION_UP
-            arm_enter_time = time.time()
+            arm_enter_time = now
         elif arm_state == ShoulderFlexionState.FLEXION_UP and flexion_angle < 70:
             arm_state = ShoulderFlexionState.FLEXION_DOWN
-            arm_enter_time = time.time()
+            arm_enter_time = now
         elif arm_state == ShoulderFlexionState.FLEXION_DOWN and flexion_angle < self.flex_down_threshold:
-            if arm_valid and arm_straight_valid:
+            counted = arm_valid and arm_straight_valid
+            if counted:
                 self.counter += 1
                 self.feedback_manager.complete_rep()
+            self._end_rep(now, counted, arm_name)
             arm_state = ShoulderFlexionState.IDLE
             arm_enter_time = None
-            elbow_angles_list = []
+            self._reset_filter(elbow_filter)
             
-        return arm_state, arm_enter_time, arm_valid, arm_straight_valid, elbow_angles_list
+        return arm_state, arm_enter_time, arm_valid, arm_straight_valid
 
-    def process(self, landmarks: List[Any], angles: Dict[str, Any]) -> Tuple[int, List[str]]:
+    def process(self, landmarks: List[Any], angles: Dict[str, Any],
+                timestamp: Optional[float] = None) -> Tuple[int, List[str]]:
+        now = self._now(timestamp)
         left_flexion_angle = angles.get('left_flexion_angle')
         right_flexion_angle = angles.get('right_flexion_angle')
         left_elbow_angle = angles.get('left_elbow_angle')
@@ -80,18 +94,18 @@ class ShoulderFlexionStrategy(BaseExerciseStrategy):
         
         # Process left arm
         (self.left_arm_state, self.left_arm_enter_time, self.left_arm_valid, 
-         self.left_arm_straight_valid, self.left_elbow_angles) = self._process_single_arm_flexion(
+         self.left_arm_straight_valid) = self._process_single_arm_flexion(
             left_flexion_angle, left_elbow_angle, self.left_arm_state, 
             self.left_arm_enter_time, self.left_arm_valid, self.left_arm_straight_valid,
-            self.left_elbow_angles, "left"
+            "left", now
         )
         
         # Process right arm
         (self.right_arm_state, self.right_arm_enter_time, self.right_arm_valid, 
-         self.right_arm_straight_valid, self.right_elbow_angles) = self._process_single_arm_flexion(
+         self.right_arm_straight_valid) = self._process_single_arm_flexion(
             right_flexion_angle, right_elbow_angle, self.right_arm_state, 
             self.right_arm_enter_time, self.right_arm_valid, self.right_arm_straight_valid,
-            self.right_elbow_angles, "right"
+            "right", now
         )
         
         # Determine active state for display
@@ -121,5 +135,3 @@ class ShoulderFlexionStrategy(BaseExerciseStrategy):
         self.right_arm_valid = True
         self.left_arm_straight_valid = True
         self.right_arm_straight_valid = True
-        self.left_elbow_angles = []
-        self.right_elbow_angles = []
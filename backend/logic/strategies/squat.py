@@ -1,12 +1,22 @@
-import time
 from typing import List, Dict, Optional, Tuple, Any
 from .base import BaseExerciseStrategy
 from ..common import SquatState, FeedbackPriority
 from ..utils import AngleCalculator
 
 class SquatStrategy(BaseExerciseStrategy):
-    def __init__(self):
-        super().__init__()
+    # Raw by default; e.g. {'knee': {'type': 'one_euro', 'beta': 0.05}} smooths the depth signal
+    FILTERS = {'knee': None}
+    # Down to the deepest knee angle, then back up
+    REP_PEAK = 'min'
+    REP_CONCENTRIC_FIRST = False
+    CALIBRATION = {'squat_threshold': (0.3, '<'), 'start_threshold': (0.85, '>')}
+    REQUIRED_ANGLES = frozenset((
+        'knee_angle_avg', 'back_angle', 'left_knee_angle_strict', 'right_knee_angle_strict',
+        'left_hip_angle', 'right_hip_angle',
+    ))
+
+    def __init__(self, filters=None):
+        super().__init__(filters)
         self.state = SquatState.IDLE
         self.start_threshold = 160
         self.squat_threshold = 95
@@ -30,29 +40,38 @@ class SquatStrategy(BaseExerciseStrategy):
             'squat_knee_valgus_min_ratio': 0.70,
         }
 
-    def process(self, landmarks: List[Any], angles: Dict[str, Any]) -> Tuple[int, List[str]]:
+    def process(self, landmarks: List[Any], angles: Dict[str, Any],
+                timestamp: Optional[float] = None) -> Tuple[int, List[str]]:
+        now = self._now(timestamp)
         left_hip = landmarks[23]; right_hip = landmarks[24]
         left_knee = landmarks[25]; right_knee = landmarks[26]
         left_ankle = landmarks[27]; right_ankle = landmarks[28]
         left_shoulder = landmarks[11]; right_shoulder = landmarks[12]
         
-        knee_angle = angles.get('knee_angle_avg')
+        knee_angle = self._smooth('knee', angles.get('knee_angle_avg'), now)
         back_angle = angles.get('back_angle')
         
-        # Calculate individual knee angles for symmetry
-        left_knee_angle = AngleCalculator.calculate_knee_angle(left_hip, left_knee, left_ankle, vt=0.7)
-        right_knee_angle = AngleCalculator.calculate_knee_angle(right_hip, right_knee, right_ankle, vt=0.7)
-        
         effective_knee_avg = knee_angle
         
-        # Calculate hip angles
-        left_hip_angle = None
-        if all(p.visibility > 0.6 for p in [left_shoulder, left_hip, left_knee]):
-            left_hip_angle = AngleCalculator.calculate_angle(left_shoulder, left_hip, left_knee)
-        
-        right_hip_angle = None
-        if all(p.visibility > 0.6 for p in [right_shoulder, right_hip, right_knee]):
-            right_hip_angle = AngleCalculator.calculate_angle(right_shoulder, right_hip, right_knee)
+        if 'left_hip_angle' in angles:
+            # Precomputed by the angle kernel
+            left_knee_angle = angles['left_knee_angle_strict']
+            right_knee_angle = angles['right_knee_angle_strict']
+            left_hip_angle = angles['left_hip_angle']
+            right_hip_angle = angles['right_hip_angle']
+        else:
+            # Calculate individual knee angles for symmetry
+            left_knee_angle = AngleCalculator.calculate_knee_angle(left_hip, left_knee, left_ankle, vt=0.7)
+            right_knee_angle = AngleCalculator.calculate_knee_angle(right_hip, right_knee, right_ankle, vt=0.7)
+            
+            # Calculate hip angles
+            left_hip_angle = None
+            if all(p.visibility > 0.6 for p in [left_shoulder, left_hip, left_knee]):
+                left_hip_angle = AngleCalculator.calculate_angle(left_shoulder, left_hip, left_knee)
+            
+            right_hip_angle = None
+            if all(p.visibility > 0.6 for p in [right_shoulder, right_hip, right_knee]):
+                right_hip_angle = AngleCalculator.calculate_angle(right_shoulder, right_hip, right_knee)
         
         hip_angle_avg = None
         if left_hip_angle is not None and right_hip_angle is not None:
@@ -73,6 +92,10 @@ class SquatStrategy(BaseExerciseStrategy):
         
         if not visible_knees and hip_angle_avg is None:
             return self.state, self.feedback_manager.get_feedback()
+        if self.state == SquatState.SQUAT_START and effective_knee_avg > self.start_threshold:
+            # Still standing: the rep starts when the descent leaves rest
+            self._begin_rep(now)
+        self._sample_rep(effective_knee_avg, now)
             
         knee_diff = abs(visible_knees[0] - visible_knees[1]) if len(visible_knees) == 2 else 0
         
@@ -89,15 +112,16 @@ class SquatStrategy(BaseExerciseStrategy):
         # State transitions
         if self.state == SquatState.IDLE and effective_knee_avg > self.start_threshold:
             self.state = SquatState.SQUAT_START
-            self.state_enter_time = time.time()
+            self.state_enter_time = now
             self.squat_start_hip_y = current_hip_y_avg
             self.squat_down_hip_y = None
             self.pending_rep_valid = True
             self.feedback_manager.start_new_rep()
+            self._begin_rep(now)
             
         elif self.state == SquatState.SQUAT_START and effective_knee_avg < self.squat_threshold:
             if self.state_enter_time is not None:
-                duration = time.time() - self.state_enter_time
+                duration = now - self.state_enter_time
                 if duration < 0.05: # Fast movement check
                     self.pending_rep_valid = False
             
@@ -112,7 +136,7 @@ class SquatStrategy(BaseExerciseStrategy):
             if symmetry_ok:
                 if hip_angle_avg is not None and hip_angle_avg < self.hip_angle_threshold:
                     self.state = SquatState.SQUAT_DOWN
-                    self.state_enter_time = time.time()
+                    self.state_enter_time = now
                     self.squat_down_hip_y = current_hip_y_avg
                 else:
                     if hip_angle_avg is not None:
@@ -130,8 +154,9 @@ class SquatStrategy(BaseExerciseStrategy):
                 self.squat_down_hip_y = max(self.squat_down_hip_y, current_hip_y_avg)
                 
             if effective_knee_avg > self.start_threshold:
+                counted = False
                 if self.state_enter_time is not None:
-                    duration = time.time() - self.state_enter_time
+                    duration = now - self.state_enter_time
                     if duration >= self.min_hold_time:
                         actual_drop = 0.0
                         if self.squat_down_hip_y is not None and self.squat_start_hip_y is not None:
@@ -142,18 +167,21 @@ class SquatStrategy(BaseExerciseStrategy):
                                 if self.pending_rep_valid:
                                     self.counter += 1
                                     self.feedback_manager.complete_rep()
+                                    counted = True
                         else:
                             self.feedback_manager.add_feedback("Lower hips!", FeedbackPriority.MEDIUM)
                     else:
                          self.feedback_manager.add_feedback(f"Hold longer ({self.min_hold_time}s)", FeedbackPriority.LOW)
                          return self.state, self.feedback_manager.get_feedback()
 
+                self._end_rep(now, counted)
                 self.pending_rep_valid = True
                 self.state = SquatState.SQUAT_START
                 self.squat_start_hip_y = current_hip_y_avg
                 self.squat_down_hip_y = None
                 self.state_enter_time = None
                 self.feedback_manager.start_new_rep()
+                self._begin_rep(now)
                 
         # Feedback back angle
         if back_angle is not None and self.state in [SquatState.SQUAT_START, SquatState.SQUAT_DOWN]:
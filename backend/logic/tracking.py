@@ -0,0 +1,121 @@
+"""
+Multi-person tracking for group sessions.
+
+Each frame may contain several skeletons. `MultiPersonTracker` gives them
+stable track IDs across frames and keeps one ExerciseCounter per track, so
+every person runs an independent strategy state machine.
+
+Association is greedy nearest-centroid: the torso centroid of every track is
+predicted with a constant-velocity step, all track/skeleton distances are
+computed in one NumPy call, and pairs are taken shortest first while both
+sides are free and the distance is within `max_distance` (normalized image
+units). With a handful of people this is a few microseconds per frame.
+"""
+import itertools
+from typing import Dict, List, NamedTuple, Optional
+import numpy as np
+from .common import LandmarkFrame
+from .counter import ExerciseCounter
+from .kernel import NUM_LANDMARKS, calculate_all_angles
+
+# Shoulders and hips: stable under arm and leg movement
+_TORSO = (11, 12, 23, 24)
+
+
+class Track:
+    """One person followed across frames."""
+    __slots__ = ('track_id', 'counter', 'centroid', 'velocity', 'missed')
+
+    def __init__(self, track_id: int, centroid: np.ndarray, filters: Optional[Dict] = None):
+        self.track_id = track_id
+        self.counter = ExerciseCounter(filters)
+        self.centroid = centroid
+        self.velocity = np.zeros(2)
+        self.missed = 0
+
+    def predicted(self) -> np.ndarray:
+        return self.centroid + self.velocity
+
+
+class TrackResult(NamedTuple):
+    index: int          # position of the skeleton in the request
+    track_id: int
+    count: int
+    state_name: str
+    feedback: List[str]
+
+
+def torso_centroid(frame: LandmarkFrame, min_visibility: float = 0.5) -> np.ndarray:
+    """Mean x, y of the visible shoulders and hips, or of all landmarks if none are visible."""
+    torso = frame.array[_TORSO, :]
+    visible = torso[torso[:, 3] > min_visibility]
+    points = visible if len(visible) else frame.array[:NUM_LANDMARKS]
+    return points[:, :2].mean(axis=0)
+
+
+class MultiPersonTracker:
+    def __init__(self, max_tracks: int = 6, max_distance: float = 0.2, max_missed: int = 30,
+                 filters: Optional[Dict] = None):
+        self.max_tracks = max_tracks
+        self.max_distance = max_distance
+        self.max_missed = max_missed
+        self.filters = filters
+        self.tracks: List[Track] = []
+        self._ids = itertools.count(1)
+
+    def associate(self, centroids: np.ndarray) -> List[Optional[Track]]:
+        """Match skeleton centroids (P, 2) to tracks; returns the track of each skeleton."""
+        assigned: List[Optional[Track]] = [None] * len(centroids)
+        matched = set()
+        if self.tracks and len(centroids):
+            predicted = np.array([t.predicted() for t in self.tracks])
+            distances = np.linalg.norm(predicted[:, None, :] - centroids[None, :, :], axis=2)
+            n_people = len(centroids)
+            for flat in np.argsort(distances, axis=None).tolist():
+                t, p = divmod(flat, n_people)
+                if distances[t, p] > self.max_distance:
+                    break
+                if t in matched or assigned[p] is not None:
+                    continue
+                matched.add(t)
+                track = self.tracks[t]
+                assigned[p] = track
+                track.velocity = centroids[p] - track.centroid
+                track.centroid = centroids[p]
+                track.missed = 0
+
+        for t, track in enumerate(self.tracks):
+            if t not in matched:
+                track.missed += 1
+                track.velocity = np.zeros(2)
+        self.tracks = [t for t in self.tracks if t.missed <= self.max_missed]
+
+        for p, track in enumerate(assigned):
+            if track is None and len(self.tracks) < self.max_tracks:
+                track = Track(next(self._ids), centroids[p], self.filters)
+                self.tracks.append(track)
+                assigned[p] = track
+        return assigned
+
+    def process(self, exercise: str, skeletons: List[LandmarkFrame],
+                timestamp: Optional[float] = None) -> List[TrackResult]:
+        """Run every skeleton of one frame through the counter of its track."""
+        centroids = np.array([torso_centroid(s) for s in skeletons]).reshape(-1, 2)
+        results = []
+        for index, (skeleton, track) in enumerate(zip(skeletons, self.associate(centroids))):
+            if track is None:
+                # More people than max_tracks: the extras are not counted
+                continue
+            counter = track.counter
+            angles = calculate_all_angles(skeleton, counter.required_angles(exercise))
+            if 'error' in angles:
+                continue
+            _, feedback = counter.process_frame(exercise, skeleton, angles, timestamp)
+            results.append(TrackResult(
+                index, track.track_id, counter.count(exercise), counter.state_name(exercise), list(feedback)
+            ))
+        return results
+
+    def reset(self, exercise: str) -> None:
+        for track in self.tracks:
+            track.counter.reset_state(exercise)
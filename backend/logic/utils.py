@@ -1,69 +1,96 @@
+import heapq
 import math
-from typing import List
-from .common import Landmark, FeedbackPriority
+from typing import Dict, List, Optional
+from .common import Landmark, LandmarkView, FeedbackPriority
+
+_STATE_TABLES: Dict[type, Dict[int, str]] = {}
+
+
+def state_names(state_class) -> Dict[int, str]:
+    """Value -> name table of a state class (e.g. SquatState), built once per class."""
+    table = _STATE_TABLES.get(state_class)
+    if table is None:
+        table = {v: k for k, v in vars(state_class).items() if isinstance(v, int)}
+        _STATE_TABLES[state_class] = table
+    return table
+
 
 def get_state_name(state_class, state_value):
-    state_dict = {v: k for k, v in state_class.__dict__.items() if isinstance(v, int)}
-    return state_dict.get(state_value, "UNKNOWN")
+    return state_names(state_class).get(state_value, "UNKNOWN")
 
 class FeedbackManager:
+    """
+    Per-rep feedback aggregation.
+
+    `feedback_window` is a fixed-size ring buffer of the last `window_size`
+    messages with incremental per-message counts; a message becomes current
+    feedback once it holds a strict majority of the window. `priority_queue`
+    is a min-heap of the `2 * window_size` highest-priority messages of the
+    rep, keyed (priority, -seq) so that the root is the entry evicted first.
+    """
+    __slots__ = (
+        'window_size', 'feedback_window', '_window_head', '_window_len', '_counts',
+        'current_feedback', 'priority_queue', '_seq', 'rep_completed', 'rep_summary'
+    )
+
     def __init__(self, window_size: int = 5):
-        self.feedback_window = []
         self.window_size = window_size
-        self.current_feedback = []
-        self.priority_queue = []
-        self.rep_completed = False
-        self.rep_summary = []
+        self.feedback_window: List[Optional[str]] = [None] * window_size
+        self.clear_feedback()
 
     def start_new_rep(self):
-        self.feedback_window = []
-        self.current_feedback = []
-        self.priority_queue = []
-        self.rep_completed = False
-        self.rep_summary = []
+        self.clear_feedback()
 
     def complete_rep(self):
-        self._process_feedback()
-        high_pri = [self.priority_queue[0]['feedback']] if self.priority_queue else []
+        # The best entry: highest priority, oldest first among equals
+        high_pri = [max(self.priority_queue)[2]] if self.priority_queue else []
         frequent = list(self.current_feedback)
-        
+
         all_feedback = list(set(high_pri + frequent))
-        
-        def sort_key(feedback):
-            max_pri = FeedbackPriority.LOW
-            for item in self.priority_queue:
-                if item['feedback'] == feedback:
-                    max_pri = max(max_pri, -item['priority'])
-            return max_pri
-
-        all_feedback.sort(key=sort_key, reverse=True)
+        if len(all_feedback) > 1:
+            max_pri = {}
+            for priority, _, feedback in self.priority_queue:
+                if priority > max_pri.get(feedback, FeedbackPriority.LOW):
+                    max_pri[feedback] = priority
+            all_feedback.sort(key=lambda feedback: max_pri.get(feedback, FeedbackPriority.LOW), reverse=True)
         self.rep_summary = all_feedback[:2]
         self.rep_completed = True
 
     def add_feedback(self, feedback: str, priority: int):
-        self.priority_queue.append({'priority': -priority, 'feedback': feedback})
-        self.priority_queue.sort(key=lambda x: x['priority'])
-        if len(self.priority_queue) > self.window_size * 2:
-            self.priority_queue = self.priority_queue[:self.window_size * 2]
-        self.feedback_window.append({'feedback': feedback, 'priority': priority})
-        if len(self.feedback_window) > self.window_size:
-            self.feedback_window.pop(0)
-        self._process_feedback()
-
-    def _process_feedback(self):
-        feedback_count = {}
-        for item in self.feedback_window:
-            feedback = item['feedback']
-            feedback_count[feedback] = feedback_count.get(feedback, 0) + 1
-        
-        threshold = math.floor(len(self.feedback_window) / 2)
-        self.current_feedback = [key for key, count in feedback_count.items() if count > threshold]
+        self._seq += 1
+        entry = (priority, -self._seq, feedback)
+        if len(self.priority_queue) < self.window_size * 2:
+            heapq.heappush(self.priority_queue, entry)
+        elif entry > self.priority_queue[0]:
+            heapq.heapreplace(self.priority_queue, entry)
+
+        counts = self._counts
+        if self._window_len == self.window_size:
+            oldest = self.feedback_window[self._window_head]
+            counts[oldest] -= 1
+            if not counts[oldest]:
+                del counts[oldest]
+        else:
+            self._window_len += 1
+        self.feedback_window[self._window_head] = feedback
+        self._window_head = (self._window_head + 1) % self.window_size
+        counts[feedback] = counts.get(feedback, 0) + 1
+
+        # Only the new message or the previous majority can hold a majority now
+        threshold = self._window_len // 2
+        previous = self.current_feedback[0] if self.current_feedback else None
+        if counts.get(previous, 0) > threshold:
+            return
+        self.current_feedback = [feedback] if counts[feedback] > threshold else []
 
     def get_feedback(self) -> List[str]:
         return self.rep_summary if self.rep_completed else self.current_feedback
 
     def clear_feedback(self):
-        self.feedback_window = []
+        self._window_head = 0
+        self._window_len = 0
+        self._counts = {}
+        self._seq = 0
         self.current_feedback = []
         self.priority_queue = []
         self.rep_completed = False
@@ -92,7 +119,7 @@ class AngleCalculator:
     @staticmethod
     def angle_deg(p1, pref, p2) -> float:
         def get_coords(p):
-            if isinstance(p, Landmark): return [p.x, p.y]
+            if isinstance(p, (Landmark, LandmarkView)): return [p.x, p.y]
             elif isinstance(p, (list, tuple)): return p[:2]
             return [0, 0]
         p1c = get_coords(p1); prc = get_coords(pref); p2c = get_coords(p2)
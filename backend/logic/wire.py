@@ -0,0 +1,94 @@
+"""
+Compact binary encoding for one frame of pose landmarks.
+
+Layout (little-endian), 16-byte header followed by the landmark payload:
+
+    offset  size  field
+    0       2     magic b"LM"
+    2       1     version (1)
+    3       1     dtype code: 0 = float32, 1 = float16
+    4       1     exercise code (index into EXERCISE_CODES)
+    5       1     landmark count (33 for MediaPipe Pose)
+    6       2     reserved (zero)
+    8       8     capture timestamp in seconds (float64, NaN when unknown)
+    16      ...   count x 4 values (x, y, z, visibility) of the given dtype
+
+A float32 frame is 544 bytes against roughly 3 KB of JSON, and decoding is a
+zero-copy numpy view over the received buffer.
+
+Exercise codes cover every registered exercise: the built-in strategies keep
+codes 0-3 and exercises defined only by a spec in logic/specs follow in name
+order. Clients read the table from /api/exercises/config ("wire_codes").
+"""
+import math
+import struct
+from typing import Iterable, NamedTuple, Optional, Tuple
+import numpy as np
+from .counter import EXERCISE_STATES
+from .spec import load_specs
+
+MAGIC = b"LM"
+VERSION = 1
+HEADER = struct.Struct("<2sBBBBxxd")
+
+DTYPES = (np.dtype("<f4"), np.dtype("<f2"))
+
+
+def exercise_codes(spec_exercises: Iterable[str]) -> Tuple[str, ...]:
+    """The code table: built-in exercises first, then spec-only ones sorted by name."""
+    builtin = tuple(EXERCISE_STATES)
+    return builtin + tuple(sorted(set(spec_exercises) - set(builtin)))
+
+
+EXERCISE_CODES = exercise_codes(load_specs())
+if len(EXERCISE_CODES) > 256:
+    raise RuntimeError("more exercises than the one-byte wire code can address")
+_CODE_OF = {exercise: code for code, exercise in enumerate(EXERCISE_CODES)}
+
+
+class WireFormatError(ValueError):
+    """Raised when a binary frame cannot be decoded."""
+
+
+class DecodedFrame(NamedTuple):
+    exercise: str
+    timestamp: Optional[float]
+    landmarks: np.ndarray  # (count, 4) read-only view over the input buffer
+
+
+def encode_frame(exercise: str, landmarks, timestamp: Optional[float] = None, dtype: str = "float32") -> bytes:
+    """Encode one frame; `landmarks` is anything convertible to a (N, 4) array."""
+    dtype_code = 0 if np.dtype(dtype) == np.float32 else 1
+    exercise_code = _CODE_OF.get(exercise)
+    if exercise_code is None:
+        raise WireFormatError(f"exercise {exercise!r} has no wire code")
+    data = np.ascontiguousarray(landmarks, dtype=DTYPES[dtype_code])
+    if data.ndim != 2 or data.shape[1] != 4:
+        raise WireFormatError("landmarks must have shape (N, 4)")
+    header = HEADER.pack(
+        MAGIC, VERSION, dtype_code, exercise_code, data.shape[0],
+        math.nan if timestamp is None else timestamp
+    )
+    return header + data.tobytes()
+
+
+def decode_frame(buffer) -> DecodedFrame:
+    """Decode a frame produced by `encode_frame` without copying the payload."""
+    view = memoryview(buffer)
+    if view.nbytes < HEADER.size:
+        raise WireFormatError("frame is shorter than its header")
+    magic, version, dtype_code, exercise_code, count, timestamp = HEADER.unpack_from(view)
+    if magic != MAGIC or version != VERSION:
+        raise WireFormatError("unsupported frame format")
+    if dtype_code >= len(DTYPES) or exercise_code >= len(EXERCISE_CODES):
+        raise WireFormatError("unknown dtype or exercise code")
+    dtype = DTYPES[dtype_code]
+    if view.nbytes != HEADER.size + count * 4 * dtype.itemsize:
+        raise WireFormatError("payload size does not match landmark count")
+
+    landmarks = np.frombuffer(view, dtype=dtype, count=count * 4, offset=HEADER.size).reshape(count, 4)
+    return DecodedFrame(
+        EXERCISE_CODES[exercise_code],
+        None if math.isnan(timestamp) else timestamp,
+        landmarks
+    )
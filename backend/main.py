@@ -6,11 +6,14 @@ from fastapi.exceptions import RequestValidationError
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 import logging
+from time import perf_counter_ns
 
 from database import engine, Base, get_db
 from dependencies import validate_environment, get_current_user
 from models import User
-from routers import auth, patients, medical_records, assignments, schedules, messages, exercises, dashboard, doctors, plans, notifications, ai_chat, wearable, admin
+from exercise_logic import POSE_EXECUTOR
+from logic.metrics import METRICS
+from routers import auth, patients, medical_records, assignments, schedules, messages, exercises, dashboard, doctors, plans, notifications, ai_chat, wearable, admin, websockets
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -20,7 +23,14 @@ async def lifespan(app: FastAPI):
         print(" Environment variables validated")
     except RuntimeError as e:
         print(f" Startup Error: {e}")
+    exercises.SESSION_LOG_WRITER.start()
+    await websockets.manager.start()
+    websockets.telemetry.start()
     yield
+    await websockets.telemetry.stop()
+    await websockets.manager.stop()
+    await exercises.SESSION_LOG_WRITER.stop()
+    POSE_EXECUTOR.shutdown()
 
 # Initialize database tables on module load (Supported by Vercel cold starts)
 try:
@@ -50,6 +60,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Whole-request time of pose calls (body parsing and encoding included), next to the
+# per-stage timers; registered only with POSE_METRICS=1
+if METRICS.enabled:
+    @app.middleware("http")
+    async def pose_request_timer(request: Request, call_next):
+        if not request.url.path.startswith("/api/process_landmarks"):
+            return await call_next(request)
+        start = perf_counter_ns()
+        response = await call_next(request)
+        METRICS.lap('request', start)
+        return response
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -114,6 +136,7 @@ app.include_router(notifications.router)
 app.include_router(ai_chat.router)
 app.include_router(wearable.router)
 app.include_router(admin.router)
+app.include_router(websockets.router)
 
 # === Legacy/Compatibility Endpoints ===
 @app.get("/api/doctor-id")
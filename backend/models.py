@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Date, Text, Numeric
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Date, Text, Numeric, Float
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -22,6 +22,9 @@ class User(Base):
     last_active_at = Column(DateTime(timezone=True), nullable=True)
     status = Column(String(20), default=PatientStatus.ACTIVE.value)
 
+    # Kept in step with notifications by notification_store.py; the header badge reads only this
+    unread_notifications = Column(Integer, default=0, server_default="0", nullable=False)
+
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
@@ -164,6 +167,7 @@ class WorkoutSession(Base):
 
     user = relationship("User", back_populates="workout_sessions")
     details = relationship("SessionDetail", back_populates="session")
+    rep_events = relationship("RepEvent", back_populates="session")
 
 class SessionDetail(Base):
     __tablename__ = "session_details"
@@ -181,6 +185,40 @@ class SessionDetail(Base):
 
     session = relationship("WorkoutSession", back_populates="details")
 
+class RepEvent(Base):
+    __tablename__ = "rep_events"
+
+    event_id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(UUID(as_uuid=True), ForeignKey("workout_sessions.session_id"), index=True)
+    exercise_type = Column(String(50), nullable=False)
+    rep_index = Column(Integer, nullable=False)
+    is_valid = Column(Boolean, nullable=False)
+    start_time = Column(Float)  # capture time of the frames, epoch seconds
+    end_time = Column(Float)
+    min_angle = Column(Float)
+    max_angle = Column(Float)
+    concentric_seconds = Column(Float)
+    eccentric_seconds = Column(Float)
+    feedback = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+    session = relationship("WorkoutSession", back_populates="rep_events")
+
+class ExerciseCalibration(Base):
+    __tablename__ = "exercise_calibrations"
+
+    calibration_id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.user_id"), nullable=False, index=True)
+    exercise_type = Column(String(50), nullable=False)
+    thresholds = Column(Text, nullable=False) # JSON encoded {threshold name: degrees}
+    range_min = Column(Float)
+    range_max = Column(Float)
+    sample_count = Column(Integer)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    user = relationship("User", backref="exercise_calibrations")
+
 class BrainExerciseLog(Base):
     __tablename__ = "brain_exercise_logs"
 
@@ -0,0 +1,39 @@
+"""
+Notifications with a per-user unread counter.
+
+`users.unread_notifications` is updated in the same transaction as the rows
+it counts (on insert and on mark-all-read), so the header badge is one
+primary-key read however long a user's history is. Every write to
+notifications goes through here to keep the two in step.
+"""
+from typing import Optional
+from uuid import UUID
+from sqlalchemy.orm import Session
+from models import Notification, User
+
+
+def add_notification(db: Session, user_id: UUID, title: Optional[str], message: str,
+                     type: str = "info") -> Notification:
+    """Queue a notification and bump its user's unread counter; the caller commits."""
+    notification = Notification(user_id=user_id, title=title, message=message, type=type, is_read=False)
+    db.add(notification)
+    db.query(User).filter(User.user_id == user_id).update(
+        {User.unread_notifications: User.unread_notifications + 1}, synchronize_session=False
+    )
+    return notification
+
+
+def mark_all_read(db: Session, user_id: UUID) -> None:
+    """Mark every notification of the user read and zero the counter; the caller commits."""
+    db.query(Notification).filter(
+        Notification.user_id == user_id,
+        Notification.is_read == False
+    ).update({Notification.is_read: True}, synchronize_session=False)
+    db.query(User).filter(User.user_id == user_id).update(
+        {User.unread_notifications: 0}, synchronize_session=False
+    )
+
+
+def unread_count(db: Session, user_id: UUID) -> int:
+    count = db.query(User.unread_notifications).filter(User.user_id == user_id).scalar()
+    return count or 0
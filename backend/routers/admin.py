@@ -15,6 +15,8 @@ from database import get_db
 from dependencies import get_current_admin
 from enums import DoctorApprovalStatus, UserRole
 from models import DoctorVerification, User
+from exercise_logic import POSE_EXECUTOR, pose_service
+from logic.metrics import METRICS, summarize
 
 
 router = APIRouter(
@@ -224,3 +226,20 @@ async def reject_doctor_registration(
     )
 
     return {"message": "Doctor rejected successfully"}
+
+
+@router.get("/metrics/pose")
+async def get_pose_metrics(
+    reset: bool = False,
+    _admin: User = Depends(get_current_admin),
+):
+    """Per-stage pose pipeline timings (POSE_METRICS=1), merged across pose workers."""
+    raws = await POSE_EXECUTOR.broadcast(pose_service.metrics_snapshot)
+    if POSE_EXECUTOR.workers:
+        # Worker processes time the engine stages; the API process times convert/serialize/request
+        raws.append(METRICS.raw())
+    if reset:
+        await POSE_EXECUTOR.broadcast(pose_service.reset_metrics)
+        if POSE_EXECUTOR.workers:
+            METRICS.reset()
+    return {"enabled": METRICS.enabled, "workers": POSE_EXECUTOR.workers, "stages": summarize(raws)}
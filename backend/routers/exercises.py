@@ -1,23 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Union
+import asyncio
+import logging
 from uuid import UUID
 from datetime import date
-from database import get_db
-from models import User, WorkoutSession, SessionDetail, BrainExerciseLog, BrainExerciseSession, Assignment, WeekPlan
+from database import get_db, SessionLocal
+from models import User, WorkoutSession, SessionDetail, RepEvent, BrainExerciseLog, BrainExerciseSession, Assignment, WeekPlan
 
 from dependencies import get_current_user
 from middleware.ownership import ResourceAccess
+from routers.websockets import authenticate_session_websocket
 from enums import ExerciseType, DAILY_TARGETS
 from schemas.exercise import (
     WorkoutSessionCreate, SessionDetailCreate,
-    ProcessRequest, ProcessResponse, WorkoutSessionResponse, SessionDetailResponse
+    ProcessRequest, ProcessResponse, CompactProcessResponse, WorkoutSessionResponse, SessionDetailResponse,
+    LandmarkData, ProcessBatchRequest, ProcessBatchResponse, PoseStreamFrame,
+    MultiPersonRequest, MultiPersonResponse, TrackState, CalibrationResponse
 )
+from session_log import SessionDetailWriter
+from calibration_store import CALIBRATION_CACHE, save_calibration
 from exercise_logic import (
-    Landmark, EXERCISE_COUNTER, SquatState, 
-    BicepCurlState, ShoulderFlexionState, KneeRaiseState,
-    calculate_all_angles, get_state_name, prev_reps
+    POSE_EXECUTOR, PoseError, pose_service, decode_frame, WireFormatError, EXERCISE_CODES, load_specs
 )
+import numpy as np
+from time import perf_counter_ns
+from logic.metrics import METRICS
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/api",
@@ -32,14 +43,65 @@ async def get_exercises_config(current_user: User = Depends(get_current_user)):
             {"id": e.value, "name": e.value.replace("-", " ").title(), "icon": "Dumbbell"} 
             for e in ExerciseType
         ],
-        "daily_targets": {k.value: v for k, v in DAILY_TARGETS.items()}
+        "daily_targets": {k.value: v for k, v in DAILY_TARGETS.items()},
+        # Exercise codes of the binary frame header (logic/wire.py), by code
+        "wire_codes": list(EXERCISE_CODES),
     }
 
+# Patient of each workout session the pose endpoints have seen; sessions never change hands
+_SESSION_OWNERS: Dict[UUID, UUID] = {}
+SESSION_OWNER_CACHE_SIZE = 4096
+
+
+def _session_owner(db: Session, session_id: UUID) -> Optional[UUID]:
+    owner = _SESSION_OWNERS.get(session_id)
+    if owner is None:
+        owner = db.query(WorkoutSession.user_id).filter(WorkoutSession.session_id == session_id).scalar()
+        if owner is not None:
+            if len(_SESSION_OWNERS) >= SESSION_OWNER_CACHE_SIZE:
+                _SESSION_OWNERS.clear()
+            _SESSION_OWNERS[session_id] = owner
+    return owner
+
+
+def session_key(session_id: UUID) -> str:
+    """Engine key of a workout session the caller was already checked against."""
+    return f"session:{session_id}"
+
+
+def engine_session_key(session_id: Optional[str], user_id: Optional[str], current_user: User, db: Session) -> str:
+    """
+    Key of the pose-analysis state owned by a workout session (or, failing
+    that, the caller). Only the session's own patient may feed or reset it.
+    """
+    if session_id:
+        try:
+            session_uuid = UUID(session_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid session_id")
+        owner = _session_owner(db, session_uuid)
+        if owner is None:
+            raise HTTPException(status_code=404, detail="Workout session not found")
+        if owner != current_user.user_id:
+            raise HTTPException(status_code=403, detail="Access denied")
+        return session_key(session_uuid)
+    if user_id and user_id != str(current_user.user_id):
+        raise HTTPException(status_code=403, detail="Access denied")
+    return f"user:{current_user.user_id}"
+
 @router.post("/select_exercise")
-async def select_exercise(exercise_name: str):
-    """Reset state for a specific exercise"""
-    EXERCISE_COUNTER.reset_state(exercise_name)
-    prev_reps[exercise_name] = 0
+async def select_exercise(
+    exercise_name: str, session_id: Optional[str] = None, user_id: Optional[str] = None,
+    target_reps: Optional[int] = None,
+    db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
+):
+    """
+    Reset state for a specific exercise. With a workout session and
+    `target_reps`, the step is logged server-side once the target is reached.
+    """
+    key = engine_session_key(session_id, user_id, current_user, db)
+    target = target_reps if session_id and target_reps and target_reps > 0 else None
+    await _run_pose(key, pose_service.reset_exercise, exercise_name, target)
     return {"message": f"State reset for {exercise_name}"}
 
 # Mapping display names/Vietnamese names to strict API keys
@@ -54,6 +116,10 @@ EXERCISE_NAME_MAPPING = {
     "Nâng đầu gối": "knee-raise",
     "Knee Raise": "knee-raise"
 }
+# Exercises shipped as specs bring their own display names
+for _spec in load_specs().values():
+    for _alias in _spec.aliases:
+        EXERCISE_NAME_MAPPING.setdefault(_alias, _spec.exercise)
 
 
 def normalize_exercise_type(name: str) -> str:
@@ -127,112 +193,285 @@ def mark_today_assignment_completed(db: Session, user_id: UUID, exercise_type: s
         if normalize_exercise_type(assignment.exercise_type) == normalized_logged_exercise:
             assignment.is_completed = True
 
-@router.post("/process_landmarks", response_model=ProcessResponse)
-async def process_landmarks_api(request: ProcessRequest):
+# Completed steps reported by the pose engine, written behind the frame requests
+SESSION_LOG_WRITER = SessionDetailWriter(SessionLocal, mark_today_assignment_completed)
+
+def normalize_current_exercise(name: str) -> str:
+    """Robust Name Mapping: Convert display names into strict API keys"""
+    return EXERCISE_NAME_MAPPING.get(name, name)
+
+
+def _to_array(landmarks: List[LandmarkData]) -> np.ndarray:
+    # Pack schemas.LandmarkData into one (N, 4) array; it is what crosses to the pose worker
+    return np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in landmarks], dtype=np.float64)
+
+
+def _queue_step(key: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Move a step the engine reports as completed into the session log writer.
+    `key` comes from engine_session_key, so only the owner's session is logged.
+    """
+    step = result.pop("step_completed", None)
+    if step is not None and key.startswith("session:"):
+        SESSION_LOG_WRITER.add(UUID(key[len("session:"):]), step)
+    return result
+
+
+async def _run_pose(key: str, fn, *args):
+    """Await a logic.service call on the session's pose worker."""
+    try:
+        return await POSE_EXECUTOR.run(key, fn, key, *args)
+    except PoseError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+
+@router.post("/process_landmarks", response_model=Union[ProcessResponse, CompactProcessResponse])
+async def process_landmarks_api(
+    request: ProcessRequest, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
+):
+    """
+    One frame; the reply has every exercise's count and state, or with
+    `compact` only the current exercise's (CompactProcessResponse).
+    """
     try:
         if not request.landmarks:
             raise HTTPException(status_code=400, detail="No landmarks provided")
 
-        # Robust Name Mapping: Convert display names into strict API keys
-        current_ex = request.current_exercise
-        if current_ex in EXERCISE_NAME_MAPPING:
-            current_ex = EXERCISE_NAME_MAPPING[current_ex]
-        
-        # Convert schemas.LandmarkData to exercise_logic.Landmark
-        lm_objects = [Landmark(lm.x, lm.y, lm.z, lm.visibility) for lm in request.landmarks]
-        
-        angles = calculate_all_angles(lm_objects)
-        if 'error' in angles:
-            raise HTTPException(status_code=400, detail=angles['error'])
-
-        left_shoulder = lm_objects[11]; right_shoulder = lm_objects[12]
-        left_elbow = lm_objects[13]; right_elbow = lm_objects[14]
-        left_wrist = lm_objects[15]; right_wrist = lm_objects[16]
-        left_hip = lm_objects[23]; right_hip = lm_objects[24]
-        left_knee = lm_objects[25]; right_knee = lm_objects[26]
-        left_ankle = lm_objects[27]; right_ankle = lm_objects[28]
-
-        if current_ex not in prev_reps:
-            prev_reps[current_ex] = 0
-
-        # Process
-        feedback = []
-        if current_ex == 'bicep-curl':
-            state, feedback = EXERCISE_COUNTER.process_bicep_curl(
-                landmarks=lm_objects,
-                left_shoulder=left_shoulder, left_elbow=left_elbow, left_wrist=left_wrist, left_hip=left_hip,
-                right_shoulder=right_shoulder, right_elbow=right_elbow, right_wrist=right_wrist, right_hip=right_hip,
-                left_bicep_angle=angles['left_bicep_angle'], right_bicep_angle=angles['right_bicep_angle'],
-                elbow_torso_result=angles['elbow_torso_result'], hip_shoulder_angle=angles['hip_shoulder_angle']
-            )
-        elif current_ex == 'squat':
-            state, feedback = EXERCISE_COUNTER.process_squat(
-                landmarks=lm_objects,
-                knee_angle=angles['knee_angle_avg'], back_angle=angles['back_angle'],
-                left_hip=left_hip, right_hip=right_hip, left_knee=left_knee, right_knee=right_knee,
-                left_ankle=left_ankle, right_ankle=right_ankle,
-                left_shoulder=left_shoulder, right_shoulder=right_shoulder
-            )
-        elif current_ex == 'shoulder-flexion':
-            state, feedback = EXERCISE_COUNTER.process_shoulder_flexion(
-                landmarks=lm_objects,
-                left_hip=left_hip, left_shoulder=left_shoulder, left_elbow=left_elbow, left_wrist=left_wrist,
-                right_hip=right_hip, right_shoulder=right_shoulder, right_elbow=right_elbow, right_wrist=right_wrist,
-                left_flexion_angle=angles['left_flexion_angle'], right_flexion_angle=angles['right_flexion_angle'],
-                left_elbow_angle=angles['left_elbow_angle'], right_elbow_angle=angles['right_elbow_angle'],
-                hip_shoulder_angle=angles['hip_shoulder_angle']
-            )
-        elif current_ex == 'knee-raise':
-            state, feedback = EXERCISE_COUNTER.process_knee_raise(
-                landmarks=lm_objects,
-                left_hip=left_hip, left_knee=left_knee, left_ankle=left_ankle,
-                right_hip=right_hip, right_knee=right_knee, right_ankle=right_ankle,
-                left_shoulder=left_shoulder, left_wrist=left_wrist,
-                right_shoulder=right_shoulder, right_wrist=right_wrist,
-                left_knee_angle=angles['left_knee_angle'], right_knee_angle=angles['right_knee_angle'],
-                left_flexion_angle=angles['left_flexion_angle'], right_flexion_angle=angles['right_flexion_angle'],
-                hip_shoulder_angle=angles['hip_shoulder_angle']
-            )
-
-        # State names
-        squat_state_name = get_state_name(SquatState, EXERCISE_COUNTER.squat_state)
-        curl_state_name = get_state_name(BicepCurlState, EXERCISE_COUNTER.bicep_curl_state)
-        shoulder_flexion_state_name = get_state_name(ShoulderFlexionState, EXERCISE_COUNTER.shoulder_flexion_state)
-        knee_raise_state_name = get_state_name(KneeRaiseState, EXERCISE_COUNTER.knee_raise_state)
-
-        # Rep count
-        new_rep = {
-            'squat': EXERCISE_COUNTER.squat_counter,
-            'bicep-curl': EXERCISE_COUNTER.curl_counter,
-            'shoulder-flexion': EXERCISE_COUNTER.shoulder_flexion_counter,
-            'knee-raise': EXERCISE_COUNTER.knee_raise_counter
-        }.get(current_ex, 0)
-
-        # Log to DB if rep increased
-        if new_rep > prev_reps[current_ex]:
-            prev_reps[current_ex] = new_rep
-            # We can log here if needed, but usually it's better to log at the end of session
-            # or via a separate /session/log endpoint called by the frontend.
-            # For backward compatibility with main.py, we could log to ExerciseLogSimple.
-
-        return ProcessResponse(
-            squat_count=EXERCISE_COUNTER.squat_counter,
-            curl_count=EXERCISE_COUNTER.curl_counter,
-            shoulder_flexion_count=EXERCISE_COUNTER.shoulder_flexion_counter,
-            knee_raise_count=EXERCISE_COUNTER.knee_raise_counter,
-            total_reps=EXERCISE_COUNTER.total_reps,
-            squat_state_name=squat_state_name,
-            curl_state_name=curl_state_name,
-            shoulder_flexion_state_name=shoulder_flexion_state_name,
-            knee_raise_state_name=knee_raise_state_name,
-            feedback=", ".join(feedback) if feedback else ""
+        current_ex = normalize_current_exercise(request.current_exercise)
+        key = engine_session_key(request.session_id, request.user_id, current_user, db)
+        timed = METRICS.enabled
+        t = perf_counter_ns() if timed else 0
+        landmarks = _to_array(request.landmarks)
+        if timed:
+            t = METRICS.lap('convert', t)
+
+        result = await _run_pose(
+            key, pose_service.process_frame, current_ex, landmarks, request.timestamp, request.compact
         )
+        if timed:
+            t = METRICS.lap('engine', t)
+        model = CompactProcessResponse if request.compact else ProcessResponse
+        response = model(**_queue_step(key, result))
+        if timed:
+            METRICS.lap('serialize', t)
+        return response
     except HTTPException:
         raise
     except Exception as e:
         print(f"[ERROR] process_landmarks failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+
+@router.post("/process_landmarks/batch", response_model=ProcessBatchResponse)
+async def process_landmarks_batch_api(
+    request: ProcessBatchRequest, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
+):
+    """
+    Process several timestamped frames in one round trip.
+
+    Frames are fed through the strategy state machine in the order given and
+    the state after each frame is reported alongside the final counts.
+    """
+    try:
+        current_ex = normalize_current_exercise(request.current_exercise)
+        key = engine_session_key(request.session_id, request.user_id, current_user, db)
+
+        # Validate the whole batch before mutating any state
+        frames = []
+        for frame in request.frames:
+            if len(frame.landmarks) < 33:
+                raise HTTPException(status_code=400, detail="Not enough landmarks detected")
+            frames.append((frame.timestamp, _to_array(frame.landmarks)))
+
+        result = await _run_pose(key, pose_service.process_batch, current_ex, frames)
+        return ProcessBatchResponse(**_queue_step(key, result))
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] process_landmarks_batch failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/process_landmarks/multi", response_model=MultiPersonResponse)
+async def process_landmarks_multi_api(
+    request: MultiPersonRequest, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
+):
+    """
+    Process one frame containing several people (group sessions).
+
+    Skeletons are matched to stable track IDs across frames and each track
+    counts reps with its own strategy state machine.
+    """
+    try:
+        current_ex = normalize_current_exercise(request.current_exercise)
+        key = engine_session_key(request.session_id, request.user_id, current_user, db)
+        if any(len(person) < 33 for person in request.people):
+            raise HTTPException(status_code=400, detail="Not enough landmarks detected")
+        skeletons = [_to_array(person) for person in request.people]
+
+        tracks = await _run_pose(key, pose_service.process_multi, current_ex, skeletons, request.timestamp)
+        return MultiPersonResponse(tracks=[TrackState(**track) for track in tracks])
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] process_landmarks_multi failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/process_landmarks/binary", response_model=Union[ProcessResponse, CompactProcessResponse])
+async def process_landmarks_binary_api(
+    request: Request, session_id: Optional[str] = None, user_id: Optional[str] = None, compact: bool = False,
+    db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
+):
+    """
+    Same as /process_landmarks, but the body is one frame in the compact
+    binary layout of logic.wire (application/octet-stream).
+    """
+    key = engine_session_key(session_id, user_id, current_user, db)
+    try:
+        decoded = decode_frame(await request.body())
+    except WireFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        result = await _run_pose(
+            key, pose_service.process_frame, decoded.exercise, decoded.landmarks, decoded.timestamp, compact
+        )
+        model = CompactProcessResponse if compact else ProcessResponse
+        return model(**_queue_step(key, result))
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] process_landmarks_binary failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/process_landmarks/stats")
+async def process_landmarks_stats(
+    session_id: Optional[str] = None, user_id: Optional[str] = None,
+    db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
+):
+    """Per-exercise frame counts and skip ratio of the low-confidence/duplicate frame gate."""
+    key = engine_session_key(session_id, user_id, current_user, db)
+    return {"gate": await _run_pose(key, pose_service.gate_stats)}
+
+
+class _LatestFrame:
+    """
+    Single-slot mailbox between a socket reader and the pose processor.
+
+    A frame that arrives while an older one is still waiting replaces it, so
+    a slow processor always works on the freshest frame instead of a queue.
+    """
+
+    def __init__(self):
+        self._frame = None
+        self._ready = asyncio.Event()
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, frame) -> None:
+        if self._frame is not None:
+            self.dropped += 1
+        self._frame = frame
+        self._ready.set()
+
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+
+    async def get(self):
+        """The freshest frame; None once the reader has closed and nothing is left."""
+        if self._frame is None and not self.closed:
+            await self._ready.wait()
+        self._ready.clear()
+        frame, self._frame = self._frame, None
+        return frame
+
+
+async def _read_pose_frames(websocket: WebSocket, mailbox: _LatestFrame) -> None:
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            data = message.get("bytes")
+            mailbox.put(data if data is not None else message.get("text"))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        mailbox.close()
+
+
+@router.websocket("/ws/pose/{session_id}")
+async def pose_websocket(
+    websocket: WebSocket,
+    session_id: str,
+    token: str = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Streaming variant of /process_landmarks bound to one workout session.
+
+    Each message is a PoseStreamFrame as JSON text, or a binary frame in the
+    logic.wire layout; the reply carries only the
+    ProcessResponse fields that changed since the previous reply, plus a
+    sequence number and the number of stale frames dropped so far.
+    """
+    current_user = await authenticate_session_websocket(websocket, session_id, token, db)
+    if current_user is None:
+        return
+    try:
+        # Observers use /ws/session; only the patient streams frames into the engine
+        key = engine_session_key(session_id, None, current_user, db)
+    except HTTPException:
+        await websocket.close(code=4003)
+        return
+    await websocket.accept()
+
+    mailbox = _LatestFrame()
+    reader = asyncio.create_task(_read_pose_frames(websocket, mailbox))
+    last_sent: Dict[str, Any] = {}
+    seq = 0
+    try:
+        while True:
+            raw = await mailbox.get()
+            if raw is None:
+                if mailbox.closed:
+                    break
+                continue
+            seq += 1
+            try:
+                if isinstance(raw, bytes):
+                    current_ex, timestamp, landmarks = decode_frame(raw)
+                else:
+                    frame = PoseStreamFrame.model_validate_json(raw)
+                    current_ex, timestamp = normalize_current_exercise(frame.current_exercise), frame.timestamp
+                    landmarks = _to_array(frame.landmarks)
+                payload = _queue_step(
+                    key, await _run_pose(key, pose_service.process_frame, current_ex, landmarks, timestamp)
+                )
+            except HTTPException as e:
+                await websocket.send_json({"seq": seq, "error": e.detail})
+                continue
+            except (ValidationError, WireFormatError):
+                await websocket.send_json({"seq": seq, "error": "Invalid frame"})
+                continue
+
+            delta = {k: v for k, v in payload.items() if last_sent.get(k) != v}
+            last_sent = payload
+            await websocket.send_json({"seq": seq, "dropped": mailbox.dropped, **delta})
+            # Let the reader catch up before picking the next frame
+            await asyncio.sleep(0)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Pose WebSocket error: {e}")
+        try:
+            await websocket.close(code=1011)
+        except Exception:
+            pass
+    finally:
+        reader.cancel()
+
 @router.post("/session/start", response_model=WorkoutSessionResponse)
 async def start_session(data: WorkoutSessionCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """Start a new workout session"""
@@ -244,11 +483,48 @@ async def start_session(data: WorkoutSessionCreate, db: Session = Depends(get_db
         db.add(new_session)
         db.commit()
         db.refresh(new_session)
-        return new_session
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
 
+    # Calibrated thresholds go into the engine once here, never per frame
+    profiles = CALIBRATION_CACHE.get(db, current_user.user_id)
+    if profiles:
+        key = session_key(new_session.session_id)
+        await _run_pose(key, pose_service.apply_profiles, profiles)
+    return new_session
+
+@router.post("/calibration/start")
+async def start_calibration(
+    exercise_name: str, session_id: Optional[str] = None,
+    db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
+):
+    """
+    Start recording the patient's comfortable range for an exercise. Frames
+    sent for the same session_id (or the user, without one) are recorded
+    until /calibration/finish.
+    """
+    key = engine_session_key(session_id, None, current_user, db)
+    await _run_pose(key, pose_service.start_calibration, normalize_current_exercise(exercise_name))
+    return {"message": f"Calibration started for {exercise_name}"}
+
+@router.post("/calibration/finish", response_model=CalibrationResponse)
+async def finish_calibration(
+    exercise_name: str, session_id: Optional[str] = None,
+    db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
+):
+    """Fit the exercise's thresholds to the recorded range, apply them and store the profile"""
+    exercise = normalize_current_exercise(exercise_name)
+    key = engine_session_key(session_id, None, current_user, db)
+    result = await _run_pose(key, pose_service.finish_calibration, exercise)
+    try:
+        save_calibration(db, current_user.user_id, exercise, result)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    CALIBRATION_CACHE.invalidate(current_user.user_id)
+    return CalibrationResponse(exercise_type=exercise, **result)
+
 @router.post("/session/log", response_model=SessionDetailResponse)
 async def log_session_detail(
     data: SessionDetailCreate, 
@@ -265,14 +541,28 @@ async def log_session_detail(
     if data.reps_completed <= 0:
         raise HTTPException(status_code=400, detail="Only completed exercise steps can be logged")
     
+    key = session_key(data.session_id)
+    if await _run_pose(key, pose_service.claim_logged_step, data.exercise_type.value):
+        # The engine already logged this step; answer with its row instead of a duplicate
+        SESSION_LOG_WRITER.flush(db, data.session_id)
+        existing = db.query(SessionDetail).filter(
+            SessionDetail.session_id == data.session_id,
+            SessionDetail.exercise_type == data.exercise_type.value
+        ).order_by(SessionDetail.detail_id.desc()).first()
+        if existing is not None:
+            return existing
+
+    # Quality of the step from the rep events buffered by the pose engine
+    summary = await _run_pose(key, pose_service.rep_summary, data.exercise_type.value)
+
     try:
         new_detail = SessionDetail(
             session_id=data.session_id,
             exercise_type=data.exercise_type,
             reps_completed=data.reps_completed,
             duration_seconds=data.duration_seconds,
-            mistakes_count=0,
-            accuracy_score=None,
+            mistakes_count=summary["mistakes"] if summary else 0,
+            accuracy_score=summary["accuracy"] if summary else None,
             feedback=data.feedback
         )
 
@@ -285,6 +575,21 @@ async def log_session_detail(
         db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
 
+def _rep_event_row(session_id: UUID, event: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "session_id": session_id,
+        "exercise_type": event["exercise"],
+        "rep_index": event["rep_index"],
+        "is_valid": event["valid"],
+        "start_time": event["start_time"],
+        "end_time": event["end_time"],
+        "min_angle": event["min_angle"],
+        "max_angle": event["max_angle"],
+        "concentric_seconds": event["concentric_s"],
+        "eccentric_seconds": event["eccentric_s"],
+        "feedback": ", ".join(event["feedback"]) if event["feedback"] else None,
+    }
+
 @router.post("/session/end/{session_id}")
 async def end_session(
     session_id: UUID, 
@@ -297,11 +602,20 @@ async def end_session(
     current_session.end_time = datetime.now()
     current_session.status = 'completed'
     
+    key = session_key(session_id)
+    events = await _run_pose(key, pose_service.end_session)
     try:
+        # Steps still queued for this session are written before it closes
+        SESSION_LOG_WRITER.flush(db, session_id)
+        # One bulk insert for the whole session instead of a write per rep
+        db.bulk_insert_mappings(RepEvent, [_rep_event_row(session_id, event) for event in events])
         db.commit()
         return {"message": "Session ended"}
     except Exception as e:
         db.rollback()
+        if events:
+            # Keep the rep log in memory so ending the session again writes it
+            await _run_pose(key, pose_service.restore_rep_events, events)
         raise HTTPException(status_code=400, detail=str(e))
 
 # Brain Exercises
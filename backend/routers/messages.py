@@ -1,5 +1,7 @@
+import logging
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from typing import List
 from uuid import UUID
 from database import get_db
 from models import User, Message
@@ -7,8 +9,11 @@ from dependencies import get_current_user
 from schemas import MessageCreate, MessageResponse
 from utils import paginate, Page
 from fastapi import Query
+from routers.websockets import manager
 
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(
     prefix="/api",
     tags=["messages"]
@@ -32,6 +37,24 @@ async def get_conversation(
     return paginate(query, page, size)
 
 
+@router.get("/messages/sync", response_model=List[MessageResponse])
+async def sync_messages(
+    since_id: int = Query(0, ge=0),
+    limit: int = Query(200, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    The current user's messages (sent or received) with an id above
+    `since_id`, oldest first; lets a client catch up after its push channel
+    (/api/ws/user) reconnects.
+    """
+    return db.query(Message).filter(
+        Message.message_id > since_id,
+        (Message.sender_id == current_user.user_id) | (Message.receiver_id == current_user.user_id)
+    ).order_by(Message.message_id.asc()).limit(limit).all()
+
+
 @router.get("/messages/{user_id}", response_model=Page[MessageResponse])
 async def get_user_messages(
     user_id: UUID, 
@@ -60,8 +83,17 @@ async def send_message(data: MessageCreate, db: Session = Depends(get_db), curre
         db.add(new_message)
         db.commit()
         db.refresh(new_message)
-        return new_message
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
 
+    # Push to both sides' open chat windows (the sender may have other tabs)
+    event = {"type": "message", "message": MessageResponse.model_validate(new_message).model_dump(mode="json")}
+    try:
+        for user_id in {new_message.receiver_id, new_message.sender_id}:
+            await manager.publish_to_user(user_id, event)
+    except Exception as e:
+        # Clients catch up through /messages/sync; the message itself is saved
+        logger.error("Message push failed: %s", e)
+    return new_message
+
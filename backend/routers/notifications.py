@@ -1,54 +1,100 @@
-from fastapi import APIRouter, Depends, HTTPException
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
+from typing import Iterable, Optional
 from uuid import UUID
 from database import get_db
 from models import User, Notification
 from dependencies import get_current_user
+from schemas import NotificationPage, NotificationResponse
+from notification_store import add_notification, mark_all_read as mark_all_notifications_read, unread_count
+from routers.websockets import manager
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/api/notifications",
     tags=["notifications"]
 )
 
-@router.get("/{user_id}")
-async def get_notifications(user_id: UUID, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """Get notifications for a user"""
-    notifications = db.query(Notification).filter(
-        Notification.user_id == user_id
-    ).order_by(Notification.created_at.desc()).all()
-    
-    return notifications
+
+async def push_notifications(notifications: Iterable[Notification]):
+    """Send committed notifications to their users' push channels (/api/ws/user)."""
+    try:
+        for notification in notifications:
+            await manager.publish_to_user(notification.user_id, {
+                "type": "notification",
+                "notification": NotificationResponse.model_validate(notification).model_dump(mode="json"),
+            })
+    except Exception as e:
+        # The notification is saved; clients see it on their next page load
+        logger.error("Notification push failed: %s", e)
+
+
+@router.get("/{user_id}", response_model=NotificationPage)
+async def get_notifications(
+    user_id: UUID,
+    before_id: Optional[int] = Query(None, ge=1),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get notifications for a user, newest first, a keyset page at a time (pass next_before_id back)"""
+    query = db.query(Notification).filter(Notification.user_id == user_id)
+    if before_id is not None:
+        query = query.filter(Notification.notification_id < before_id)
+    # One extra row tells whether another page follows
+    rows = query.order_by(Notification.notification_id.desc()).limit(limit + 1).all()
+    items = rows[:limit]
+    return {
+        "items": items,
+        "next_before_id": items[-1].notification_id if len(rows) > limit else None,
+        "unread_count": unread_count(db, user_id),
+    }
+
+
+@router.get("/{user_id}/unread-count")
+async def get_unread_count(user_id: UUID, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Unread notifications of a user, read from the maintained counter"""
+    return {"unread_count": unread_count(db, user_id)}
+
 
 @router.post("")
 async def create_notification(data: dict, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """Create a new notification (used for appointment requests, etc.)"""
-    notification = Notification(
-        user_id=data.get("user_id"),
+    try:
+        user_id = UUID(str(data.get("user_id")))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid user_id")
+    notification = add_notification(
+        db,
+        user_id,
         title=data.get("title", "Thông báo mới"),
         message=data.get("message", ""),
         type=data.get("type", "info"),
-        is_read=False
     )
-    db.add(notification)
     try:
         db.commit()
         db.refresh(notification)
-        return {"message": "Notification created", "notification_id": str(notification.notification_id)}
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
+    await push_notifications([notification])
+    return {"message": "Notification created", "notification_id": str(notification.notification_id)}
 
 @router.post("/{user_id}/read-all")
 async def mark_all_read(user_id: UUID, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """Mark all notifications as read"""
-    db.query(Notification).filter(
-        Notification.user_id == user_id,
-        Notification.is_read == False
-    ).update({Notification.is_read: True})
-    
+    mark_all_notifications_read(db, user_id)
+
     try:
         db.commit()
-        return {"message": "All marked as read"}
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
+    # Clears the badge in the user's other open tabs
+    try:
+        await manager.publish_to_user(user_id, {"type": "notifications_read"})
+    except Exception as e:
+        logger.error("Notification push failed: %s", e)
+    return {"message": "All marked as read"}
@@ -4,10 +4,12 @@ from typing import List
 from uuid import UUID
 from datetime import datetime
 from database import get_db
-from models import User, Schedule, Notification
+from models import User, Schedule
 from dependencies import get_current_user, get_current_doctor
 from middleware.ownership import ResourceAccess
 from schemas import ScheduleCreate, ScheduleResponse
+from notification_store import add_notification
+from routers.notifications import push_notifications
 
 router = APIRouter(
     prefix="/api",
@@ -61,20 +63,22 @@ async def create_schedule(
         db.add(new_schedule)
         
         # Create notification for patient
-        notif = Notification(
-            user_id=data.patient_id,
+        notif = add_notification(
+            db,
+            data.patient_id,
             title='Lịch hẹn mới',
             message=f"Bác sĩ đã đặt lịch hẹn mới vào lúc {data.start_time.strftime('%H:%M %d/%m/%Y')}",
             type='info'
         )
-        db.add(notif)
         
         db.commit()
         db.refresh(new_schedule)
-        return new_schedule
+        db.refresh(notif)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
+    await push_notifications([notif])
+    return new_schedule
 
 @router.delete("/schedules/{schedule_id}")
 async def delete_schedule(
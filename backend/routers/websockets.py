@@ -1,74 +1,227 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from typing import Dict, List, Any
+from typing import Dict, Any, Optional, Set
+import asyncio
 import json
 import logging
+import os
 from uuid import UUID
 from database import get_db
+from backplane import Backplane, InMemoryBackplane, make_backplane
+from live_telemetry import TelemetryAggregator
+from enums import UserRole
 from auth import verify_token
-from models import User
+from models import User, WorkoutSession
 from middleware.ownership import ResourceAccess
 from sqlalchemy.orm import Session
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(tags=["websockets"])
+router = APIRouter(prefix="/api", tags=["websockets"])
+
+# Close code for observers dropped for not keeping up ("try again later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+# Sessions one watch-list socket may follow
+MAX_WATCHED_SESSIONS = int(os.getenv("WS_MAX_WATCHED_SESSIONS", "50"))
+
+
+class _Peer:
+    """One connected socket with its bounded outbox, drained by its own writer task."""
+    __slots__ = ('websocket', 'queue', 'writer', 'keys')
+
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.writer: Optional[asyncio.Task] = None
+        # Hub keys the socket receives (several for a doctor's watch list)
+        self.keys: Set[str] = set()
+
 
 class ConnectionManager:
-    """Manages active WebSocket connections for live coaching."""
-    def __init__(self):
-        # session_id -> list of websockets (patient and observing doctors)
-        self.active_sessions: Dict[str, List[WebSocket]] = {}
+    """
+    Manages active WebSocket connections for live coaching.
+
+    A broadcast serializes the message once and only enqueues it for each
+    connection; every connection has a writer task that sends from its own
+    bounded queue. A connection whose queue is full, or whose send takes
+    longer than `send_timeout`, is evicted and closed, so one slow observer
+    never delays the others. One connection can join several keys and still
+    has a single queue and writer.
+
+    Broadcasts go through the backplane (see backplane.py), which delivers
+    them to the manager of every worker; each enqueues for its own sockets.
+    """
+    def __init__(self, backplane: Optional[Backplane] = None,
+                 queue_size: int = int(os.getenv("WS_SEND_QUEUE_SIZE", "64")),
+                 send_timeout: float = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "5"))):
+        # session_id -> {websocket: peer} (patient and observing doctors), O(1) removal
+        self.active_sessions: Dict[str, Dict[WebSocket, _Peer]] = {}
+        self._peers: Dict[WebSocket, _Peer] = {}
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self._closing: Set[asyncio.Task] = set()
+        self.backplane = backplane or InMemoryBackplane()
+        self.backplane.subscribe(self.deliver)
+
+    async def start(self):
+        try:
+            await self.backplane.start()
+        except Exception as e:
+            logger.warning("Broadcast backplane unavailable, broadcasting within this worker only: %s", e)
+            self.backplane = InMemoryBackplane()
+            self.backplane.subscribe(self.deliver)
+
+    async def stop(self):
+        await self.backplane.stop()
 
-    async def connect(self, websocket: WebSocket, session_id: str):
+    async def connect(self, websocket: WebSocket, session_id: Optional[str] = None):
         await websocket.accept()
-        if session_id not in self.active_sessions:
-            self.active_sessions[session_id] = []
-        self.active_sessions[session_id].append(websocket)
-        logger.info(f"WebSocket connected to session {session_id}. Total: {len(self.active_sessions[session_id])}")
-
-    def disconnect(self, websocket: WebSocket, session_id: str):
-        if session_id in self.active_sessions:
-            self.active_sessions[session_id].remove(websocket)
-            if not self.active_sessions[session_id]:
+        peer = _Peer(websocket, self.queue_size)
+        peer.writer = asyncio.create_task(self._write(peer))
+        self._peers[websocket] = peer
+        if session_id is not None:
+            self.join(websocket, session_id)
+            logger.info(f"WebSocket connected to session {session_id}. Total: {len(self.active_sessions[session_id])}")
+
+    def join(self, websocket: WebSocket, session_id: str):
+        """Also deliver `session_id`'s broadcasts to an already connected socket."""
+        peer = self._peers.get(websocket)
+        if peer is None:
+            return
+        peer.keys.add(session_id)
+        self.active_sessions.setdefault(session_id, {})[websocket] = peer
+
+    def leave(self, websocket: WebSocket, session_id: str):
+        peer = self._peers.get(websocket)
+        if peer is None or session_id not in peer.keys:
+            return
+        peer.keys.discard(session_id)
+        peers = self.active_sessions.get(session_id)
+        if peers is not None:
+            peers.pop(websocket, None)
+            if not peers:
                 self.active_sessions.pop(session_id, None)
-        logger.info(f"WebSocket disconnected from session {session_id}")
+
+    def _remove(self, websocket: WebSocket) -> Optional[_Peer]:
+        peer = self._peers.get(websocket)
+        if peer is None:
+            return None
+        for key in list(peer.keys):
+            self.leave(websocket, key)
+        del self._peers[websocket]
+        if peer.writer is not asyncio.current_task():
+            peer.writer.cancel()
+        return peer
+
+    def disconnect(self, websocket: WebSocket, session_id: Optional[str] = None):
+        """Drop the socket from every key it joined."""
+        if self._remove(websocket) is not None:
+            logger.info(f"WebSocket disconnected from session {session_id}")
+
+    def _evict(self, peer: _Peer, reason: str):
+        keys = sorted(peer.keys)
+        if self._remove(peer.websocket) is None:
+            return
+        logger.warning(f"Evicting slow WebSocket from {keys}: {reason}")
+        task = asyncio.create_task(self._close(peer.websocket))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _close(self, websocket: WebSocket):
+        try:
+            await asyncio.wait_for(websocket.close(code=SLOW_CONSUMER_CLOSE_CODE), self.send_timeout)
+        except Exception:
+            # Already gone, or too stuck to close cleanly
+            pass
+
+    def send(self, websocket: WebSocket, message: Any):
+        """Queue a message for one socket only, behind its pending broadcasts."""
+        peer = self._peers.get(websocket)
+        if peer is None:
+            return
+        try:
+            peer.queue.put_nowait(json.dumps(message) if isinstance(message, dict) else str(message))
+        except asyncio.QueueFull:
+            self._evict(peer, f"{self.queue_size} messages behind")
+
+    async def _write(self, peer: _Peer):
+        try:
+            while True:
+                text = await peer.queue.get()
+                await asyncio.wait_for(peer.websocket.send_text(text), self.send_timeout)
+        except asyncio.TimeoutError:
+            self._evict(peer, "send timed out")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # The socket went away; its receive loop will notice too
+            keys = sorted(peer.keys)
+            self.disconnect(peer.websocket)
+            logger.error(f"Error broadcasting to {keys}: {e}")
+
+    async def publish_to_user(self, user_id: Any, message: Any):
+        """Push an event ({"type": ...}) to every open tab of one user."""
+        await self.broadcast_to_session(user_channel(user_id), message)
 
     async def broadcast_to_session(self, session_id: str, message: Any):
-        if session_id in self.active_sessions:
-            # Send message to all connected clients in this session
-            for connection in self.active_sessions[session_id]:
-                try:
-                    if isinstance(message, dict):
-                        await connection.send_json(message)
-                    else:
-                        await connection.send_text(str(message))
-                except Exception as e:
-                    logger.error(f"Error broadcasting to session {session_id}: {e}")
-
-manager = ConnectionManager()
+        # Serialized once here, published once, delivered by every worker
+        text = json.dumps(message) if isinstance(message, dict) else str(message)
+        await self.backplane.publish(session_id, text)
 
-@router.websocket("/ws/session/{session_id}")
-async def session_websocket(
-    websocket: WebSocket, 
-    session_id: str, 
-    token: str = None,
-    db: Session = Depends(get_db)
-):
-    # 1. JWT Handshake: Authenticate user from token (query param)
+    def deliver(self, session_id: str, text: str):
+        """Queue a published message for this worker's sockets in the session."""
+        peers = self.active_sessions.get(session_id)
+        if not peers:
+            return
+        for peer in list(peers.values()):
+            try:
+                peer.queue.put_nowait(text)
+            except asyncio.QueueFull:
+                self._evict(peer, f"{self.queue_size} messages behind")
+
+manager = ConnectionManager(make_backplane())
+# Coalesces patients' live updates into fixed-rate snapshots on the session key
+telemetry = TelemetryAggregator(manager.broadcast_to_session)
+
+def user_channel(user_id: Any) -> str:
+    """Hub key of a user's personal push channel (session keys are bare UUIDs)."""
+    return f"user:{user_id}"
+
+
+async def authenticate_websocket(websocket: WebSocket, token: Optional[str], db: Session) -> Optional[User]:
+    """JWT handshake for WebSockets; closes the socket and returns None on failure."""
+    # JWT Handshake: Authenticate user from token (query param)
     if not token:
         await websocket.close(code=4001) # Unauthorized
-        return
+        return None
 
     payload = verify_token(token)
     if not payload:
         await websocket.close(code=4001) # Invalid token
-        return
+        return None
 
     user_id = payload.get("sub")
     current_user = db.query(User).filter(User.user_id == UUID(user_id)).first()
     if not current_user:
         await websocket.close(code=4001)
-        return
+        return None
+    return current_user
+
+
+async def authenticate_session_websocket(
+    websocket: WebSocket,
+    session_id: str,
+    token: Optional[str],
+    db: Session
+) -> Optional[User]:
+    """
+    JWT handshake and session access check for session-scoped WebSockets.
+    Closes the socket and returns None when the caller may not join.
+    """
+    # 1. JWT Handshake
+    current_user = await authenticate_websocket(websocket, token, db)
+    if current_user is None:
+        return None
 
     # 2. Session Isolation & Resource Guards
     try:
@@ -78,23 +231,165 @@ async def session_websocket(
     except Exception as e:
         logger.error(f"WebSocket Access Denied: {e}")
         await websocket.close(code=4003) # Forbidden
+        return None
+
+    return current_user
+
+@router.websocket("/ws/session/{session_id}")
+async def session_websocket(
+    websocket: WebSocket, 
+    session_id: str, 
+    token: str = None,
+    db: Session = Depends(get_db)
+):
+    current_user = await authenticate_session_websocket(websocket, session_id, token, db)
+    if current_user is None:
         return
 
+    # Only the session's patient drives its live telemetry and ends it on leaving
+    patient_id = db.query(WorkoutSession.user_id).filter(WorkoutSession.session_id == UUID(session_id)).scalar()
+    is_patient = patient_id == current_user.user_id
+
     await manager.connect(websocket, session_id)
+    sent_updates = False
     try:
         while True:
-            # Receive data from patient (e.g., live reps, feedback)
+            # Receive data from patient (e.g., live reps, state, feedback)
             data = await websocket.receive_text()
             message = json.loads(data)
-            
-            # Broadcast to all observers (doctors) in the same session
-            await manager.broadcast_to_session(session_id, {
-                "type": "live_update",
-                "session_id": session_id,
-                "data": message
-            })
+            if not isinstance(message, dict):
+                continue
+
+            if not is_patient:
+                # An observer (e.g. a coaching doctor) speaks to the session as is
+                await manager.broadcast_to_session(session_id, {
+                    "type": "live_update",
+                    "session_id": session_id,
+                    "from": str(current_user.user_id),
+                    "data": message
+                })
+                continue
+
+            # Observers get it folded into the next snapshot, not relayed one by one
+            telemetry.record(session_id, message)
+            sent_updates = True
     except WebSocketDisconnect:
         manager.disconnect(websocket, session_id)
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
         manager.disconnect(websocket, session_id)
+        try:
+            await websocket.close(code=1011)
+        except Exception:
+            pass
+    if sent_updates:
+        try:
+            await telemetry.end(session_id)
+        except Exception as e:
+            logger.error("Live session end publish failed: %s", e)
+
+
+@router.websocket("/ws/user")
+async def user_websocket(
+    websocket: WebSocket,
+    token: str = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Personal push channel of the signed-in user: events such as new chat
+    messages arrive as {"type": ..., ...} JSON. Anything the client sends is
+    ignored; after a reconnect the client catches up over REST.
+    """
+    current_user = await authenticate_websocket(websocket, token, db)
+    if current_user is None:
+        return
+    channel = user_channel(current_user.user_id)
+    # Nothing below touches the database; don't hold a pooled connection while idle
+    db.close()
+
+    await manager.connect(websocket, channel)
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        manager.disconnect(websocket, channel)
+    except Exception as e:
+        logger.error(f"User WebSocket error: {e}")
+        manager.disconnect(websocket, channel)
+        try:
+            await websocket.close(code=1011)
+        except Exception:
+            pass
+
+
+async def _may_watch(session_id: str, current_user: User, db: Session) -> bool:
+    try:
+        await ResourceAccess.session(UUID(session_id), current_user, db)
+        return True
+    except Exception:
+        return False
+
+
+@router.websocket("/ws/watch")
+async def watch_websocket(
+    websocket: WebSocket,
+    token: str = None,
+    db: Session = Depends(get_db)
+):
+    """
+    A doctor's watch list: the live snapshots of many sessions on one socket.
+
+    Send {"action": "watch" | "unwatch", "session_ids": [...]}; the reply is
+    {"type": "watching", "session_ids": [...], "denied": [...]} with the full
+    list, followed by the latest snapshot of newly watched sessions that this
+    worker holds. Snapshots arrive as {"type": "snapshot", "session_id", "data"}.
+    """
+    current_user = await authenticate_websocket(websocket, token, db)
+    if current_user is None:
+        return
+    if current_user.role != UserRole.DOCTOR.value:
+        await websocket.close(code=4003)
+        return
+    db.close()
+
+    await manager.connect(websocket)
+    watched: Set[str] = set()
+    try:
+        while True:
+            request = json.loads(await websocket.receive_text())
+            if not isinstance(request, dict):
+                continue
+            session_ids = [str(s) for s in request.get("session_ids") or []]
+            denied = []
+            added = []
+            if request.get("action") == "watch":
+                for session_id in session_ids:
+                    if session_id in watched:
+                        continue
+                    if len(watched) >= MAX_WATCHED_SESSIONS or not await _may_watch(session_id, current_user, db):
+                        denied.append(session_id)
+                        continue
+                    manager.join(websocket, session_id)
+                    watched.add(session_id)
+                    added.append(session_id)
+                # Access checks are the only queries; release the connection between requests
+                db.close()
+            elif request.get("action") == "unwatch":
+                for session_id in session_ids:
+                    manager.leave(websocket, session_id)
+                    watched.discard(session_id)
+
+            manager.send(websocket, {"type": "watching", "session_ids": sorted(watched), "denied": denied})
+            for session_id in added:
+                snapshot = telemetry.snapshot(session_id)
+                if snapshot is not None:
+                    manager.send(websocket, {"type": "snapshot", "session_id": session_id, "data": snapshot})
+    except WebSocketDisconnect:
+        manager.disconnect(websocket)
+    except Exception as e:
+        logger.error(f"Watch WebSocket error: {e}")
+        manager.disconnect(websocket)
+        try:
+            await websocket.close(code=1011)
+        except Exception:
+            pass
@@ -60,6 +60,7 @@ from schemas.communication import (
     NotificationCreate,
     NotificationUpdate,
     NotificationResponse,
+    NotificationPage,
 )
 
 __all__ = [
@@ -114,4 +115,5 @@ __all__ = [
     "NotificationCreate",
     "NotificationUpdate",
     "NotificationResponse",
+    "NotificationPage",
 ]
@@ -2,7 +2,7 @@
 Pydantic schemas for Schedules and Messages.
 """
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from uuid import UUID
 from enums import ScheduleStatus, SessionType
@@ -104,6 +104,13 @@ class NotificationResponse(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class NotificationPage(BaseModel):
+    """Schema for one keyset page of notifications, newest first"""
+    items: List[NotificationResponse]
+    next_before_id: Optional[int] = None  # pass as before_id for the next page; None on the last
+    unread_count: int
+
+
 # ============ AI Chat Schemas ============
 
 class AIChatRequest(BaseModel):
@@ -2,7 +2,7 @@
 Pydantic schemas for Exercise and Workout-related operations.
 """
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime, date
 from uuid import UUID
 from decimal import Decimal
@@ -261,7 +261,10 @@ class ProcessRequest(BaseModel):
     """Schema for landmark processing request"""
     landmarks: List[LandmarkData]
     current_exercise: str
+    session_id: Optional[str] = None
     user_id: Optional[str] = None
+    timestamp: Optional[float] = None  # capture time in seconds
+    compact: bool = False  # answer with CompactProcessResponse
 
 
 class ProcessResponse(BaseModel):
@@ -276,3 +279,79 @@ class ProcessResponse(BaseModel):
     shoulder_flexion_state_name: str
     knee_raise_state_name: str
     feedback: str
+
+
+class CompactProcessResponse(BaseModel):
+    """Schema for landmark processing response limited to the current exercise"""
+    exercise: str
+    count: int
+    state: int  # value of the exercise's state enum, e.g. SquatState
+    state_name: str
+    feedback: List[str]
+
+
+class FrameData(BaseModel):
+    """Schema for one captured frame of landmarks"""
+    landmarks: List[LandmarkData]
+    timestamp: Optional[float] = None  # capture time in seconds
+
+
+class ProcessBatchRequest(BaseModel):
+    """Schema for processing several frames in one request"""
+    frames: List[FrameData] = Field(..., min_length=1, max_length=60)
+    current_exercise: str
+    session_id: Optional[str] = None
+    user_id: Optional[str] = None
+
+
+class FrameResult(BaseModel):
+    """Schema for the state after one frame of a batch"""
+    timestamp: Optional[float]
+    count: int
+    state_name: str
+    feedback: str
+
+
+class ProcessBatchResponse(BaseModel):
+    """Schema for batch landmark processing response"""
+    frames: List[FrameResult]
+    final: ProcessResponse
+
+
+class MultiPersonRequest(BaseModel):
+    """Schema for one frame with several people (group sessions)"""
+    people: List[List[LandmarkData]] = Field(..., max_length=6)
+    current_exercise: str
+    session_id: Optional[str] = None
+    user_id: Optional[str] = None
+    timestamp: Optional[float] = None  # capture time in seconds
+
+
+class TrackState(BaseModel):
+    """Schema for the exercise state of one tracked person"""
+    index: int  # position of the skeleton in the request
+    track_id: int
+    count: int
+    state_name: str
+    feedback: str
+
+
+class MultiPersonResponse(BaseModel):
+    """Schema for multi-person landmark processing response"""
+    tracks: List[TrackState]
+
+
+class CalibrationResponse(BaseModel):
+    """Schema for a patient's fitted threshold profile for one exercise"""
+    exercise_type: str
+    thresholds: Dict[str, float]
+    range_min: float
+    range_max: float
+    sample_count: int
+
+
+class PoseStreamFrame(BaseModel):
+    """Schema for one frame pushed over the pose WebSocket"""
+    landmarks: List[LandmarkData]
+    current_exercise: str
+    timestamp: Optional[float] = None  # capture time in seconds
@@ -0,0 +1,72 @@
+"""
+Replay recorded landmark streams through the pose engine.
+
+Recordings are captured by running the backend with POSE_RECORD_DIR set; each
+finished workout session writes one .npz per exercise take.
+
+Usage:
+    python scripts/replay_benchmark.py recordings/ [more files or dirs] [--repeat 5] [--max-p99-ms 5]
+
+Prints frames/sec, p50/p99 per-frame latency and the final rep count against
+the golden count of every recording. Exits non-zero on a count regression
+(or when --max-p99-ms is exceeded), so it can run in CI.
+"""
+import argparse
+import glob
+import os
+import sys
+
+# Allow running from the backend directory or from scripts/
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logic.recording import load_recording, replay
+
+
+def collect_paths(inputs):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(sorted(glob.glob(os.path.join(item, "**", "*.npz"), recursive=True)))
+        else:
+            paths.append(item)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay landmark recordings and benchmark the pose engine")
+    parser.add_argument("inputs", nargs="+", help="Recording files or directories of .npz recordings")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay each recording this many times")
+    parser.add_argument("--max-p99-ms", type=float, default=None, help="Fail when a p99 latency exceeds this")
+    args = parser.parse_args()
+
+    paths = collect_paths(args.inputs)
+    if not paths:
+        print("No recordings found")
+        return 1
+
+    failures = 0
+    total_frames = 0
+    total_seconds = 0.0
+    print(f"{'recording':<48} {'exercise':<18} {'frames':>7} {'fps':>9} {'p50 ms':>8} {'p99 ms':>8} {'reps':>9}")
+    for path in paths:
+        report = replay(load_recording(path), repeat=args.repeat)
+        total_frames += report.frames
+        total_seconds += report.frames / report.fps if report.fps else 0.0
+
+        ok = report.passed and (args.max_p99_ms is None or report.p99_ms <= args.max_p99_ms)
+        failures += not ok
+        golden = "-" if report.expected_count is None else report.expected_count
+        print(f"{os.path.basename(path):<48} {report.exercise:<18} {report.frames:>7} {report.fps:>9.0f} "
+              f"{report.p50_ms:>8.3f} {report.p99_ms:>8.3f} {f'{report.count}/{golden}':>9}"
+              f"{'' if ok else '  FAIL'}")
+
+    if total_seconds:
+        print(f"\n{len(paths)} recordings, {total_frames} frames, {total_frames / total_seconds:.0f} frames/sec overall")
+    if failures:
+        print(f"{failures} recording(s) failed")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+Write-behind persistence of completed exercise steps.
+
+The pose engine reports a step as soon as its rep target is reached; the
+API queues it here instead of waiting for the client to call /session/log.
+Queued steps are written as SessionDetail rows by a periodic flush (started
+with the app) and, for one session, synchronously when that session ends.
+When a batch fails, its steps are retried one by one so a bad row cannot
+hold back other sessions; steps that still fail stay queued for the next
+flush and are dropped (and logged) after `max_attempts` failed writes.
+"""
+import asyncio
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional
+from uuid import UUID
+from sqlalchemy.orm import Session
+from models import SessionDetail, WorkoutSession
+
+logger = logging.getLogger(__name__)
+
+
+class SessionDetailWriter:
+    def __init__(self, session_factory: Callable[[], Session],
+                 mark_completed: Optional[Callable[[Session, UUID, str], None]] = None,
+                 interval: float = float(os.getenv("SESSION_LOG_FLUSH_SECONDS", "2")),
+                 max_attempts: int = int(os.getenv("SESSION_LOG_MAX_ATTEMPTS", "5"))):
+        self.session_factory = session_factory
+        # Marks today's matching assignments done, e.g. routers.exercises.mark_today_assignment_completed
+        self.mark_completed = mark_completed
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, session_id: UUID, step: Dict[str, Any]) -> None:
+        """Queue one step: exercise_type, reps_completed, duration_seconds, mistakes_count, accuracy_score."""
+        with self._lock:
+            self._pending.append({"session_id": session_id, **step})
+
+    def pending(self, session_id: Optional[UUID] = None) -> int:
+        with self._lock:
+            return sum(1 for step in self._pending if session_id is None or step["session_id"] == session_id)
+
+    def _take(self, session_id: Optional[UUID]) -> List[Dict[str, Any]]:
+        with self._lock:
+            taken = [s for s in self._pending if session_id is None or s["session_id"] == session_id]
+            self._pending = [s for s in self._pending if session_id is not None and s["session_id"] != session_id]
+            return taken
+
+    def flush(self, db: Optional[Session] = None, session_id: Optional[UUID] = None) -> int:
+        """
+        Write the queued steps (of one session, or all); returns the number written.
+        Raises the last error when a step could not be written (it stays queued).
+        """
+        steps = self._take(session_id)
+        if not steps:
+            return 0
+        own_db = db is None
+        db = db or self.session_factory()
+        try:
+            try:
+                return self._write(db, steps)
+            except Exception as e:
+                db.rollback()
+                if len(steps) == 1:
+                    self._requeue(steps, e)
+                    raise
+                logger.warning("Session log batch of %d steps failed, writing them one by one: %s", len(steps), e)
+
+            written, failed, error = 0, [], None
+            for step in steps:
+                try:
+                    written += self._write(db, [step])
+                except Exception as e:
+                    db.rollback()
+                    failed.append(step)
+                    error = e
+            if failed:
+                self._requeue(failed, error)
+                raise error
+            return written
+        finally:
+            if own_db:
+                db.close()
+
+    def _write(self, db: Session, steps: List[Dict[str, Any]]) -> int:
+        """Insert the steps and complete their assignments in one transaction."""
+        owners = dict(
+            db.query(WorkoutSession.session_id, WorkoutSession.user_id)
+            .filter(WorkoutSession.session_id.in_({s["session_id"] for s in steps}))
+            .all()
+        )
+        completed = set()
+        for step in steps:
+            if step["session_id"] not in owners:
+                # The workout session is gone; nothing to attach the step to
+                continue
+            fields = {k: v for k, v in step.items() if k != "attempts"}
+            db.add(SessionDetail(feedback=None, **fields))
+            completed.add((owners[step["session_id"]], step["exercise_type"]))
+        if self.mark_completed is not None:
+            for user_id, exercise_type in completed:
+                self.mark_completed(db, user_id, exercise_type)
+        db.commit()
+        return len(steps)
+
+    def _requeue(self, steps: List[Dict[str, Any]], error: Exception) -> None:
+        """Put failed steps back at the head of the queue, dropping those out of attempts."""
+        kept = []
+        for step in steps:
+            step["attempts"] = step.get("attempts", 0) + 1
+            if step["attempts"] < self.max_attempts:
+                kept.append(step)
+            else:
+                logger.error(
+                    "Dropping %s step of session %s after %d failed writes: %s",
+                    step["exercise_type"], step["session_id"], step["attempts"], error
+                )
+        with self._lock:
+            self._pending[:0] = kept
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self.pending():
+                continue
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.error("Session log flush failed, will retry: %s", e)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Cancel the timer and write whatever is still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self.pending():
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.error("Session log flush on shutdown failed: %s", e)
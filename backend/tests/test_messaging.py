@@ -0,0 +1,117 @@
+import os
+import sys
+import pytest
+from uuid import uuid4
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set test environment variables before importing main
+os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+os.environ.setdefault("SECRET_KEY", "test_super_secret_key")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from main import app
+from auth import create_access_token
+from database import Base, get_db
+from models import User
+
+engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup_db():
+    app.dependency_overrides[get_db] = override_get_db
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+    app.dependency_overrides.clear()
+
+
+def create_user(role):
+    """Returns (user_id, token)."""
+    db = TestingSessionLocal()
+    user = User(user_id=uuid4(), username=f"{role}_{uuid4().hex[:8]}", email=f"{uuid4().hex[:8]}@test.com",
+                role=role, password_hash="any")
+    db.add(user)
+    db.commit()
+    user_id = str(user.user_id)
+    db.close()
+    return user_id, create_access_token({"sub": user_id})
+
+
+def test_sent_messages_are_pushed_and_can_be_synced():
+    doctor_id, doctor_token = create_user("doctor")
+    patient_id, patient_token = create_user("patient")
+
+    # One client so the socket and the POST share the app's event loop
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/api/ws/user?token={patient_token}") as patient_channel:
+            response = client.post(
+                "/api/messages",
+                json={"receiver_id": patient_id, "content": "How is the knee today?"},
+                headers={"Authorization": f"Bearer {doctor_token}"},
+            )
+            assert response.status_code == 200
+            sent = response.json()
+
+            event = patient_channel.receive_json()
+            assert event["type"] == "message"
+            assert event["message"] == sent
+
+        patient_auth = {"Authorization": f"Bearer {patient_token}"}
+        synced = client.get("/api/messages/sync?since_id=0", headers=patient_auth).json()
+        assert [m["message_id"] for m in synced] == [sent["message_id"]]
+        assert client.get(f"/api/messages/sync?since_id={sent['message_id']}", headers=patient_auth).json() == []
+        # Other users' messages never leak into a sync
+        _, other_token = create_user("patient")
+        assert client.get("/api/messages/sync", headers={"Authorization": f"Bearer {other_token}"}).json() == []
+
+
+def test_user_channel_requires_a_token():
+    with pytest.raises(Exception):
+        with TestClient(app).websocket_connect("/api/ws/user") as ws:
+            ws.receive_json()
+
+
+def test_notifications_are_pushed_counted_and_paged_by_keyset():
+    patient_id, patient_token = create_user("patient")
+    _, doctor_token = create_user("doctor")
+    doctor_auth = {"Authorization": f"Bearer {doctor_token}"}
+    patient_auth = {"Authorization": f"Bearer {patient_token}"}
+
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/api/ws/user?token={patient_token}") as patient_channel:
+            for title in ("First", "Second", "Third"):
+                response = client.post("/api/notifications", json={"user_id": patient_id, "title": title}, headers=doctor_auth)
+                assert response.status_code == 200
+                event = patient_channel.receive_json()
+                assert event["type"] == "notification"
+                assert event["notification"]["title"] == title
+            assert client.get(f"/api/notifications/{patient_id}/unread-count", headers=patient_auth).json() == {"unread_count": 3}
+
+            first = client.get(f"/api/notifications/{patient_id}?limit=2", headers=patient_auth).json()
+            assert [n["title"] for n in first["items"]] == ["Third", "Second"]
+            assert first["unread_count"] == 3
+            last = client.get(
+                f"/api/notifications/{patient_id}?limit=2&before_id={first['next_before_id']}", headers=patient_auth
+            ).json()
+            assert [n["title"] for n in last["items"]] == ["First"]
+            assert last["next_before_id"] is None
+
+            assert client.post(f"/api/notifications/{patient_id}/read-all", headers=patient_auth).status_code == 200
+            assert patient_channel.receive_json() == {"type": "notifications_read"}
+        assert client.get(f"/api/notifications/{patient_id}/unread-count", headers=patient_auth).json() == {"unread_count": 0}
+        items = client.get(f"/api/notifications/{patient_id}", headers=patient_auth).json()["items"]
+        assert all(n["is_read"] for n in items)
@@ -0,0 +1,662 @@
+import asyncio
+import json
+import math
+import os
+import sys
+import numpy as np
+import pytest
+from uuid import UUID, uuid4
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set test environment variables before importing main
+os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+os.environ.setdefault("SECRET_KEY", "test_super_secret_key")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from main import app
+from auth import create_access_token
+from database import Base, get_db
+from models import User, WorkoutSession, SessionDetail, RepEvent
+from logic.wire import encode_frame
+from logic import service as pose_service
+from logic.recording import load_recording, replay
+from exercise_logic import POSE_EXECUTOR, PoseError, SESSION_REGISTRY
+from routers.exercises import SESSION_LOG_WRITER, _LatestFrame
+from session_log import SessionDetailWriter
+
+# Setup test DB
+engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+client = TestClient(app)
+
+@pytest.fixture(scope="module", autouse=True)
+def setup_db():
+    app.dependency_overrides[get_db] = override_get_db
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+    app.dependency_overrides.clear()
+
+
+def create_patient_session():
+    """Create a patient with an open workout session; returns (session_id, token)."""
+    db = TestingSessionLocal()
+    patient = User(user_id=uuid4(), username=f"pt_{uuid4().hex[:8]}", email=f"{uuid4().hex[:8]}@test.com",
+                   role="patient", password_hash="any")
+    db.add(patient)
+    db.commit()
+    session = WorkoutSession(user_id=patient.user_id)
+    db.add(session)
+    db.commit()
+    session_id, user_id = str(session.session_id), str(patient.user_id)
+    db.close()
+    return session_id, create_access_token({"sub": user_id})
+
+
+def flexion_pose(angle_deg, visibility=0.9):
+    """33 landmarks of a patient raising the left arm `angle_deg` forward; right arm hidden."""
+    landmarks = [{"x": 0.5, "y": 0.5, "z": 0.0, "visibility": 0.1} for _ in range(33)]
+    rad = math.radians(angle_deg)
+    shoulder = (0.5, 0.3)
+    points = {
+        11: shoulder,
+        13: (shoulder[0] + 0.15 * math.sin(rad), shoulder[1] + 0.15 * math.cos(rad)),
+        15: (shoulder[0] + 0.3 * math.sin(rad), shoulder[1] + 0.3 * math.cos(rad)),
+        23: (0.5, 0.7),
+    }
+    for index, (x, y) in points.items():
+        landmarks[index] = {"x": x, "y": y, "z": 0.0, "visibility": visibility}
+    return landmarks
+
+
+FLEXION_REP = [0, 20, 150, 60, 10]
+
+
+def curl_pose(elbow_angle_deg):
+    """33 landmarks of a left-arm bicep curl with the upper arm kept against the torso."""
+    landmarks = [{"x": 0.5, "y": 0.5, "z": 0.0, "visibility": 0.1} for _ in range(33)]
+    rad = math.radians(elbow_angle_deg)
+    points = {
+        11: (0.5, 0.3),
+        13: (0.5, 0.5),
+        15: (0.5 + 0.2 * math.sin(rad), 0.5 - 0.2 * math.cos(rad)),
+        23: (0.5, 0.7),
+    }
+    for index, (x, y) in points.items():
+        landmarks[index] = {"x": x, "y": y, "z": 0.0, "visibility": 0.9}
+    return landmarks
+
+
+def packed(landmarks):
+    return [(lm["x"], lm["y"], lm["z"], lm["visibility"]) for lm in landmarks]
+
+
+def test_process_landmarks_requires_authentication():
+    session_id, _ = create_patient_session()
+    response = client.post("/api/process_landmarks", json={
+        "landmarks": flexion_pose(0),
+        "current_exercise": "shoulder-flexion",
+        "session_id": session_id,
+    })
+    assert response.status_code == 401
+
+
+def test_pose_endpoints_reject_sessions_of_other_patients():
+    victim_session, victim_token = create_patient_session()
+    _, token = create_patient_session()
+    headers = {"Authorization": f"Bearer {token}"}
+    frame = {"landmarks": flexion_pose(0), "current_exercise": "shoulder-flexion"}
+
+    assert client.post("/api/process_landmarks", headers=headers,
+                       json={**frame, "session_id": victim_session}).status_code == 403
+    assert client.post("/api/select_exercise", headers=headers, params={
+        "exercise_name": "shoulder-flexion", "session_id": victim_session, "target_reps": 1,
+    }).status_code == 403
+    assert client.get("/api/process_landmarks/stats", headers=headers,
+                      params={"session_id": victim_session}).status_code == 403
+    assert client.post("/api/calibration/start", headers=headers, params={
+        "exercise_name": "shoulder-flexion", "session_id": victim_session,
+    }).status_code == 403
+    assert client.post("/api/process_landmarks", headers=headers,
+                       json={**frame, "session_id": str(uuid4())}).status_code == 404
+    assert client.post("/api/process_landmarks", headers=headers,
+                       json={**frame, "user_id": str(uuid4())}).status_code == 403
+    with pytest.raises(Exception):
+        with client.websocket_connect(f"/api/ws/pose/{victim_session}?token={token}") as ws:
+            ws.receive_json()
+    # Without a session the caller's own state is used
+    assert client.post("/api/process_landmarks", headers=headers, json=frame).status_code == 200
+
+
+def test_process_landmarks_keeps_sessions_apart():
+    session_a, token = create_patient_session()
+    headers = {"Authorization": f"Bearer {token}"}
+    session_b = client.post("/api/session/start", json={}, headers=headers).json()["session_id"]
+    for angle in FLEXION_REP:
+        response = client.post("/api/process_landmarks", headers=headers, json={
+            "landmarks": flexion_pose(angle),
+            "current_exercise": "shoulder-flexion",
+            "session_id": session_a,
+        })
+        assert response.status_code == 200
+    assert response.json()["shoulder_flexion_count"] == 1
+
+    response = client.post("/api/process_landmarks", headers=headers, json={
+        "landmarks": flexion_pose(0),
+        "current_exercise": "shoulder-flexion",
+        "session_id": session_b,
+    })
+    assert response.json()["shoulder_flexion_count"] == 0
+
+
+def test_process_landmarks_compact_reports_only_the_current_exercise():
+    session_id, token = create_patient_session()
+    headers = {"Authorization": f"Bearer {token}"}
+    for angle in FLEXION_REP:
+        response = client.post("/api/process_landmarks", headers=headers, json={
+            "landmarks": flexion_pose(angle),
+            "current_exercise": "shoulder-flexion",
+            "session_id": session_id,
+            "compact": True,
+        })
+        assert response.status_code == 200
+    body = response.json()
+    assert set(body) == {"exercise", "count", "state", "state_name", "feedback"}
+    assert body["exercise"] == "shoulder-flexion"
+    assert body["count"] == 1
+    assert isinstance(body["feedback"], list)
+
+    # Both modes read the same state
+    response = client.post("/api/process_landmarks", headers=headers, json={
+        "landmarks": flexion_pose(0),
+        "current_exercise": "shoulder-flexion",
+        "session_id": session_id,
+    })
+    assert response.json()["shoulder_flexion_count"] == 1
+
+
+def test_process_landmarks_batch_reports_each_frame():
+    session_id, token = create_patient_session()
+    headers = {"Authorization": f"Bearer {token}"}
+    frames = [{"landmarks": flexion_pose(angle), "timestamp": i * 0.5} for i, angle in enumerate(FLEXION_REP * 2)]
+    response = client.post("/api/process_landmarks/batch", headers=headers, json={
+        "frames": frames,
+        "current_exercise": "Nâng vai",
+        "session_id": session_id,
+    })
+    assert response.status_code == 200, response.json()
+    data = response.json()
+    assert [f["state_name"] for f in data["frames"][:5]] == [
+        "IDLE", "FLEXION_START", "FLEXION_UP", "FLEXION_DOWN", "IDLE"
+    ]
+    assert [f["count"] for f in data["frames"]] == [0, 0, 0, 0, 1, 1, 1, 1, 1, 2]
+    assert data["frames"][-1]["timestamp"] == 4.5
+    assert data["final"]["shoulder_flexion_count"] == 2
+
+
+def test_process_landmarks_batch_rejects_short_frame_without_side_effects():
+    session_id, token = create_patient_session()
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.post("/api/process_landmarks/batch", headers=headers, json={
+        "frames": [{"landmarks": flexion_pose(20)}, {"landmarks": flexion_pose(150)[:10]}],
+        "current_exercise": "shoulder-flexion",
+        "session_id": session_id,
+    })
+    assert response.status_code == 400
+    response = client.post("/api/process_landmarks", headers=headers, json={
+        "landmarks": flexion_pose(0),
+        "current_exercise": "shoulder-flexion",
+        "session_id": session_id,
+    })
+    assert response.json()["shoulder_flexion_state_name"] == "IDLE"
+
+
+def test_pose_websocket_streams_deltas():
+    session_id, token = create_patient_session()
+    with client.websocket_connect(f"/api/ws/pose/{session_id}?token={token}") as ws:
+        replies = []
+        for angle in FLEXION_REP:
+            ws.send_text(json.dumps({
+                "landmarks": flexion_pose(angle),
+                "current_exercise": "shoulder-flexion",
+            }))
+            replies.append(ws.receive_json())
+
+    assert replies[0]["seq"] == 1
+    assert replies[0]["shoulder_flexion_state_name"] == "IDLE"
+    assert "squat_count" in replies[0]
+    # Later replies only carry what changed
+    assert "squat_count" not in replies[1]
+    assert replies[1]["shoulder_flexion_state_name"] == "FLEXION_START"
+    assert replies[-1]["shoulder_flexion_count"] == 1
+
+
+def test_pose_websocket_reports_bad_frames():
+    session_id, token = create_patient_session()
+    with client.websocket_connect(f"/api/ws/pose/{session_id}?token={token}") as ws:
+        ws.send_text(json.dumps({"landmarks": flexion_pose(0)[:5], "current_exercise": "squat"}))
+        assert ws.receive_json()["error"] == "Not enough landmarks detected"
+        ws.send_text("not json")
+        assert ws.receive_json()["error"] == "Invalid frame"
+
+
+def test_latest_frame_mailbox_drains_then_ends_after_close():
+    async def run():
+        mailbox = _LatestFrame()
+        mailbox.put(b"old")
+        mailbox.put(b"new")
+        mailbox.close()
+        # Both happened before the consumer woke: the last frame, then the end
+        assert await mailbox.get() == b"new"
+        assert await asyncio.wait_for(mailbox.get(), timeout=1) is None
+        assert mailbox.dropped == 1
+
+    asyncio.run(run())
+
+
+def test_pose_websocket_rejects_missing_token():
+    session_id, _ = create_patient_session()
+    with pytest.raises(Exception):
+        with client.websocket_connect(f"/api/ws/pose/{session_id}") as ws:
+            ws.receive_json()
+
+
+def test_process_landmarks_binary():
+    session_id, token = create_patient_session()
+    headers = {"Authorization": f"Bearer {token}"}
+    for angle in FLEXION_REP:
+        response = client.post(
+            f"/api/process_landmarks/binary?session_id={session_id}",
+            content=encode_frame("shoulder-flexion", packed(flexion_pose(angle))),
+            headers={**headers, "Content-Type": "application/octet-stream"},
+        )
+        assert response.status_code == 200, response.json()
+    assert response.json()["shoulder_flexion_count"] == 1
+
+    response = client.post(f"/api/process_landmarks/binary?session_id={session_id}", content=b"garbage", headers=headers)
+    assert response.status_code == 400
+
+
+def test_pose_websocket_accepts_binary_frames():
+    session_id, token = create_patient_session()
+    with client.websocket_connect(f"/api/ws/pose/{session_id}?token={token}") as ws:
+        for angle in FLEXION_REP:
+            ws.send_bytes(encode_frame("shoulder-flexion", packed(flexion_pose(angle)), dtype="float16"))
+            reply = ws.receive_json()
+    assert reply["shoulder_flexion_count"] == 1
+
+
+@pytest.mark.parametrize("capture_times, expected_count", [
+    ([0.0, 1.0, 2.5], 1),   # 1.0s up, 1.5s down: a controlled rep
+    ([0.0, 0.1, 0.2], 0),   # too fast in both directions
+])
+def test_batch_durations_follow_capture_timestamps(capture_times, expected_count):
+    session_id, token = create_patient_session()
+    headers = {"Authorization": f"Bearer {token}"}
+    frames = [{"landmarks": curl_pose(angle), "timestamp": t}
+              for angle, t in zip([170, 50, 170], capture_times)]
+    response = client.post("/api/process_landmarks/batch", headers=headers, json={
+        "frames": frames,
+        "current_exercise": "bicep-curl",
+        "session_id": session_id,
+    })
+    assert response.status_code == 200, response.json()
+    assert response.json()["final"]["curl_count"] == expected_count
+
+
+def test_rep_timing_excludes_the_rest_between_reps():
+    key = f"session:{uuid4()}"
+    # Two curls, 1.0 s up each; the arm rests straight from t=2.5 to t=10 between them
+    for angle, t in [(170, 0.0), (50, 1.0), (170, 2.5), (168, 6.0), (171, 10.0), (50, 11.0), (170, 12.5)]:
+        result = pose_service.process_frame(key, "bicep-curl", np.array(packed(curl_pose(angle))), timestamp=t)
+    assert result["curl_count"] == 2
+    first, second = pose_service.end_session(key)
+    assert first["start_time"] == 0.0 and second["start_time"] == 10.0
+    assert first["concentric_s"] == pytest.approx(1.0)
+    assert second["concentric_s"] == pytest.approx(1.0)
+
+
+def test_evicted_engine_keeps_its_rep_events_and_recording(tmp_path, monkeypatch):
+    monkeypatch.setattr(SESSION_REGISTRY, "record_dir", str(tmp_path))
+    key = f"session:{uuid4()}"
+    for angle, t in [(170, 0.0), (50, 1.0), (170, 2.5)]:
+        pose_service.process_frame(key, "bicep-curl", np.array(packed(curl_pose(angle))), timestamp=t)
+    monkeypatch.setattr(SESSION_REGISTRY, "idle_timeout", 0)
+    assert SESSION_REGISTRY.evict_idle() >= 1
+    assert key not in SESSION_REGISTRY
+    assert len(list(tmp_path.glob("*-evicted-*.npz"))) == 1
+
+    [event] = pose_service.end_session(key)
+    assert event["exercise"] == "bicep-curl" and event["valid"]
+    assert pose_service.end_session(key) == []
+
+
+def test_recorded_session_replays_to_same_count(tmp_path, monkeypatch):
+    monkeypatch.setattr(SESSION_REGISTRY, "record_dir", str(tmp_path))
+    session_id, token = create_patient_session()
+    headers = {"Authorization": f"Bearer {token}"}
+    for i, angle in enumerate(FLEXION_REP * 2):
+        client.post("/api/process_landmarks", headers=headers, json={
+            "landmarks": flexion_pose(angle),
+            "current_exercise": "shoulder-flexion",
+            "session_id": session_id,
+            "timestamp": i * 0.5,
+        })
+    response = client.post(f"/api/session/end/{session_id}", headers=headers)
+    assert response.status_code == 200
+
+    [path] = tmp_path.glob("*.npz")
+    report = replay(load_recording(str(path)))
+    assert report.expected_count == 2
+    assert report.passed
+
+
+def test_frames_without_capture_times_replay_with_the_server_clock(tmp_path, monkeypatch):
+    monkeypatch.setattr(SESSION_REGISTRY, "record_dir", str(tmp_path))
+    clock = [1000.0]
+    monkeypatch.setattr("logic.strategies.base.time.time", lambda: clock[0])
+    key = f"session:{uuid4()}"
+    # A controlled curl, 1.2 s between frames, sent without client timestamps
+    for angle in (170, 50, 170):
+        result = pose_service.process_frame(key, "bicep-curl", np.array(packed(curl_pose(angle))))
+        clock[0] += 1.2
+    assert result["curl_count"] == 1
+    pose_service.end_session(key)
+
+    [path] = tmp_path.glob("*.npz")
+    recording = load_recording(str(path))
+    assert recording.timestamps.tolist() == pytest.approx([1000.0, 1001.2, 1002.4])
+    assert recording.frames.dtype == np.float64
+    assert replay(recording).passed
+
+
+# Occluded (visibility 0.3) and repeated frames the frame gate skips; ungated they complete a rep
+GATED_FLEXION = [(150, 0.9), (150, 0.9), (150, 0.3), (150, 0.9), (20, 0.9),
+                 (0, 0.9), (0, 0.9), (60, 0.9), (0, 0.3), (0, 0.3)]
+
+
+def test_recording_with_gated_frames_replays_to_the_live_count(tmp_path, monkeypatch):
+    monkeypatch.setattr(SESSION_REGISTRY, "record_dir", str(tmp_path))
+    session_id, token = create_patient_session()
+    headers = {"Authorization": f"Bearer {token}"}
+    for i, (angle, visibility) in enumerate(GATED_FLEXION):
+        response = client.post("/api/process_landmarks", headers=headers, json={
+            "landmarks": flexion_pose(angle, visibility),
+            "current_exercise": "shoulder-flexion",
+            "session_id": session_id,
+            "timestamp": i * 0.5,
+        })
+    live_count = response.json()["shoulder_flexion_count"]
+    assert client.post(f"/api/session/end/{session_id}", headers=headers).status_code == 200
+
+    [path] = tmp_path.glob("*.npz")
+    recording = load_recording(str(path))
+    assert recording.frames.shape[0] == len(GATED_FLEXION)
+    report = replay(recording)
+    assert report.count == live_count == recording.expected_count
+    # The gate is what makes the difference
+    assert replay(recording, gate={"min_visibility": 0, "epsilon": 0}).count != live_count
+
+
+def test_process_landmarks_multi_tracks_each_person():
+    session_id, token = create_patient_session()
+    headers = {"Authorization": f"Bearer {token}"}
+
+    def shifted(angle, dx):
+        return [dict(lm, x=lm["x"] + dx) for lm in flexion_pose(angle)]
+
+    for angle in FLEXION_REP:
+        response = client.post("/api/process_landmarks/multi", headers=headers, json={
+            "people": [shifted(0, 0.3), shifted(angle, -0.3)],
+            "current_exercise": "shoulder-flexion",
+            "session_id": session_id,
+        })
+        assert response.status_code == 200, response.json()
+    tracks = {t["index"]: t for t in response.json()["tracks"]}
+    assert tracks[0]["count"] == 0 and tracks[1]["count"] == 1
+    assert tracks[0]["track_id"] != tracks[1]["track_id"]
+
+    response = client.post("/api/process_landmarks/multi", headers=headers, json={
+        "people": [flexion_pose(0)[:10]], "current_exercise": "shoulder-flexion", "session_id": session_id,
+    })
+    assert response.status_code == 400
+
+
+def test_rep_events_feed_accuracy_and_are_stored_at_session_end():
+    session_id, token = create_patient_session()
+    headers = {"Authorization": f"Bearer {token}"}
+    for i, angle in enumerate(FLEXION_REP * 2):
+        client.post("/api/process_landmarks", headers=headers, json={
+            "landmarks": flexion_pose(angle),
+            "current_exercise": "shoulder-flexion",
+            "session_id": session_id,
+            "timestamp": i * 0.5,
+        })
+    response = client.post("/api/session/log", headers=headers, json={
+        "session_id": session_id, "exercise_type": "shoulder-flexion", "reps_completed": 2,
+    })
+    assert response.status_code == 200, response.json()
+    assert float(response.json()["accuracy_score"]) == 100.0
+    assert response.json()["mistakes_count"] == 0
+
+    response = client.post(f"/api/session/end/{session_id}", headers=headers)
+    assert response.status_code == 200
+    db = TestingSessionLocal()
+    events = db.query(RepEvent).filter(RepEvent.session_id == UUID(session_id)).order_by(RepEvent.rep_index).all()
+    db.close()
+    assert [e.rep_index for e in events] == [1, 2]
+    first = events[0]
+    assert first.is_valid and first.exercise_type == "shoulder-flexion"
+    assert first.max_angle > 140 and first.min_angle < 30
+    # Raised from t=0.5 to the peak at t=1.0, lowered until the count at t=2.0
+    assert first.concentric_seconds == pytest.approx(0.5)
+    assert first.eccentric_seconds == pytest.approx(1.0)
+
+
+def test_rep_events_survive_a_failed_session_end(monkeypatch):
+    session_id, token = create_patient_session()
+    headers = {"Authorization": f"Bearer {token}"}
+    for i, angle in enumerate(FLEXION_REP):
+        client.post("/api/process_landmarks", headers=headers, json={
+            "landmarks": flexion_pose(angle),
+            "current_exercise": "shoulder-flexion",
+            "session_id": session_id,
+            "timestamp": i * 0.5,
+        })
+
+    def broken_row(session_id, event):
+        raise ValueError("database unavailable")
+
+    with monkeypatch.context() as patch:
+        patch.setattr("routers.exercises._rep_event_row", broken_row)
+        assert client.post(f"/api/session/end/{session_id}", headers=headers).status_code == 400
+
+    assert client.post(f"/api/session/end/{session_id}", headers=headers).status_code == 200
+    db = TestingSessionLocal()
+    events = db.query(RepEvent).filter(RepEvent.session_id == UUID(session_id)).all()
+    db.close()
+    assert [e.rep_index for e in events] == [1]
+
+
+def test_engine_logs_step_when_target_is_reached():
+    session_id, token = create_patient_session()
+    headers = {"Authorization": f"Bearer {token}"}
+    client.post("/api/select_exercise", headers=headers, params={
+        "exercise_name": "shoulder-flexion", "session_id": session_id, "target_reps": 2,
+    })
+    for i, angle in enumerate(FLEXION_REP * 3):
+        client.post("/api/process_landmarks", headers=headers, json={
+            "landmarks": flexion_pose(angle),
+            "current_exercise": "shoulder-flexion",
+            "session_id": session_id,
+            "timestamp": i * 0.5,
+        })
+
+    # A client still calling /session/log gets the server's row, not a duplicate
+    response = client.post("/api/session/log", headers=headers, json={
+        "session_id": session_id, "exercise_type": "shoulder-flexion", "reps_completed": 2,
+    })
+    assert response.status_code == 200, response.json()
+    assert response.json()["reps_completed"] == 2
+    assert float(response.json()["accuracy_score"]) == 100.0
+
+    assert client.post(f"/api/session/end/{session_id}", headers=headers).status_code == 200
+    db = TestingSessionLocal()
+    details = db.query(SessionDetail).filter(SessionDetail.session_id == UUID(session_id)).all()
+    db.close()
+    assert [(d.exercise_type, d.reps_completed) for d in details] == [("shoulder-flexion", 2)]
+
+
+def test_steps_are_only_logged_for_the_callers_own_session():
+    victim_session, _ = create_patient_session()
+    _, token = create_patient_session()
+    headers = {"Authorization": f"Bearer {token}"}
+    params = {"exercise_name": "shoulder-flexion", "session_id": victim_session, "target_reps": 1}
+    assert client.post("/api/select_exercise", params=params).status_code == 401
+    assert client.post("/api/select_exercise", params=params, headers=headers).status_code == 403
+    for i, angle in enumerate(FLEXION_REP):
+        client.post("/api/process_landmarks", json={
+            "landmarks": flexion_pose(angle), "current_exercise": "shoulder-flexion",
+            "session_id": victim_session, "timestamp": i * 0.5,
+        })
+    assert SESSION_LOG_WRITER.pending(UUID(victim_session)) == 0
+
+
+def test_pose_worker_failures_are_reported_as_503(monkeypatch):
+    session_id, token = create_patient_session()
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def crashed(*args):
+        raise PoseError(503, "Pose worker restarted, please retry")
+
+    monkeypatch.setattr(POSE_EXECUTOR, "run", crashed)
+    responses = [
+        client.post("/api/select_exercise", headers=headers, params={"exercise_name": "squat", "session_id": session_id}),
+        client.post("/api/session/log", headers=headers, json={
+            "session_id": session_id, "exercise_type": "squat", "reps_completed": 1,
+        }),
+        client.post(f"/api/session/end/{session_id}", headers=headers),
+    ]
+    assert [r.status_code for r in responses] == [503, 503, 503]
+
+
+def test_session_end_flushes_queued_steps():
+    session_id, token = create_patient_session()
+    headers = {"Authorization": f"Bearer {token}"}
+    client.post("/api/select_exercise", headers=headers, params={
+        "exercise_name": "shoulder-flexion", "session_id": session_id, "target_reps": 1,
+    })
+    for i, angle in enumerate(FLEXION_REP):
+        client.post("/api/process_landmarks", headers=headers, json={
+            "landmarks": flexion_pose(angle),
+            "current_exercise": "shoulder-flexion",
+            "session_id": session_id,
+            "timestamp": i * 0.5,
+        })
+    assert SESSION_LOG_WRITER.pending(UUID(session_id)) == 1
+
+    response = client.post(f"/api/session/end/{session_id}", headers=headers)
+    assert response.status_code == 200
+    assert SESSION_LOG_WRITER.pending(UUID(session_id)) == 0
+    db = TestingSessionLocal()
+    detail = db.query(SessionDetail).filter(SessionDetail.session_id == UUID(session_id)).one()
+    db.close()
+    assert detail.reps_completed == 1 and detail.mistakes_count == 0
+
+
+def test_one_failing_step_does_not_block_other_sessions():
+    def mark_completed(db, user_id, exercise_type):
+        if exercise_type == "knee-raise":
+            raise ValueError("constraint violated")
+
+    writer = SessionDetailWriter(TestingSessionLocal, mark_completed, max_attempts=3)
+    (good, _), (bad, _) = create_patient_session(), create_patient_session()
+    step = {"reps_completed": 5, "duration_seconds": 30, "mistakes_count": 0, "accuracy_score": 100.0}
+    writer.add(UUID(bad), {"exercise_type": "knee-raise", **step})
+    writer.add(UUID(good), {"exercise_type": "squat", **step})
+
+    with pytest.raises(ValueError):
+        writer.flush()
+    db = TestingSessionLocal()
+    assert db.query(SessionDetail).filter(SessionDetail.session_id == UUID(good)).count() == 1
+    db.close()
+    assert writer.pending(UUID(bad)) == 1 and writer.pending(UUID(good)) == 0
+
+    # Given up on after max_attempts failed writes
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            writer.flush()
+    assert writer.pending() == 0
+
+
+LIMITED_FLEXION_REP = [0, 20, 50, 80, 100, 80, 50, 20, 10]
+
+
+def send_flexion(session_id, headers, angles):
+    response = None
+    for i, angle in enumerate(angles):
+        response = client.post("/api/process_landmarks", headers=headers, json={
+            "landmarks": flexion_pose(angle),
+            "current_exercise": "shoulder-flexion",
+            "session_id": session_id,
+            "timestamp": i * 0.5,
+        })
+    return response.json()
+
+
+def test_calibrated_thresholds_are_loaded_at_session_start():
+    session_id, token = create_patient_session()
+    headers = {"Authorization": f"Bearer {token}"}
+    # A patient who can only raise the arm to ~100 degrees never completes a rep
+    assert send_flexion(session_id, headers, LIMITED_FLEXION_REP * 4)["shoulder_flexion_count"] == 0
+
+    params = {"exercise_name": "shoulder-flexion", "session_id": session_id}
+    assert client.post("/api/calibration/start", params=params, headers=headers).status_code == 200
+    send_flexion(session_id, headers, LIMITED_FLEXION_REP * 4)
+    response = client.post("/api/calibration/finish", params=params, headers=headers)
+    assert response.status_code == 200, response.json()
+    profile = response.json()
+    assert profile["sample_count"] == 36
+    assert profile["thresholds"]["flex_up_threshold"] < 100 < profile["range_max"] + 1
+
+    new_session = client.post("/api/session/start", json={}, headers=headers).json()["session_id"]
+    assert send_flexion(new_session, headers, LIMITED_FLEXION_REP * 2)["shoulder_flexion_count"] == 2
+
+
+def test_calibration_needs_enough_movement():
+    session_id, token = create_patient_session()
+    headers = {"Authorization": f"Bearer {token}"}
+    params = {"exercise_name": "shoulder-flexion", "session_id": session_id}
+    client.post("/api/calibration/start", params=params, headers=headers)
+    send_flexion(session_id, headers, [10] * 40)
+    response = client.post("/api/calibration/finish", params=params, headers=headers)
+    assert response.status_code == 400
+
+
+def test_gate_skips_occluded_and_still_frames():
+    session_id, token = create_patient_session()
+    headers = {"Authorization": f"Bearer {token}"}
+    frames = [flexion_pose(0, visibility=0.3)] * 3 + [flexion_pose(20)] * 4 + [flexion_pose(150)]
+    for landmarks in frames:
+        response = client.post("/api/process_landmarks", headers=headers, json={
+            "landmarks": landmarks, "current_exercise": "shoulder-flexion", "session_id": session_id,
+        })
+        assert response.status_code == 200
+    assert response.json()["shoulder_flexion_state_name"] == "FLEXION_UP"
+
+    stats = client.get("/api/process_landmarks/stats", params={"session_id": session_id}, headers=headers).json()
+    assert stats["gate"]["shoulder-flexion"] == {
+        "frames": 8, "skipped_low_confidence": 3, "skipped_duplicate": 3, "skip_ratio": 0.75,
+    }
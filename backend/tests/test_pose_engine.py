@@ -0,0 +1,586 @@
+import asyncio
+import math
+import os
+import random
+import sys
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logic.common import FeedbackPriority, Landmark, LandmarkFrame
+from logic.counter import ExerciseCounter
+from logic.executor import PoseExecutor
+from logic.gate import FrameGate
+from logic.metrics import METRICS, Histogram, StageMetrics, summarize
+from logic.filters import EMA, OneEuro, RunningMean, make_filter
+from logic.spec import SpecStrategy, compile_spec
+from logic.strategies.knee_raise import KneeRaiseStrategy
+from logic.strategies.squat import SquatStrategy
+from logic.tracking import MultiPersonTracker
+from logic.kernel import DEFAULT_FEATURES, calculate_all_angles, frame_angles, landmarks_from_array
+from logic.recording import LandmarkRecorder, Recording, load_recording, replay, save_recording
+from logic.registry import SessionRegistry
+from logic.reps import RepTracker, accuracy
+from logic import service as pose_service
+from logic.utils import AngleCalculator, FeedbackManager
+from logic.wire import EXERCISE_CODES, WireFormatError, decode_frame, encode_frame, exercise_codes
+
+
+def test_registry_isolates_sessions():
+    registry = SessionRegistry()
+    with registry.acquire("session:a") as engine:
+        engine.counter.strategies['squat'].counter = 3
+    with registry.acquire("session:b") as engine:
+        assert engine.counter.squat_counter == 0
+    with registry.acquire("session:a") as engine:
+        assert engine.counter.squat_counter == 3
+
+
+def test_registry_evicts_least_recently_used_at_capacity():
+    registry = SessionRegistry(max_sessions=2)
+    registry.get("a")
+    registry.get("b")
+    registry.get("a")  # "b" is now the least recently used
+    registry.get("c")
+    assert len(registry) == 2
+    assert "a" in registry and "c" in registry
+    assert "b" not in registry
+
+
+def test_registry_evicts_idle_sessions():
+    registry = SessionRegistry(idle_timeout=60)
+    stale = registry.get("stale")
+    registry.get("fresh")
+    stale.last_used -= 120
+    assert registry.evict_idle() == 1
+    assert "stale" not in registry
+    assert "fresh" in registry
+
+
+def test_registry_hands_evicted_sessions_to_the_hook():
+    evicted = []
+    registry = SessionRegistry(max_sessions=2, idle_timeout=60, on_evict=lambda s: evicted.append(s.key))
+    registry.get("stale").last_used -= 120
+    registry.get("a")
+    registry.get("b")  # idle "stale" goes first, leaving room
+    registry.get("c")  # then the least recently used "a"
+    assert evicted == ["stale", "a"]
+
+
+def _scalar_angles(lm):
+    """Reference: the per-joint AngleCalculator calls the kernel replaces."""
+    angles = {}
+    angles['knee_angle_avg'] = AngleCalculator.calculate_average_knee_angle(lm[23], lm[25], lm[27], lm[24], lm[26], lm[28])
+    mid_hip = [(lm[23].x + lm[24].x) / 2, (lm[23].y + lm[24].y) / 2]
+    mid_shoulder = [(lm[11].x + lm[12].x) / 2, (lm[11].y + lm[12].y) / 2]
+    angles['back_angle'] = AngleCalculator.calculate_vertical_angle(mid_hip, mid_shoulder)
+    angles['left_bicep_angle'] = AngleCalculator.calculate_bicep_angle(lm[11], lm[13], lm[15])
+    angles['right_bicep_angle'] = AngleCalculator.calculate_bicep_angle(lm[12], lm[14], lm[16])
+    angles['elbow_torso_result'] = AngleCalculator.calculate_elbow_torso_angle(lm[23], lm[11], lm[13], lm[24], lm[12], lm[14])
+    angles['hip_shoulder_angle'] = AngleCalculator.calculate_hip_shoulder_angle(lm[23], lm[11])
+    angles['left_flexion_angle'] = AngleCalculator.calculate_shoulder_flexion_angle(lm[23], lm[11], lm[15])
+    angles['right_flexion_angle'] = AngleCalculator.calculate_shoulder_flexion_angle(lm[24], lm[12], lm[16])
+    angles['left_elbow_angle'] = AngleCalculator.calculate_elbow_bend_angle(lm[11], lm[13], lm[15])
+    angles['right_elbow_angle'] = AngleCalculator.calculate_elbow_bend_angle(lm[12], lm[14], lm[16])
+    angles['left_knee_angle'] = AngleCalculator.calculate_knee_angle(lm[23], lm[25], lm[27])
+    angles['right_knee_angle'] = AngleCalculator.calculate_knee_angle(lm[24], lm[26], lm[28])
+    return angles
+
+
+def test_angle_kernel_matches_scalar_calculator():
+    rng = random.Random(7)
+    for _ in range(200):
+        lm = [Landmark(rng.random(), rng.random(), rng.random(), rng.choice([0.3, 0.65, 0.9]))
+              for _ in range(33)]
+        expected = _scalar_angles(lm)
+        actual = calculate_all_angles(lm)
+        assert actual.keys() == expected.keys()
+        for key, value in expected.items():
+            if isinstance(value, tuple):
+                assert actual[key][3] == value[3]
+                assert actual[key][:3] == pytest.approx(value[:3])
+            elif value is None:
+                assert actual[key] is None, key
+            else:
+                assert actual[key] == pytest.approx(value), key
+
+
+def test_angle_kernel_rejects_short_frames():
+    assert 'error' in calculate_all_angles([Landmark(0, 0)] * 10)
+
+
+def test_wire_frame_round_trip():
+    frame = np.random.default_rng(3).random((33, 4))
+    payload = encode_frame("knee-raise", frame, timestamp=12.5)
+    assert len(payload) == 16 + 33 * 4 * 4
+
+    decoded = decode_frame(payload)
+    assert decoded.exercise == "knee-raise"
+    assert decoded.timestamp == 12.5
+    assert decoded.landmarks.shape == (33, 4)
+    assert np.allclose(decoded.landmarks, frame, atol=1e-6)
+    # The kernel reads the float32 view directly
+    assert calculate_all_angles(decoded.landmarks)['back_angle'] == pytest.approx(
+        calculate_all_angles(frame)['back_angle'], abs=1e-3)
+
+
+def test_wire_rejects_malformed_frames():
+    payload = encode_frame("squat", np.zeros((33, 4)), dtype="float16")
+    assert decode_frame(payload).timestamp is None
+    for bad in (payload[:10], payload[:-2], b"XX" + payload[2:]):
+        with pytest.raises(WireFormatError):
+            decode_frame(bad)
+
+
+def test_wire_codes_cover_spec_only_exercises():
+    # Built-in codes never move; spec-only exercises are appended by name
+    assert EXERCISE_CODES[:4] == ('squat', 'bicep-curl', 'shoulder-flexion', 'knee-raise')
+    assert exercise_codes(["wall-push-up", "knee-raise", "calf-raise"]) == (
+        'squat', 'bicep-curl', 'shoulder-flexion', 'knee-raise', 'calf-raise', 'wall-push-up')
+    with pytest.raises(WireFormatError):
+        encode_frame("not-an-exercise", np.zeros((33, 4)))
+
+
+def _flexion_frame(angle_deg, dx=0.0):
+    """Left arm raised `angle_deg` forward, right side hidden; `dx` shifts the person sideways."""
+    frame = np.tile([0.5, 0.5, 0.0, 0.1], (33, 1))
+    rad = math.radians(angle_deg)
+    for index, (x, y) in {
+        11: (0.5, 0.3),
+        13: (0.5 + 0.15 * math.sin(rad), 0.3 + 0.15 * math.cos(rad)),
+        15: (0.5 + 0.3 * math.sin(rad), 0.3 + 0.3 * math.cos(rad)),
+        23: (0.5, 0.7),
+    }.items():
+        frame[index] = (x, y, 0.0, 0.9)
+    frame[:, 0] += dx
+    return frame
+
+
+def synthetic_flexion_recording(reps, fps=30, expected_count=None):
+    """A smooth 0 -> 150 -> 0 degree sweep per rep, two seconds each."""
+    sweep = [150 * math.sin(math.pi * i / (2 * fps)) for i in range(2 * fps)] + [0.0] * 5
+    angles = sweep * reps
+    return Recording(
+        exercise="shoulder-flexion",
+        frames=np.stack([_flexion_frame(a) for a in angles]),
+        timestamps=np.arange(len(angles)) / fps,
+        expected_count=expected_count,
+    )
+
+
+def test_replay_reports_counts_and_latency(tmp_path):
+    path = str(tmp_path / "flexion.npz")
+    save_recording(path, synthetic_flexion_recording(reps=3, expected_count=3))
+
+    report = replay(load_recording(path), repeat=2)
+    assert report.exercise == "shoulder-flexion"
+    assert report.frames == 2 * 3 * 65
+    assert report.count == 3
+    assert report.passed
+    assert report.fps > 0 and 0 < report.p50_ms <= report.p99_ms
+
+
+def test_recordings_keep_calibrated_thresholds(tmp_path):
+    path = str(tmp_path / "flexion.npz")
+    profiles = {"shoulder-flexion": {"flex_up_threshold": 90.0}}
+    save_recording(path, synthetic_flexion_recording(reps=1)._replace(profiles=profiles))
+    assert load_recording(path).profiles == profiles
+    save_recording(path, synthetic_flexion_recording(reps=1))
+    assert load_recording(path).profiles is None
+
+
+def test_replay_flags_count_regressions():
+    assert not replay(synthetic_flexion_recording(reps=2, expected_count=3)).passed
+
+
+def test_recorder_splits_takes_and_saves_golden_counts(tmp_path):
+    recorder = LandmarkRecorder()
+    take = synthetic_flexion_recording(reps=1)
+    for frame, timestamp in zip(take.frames, take.timestamps):
+        recorder.add("shoulder-flexion", frame, timestamp)
+    recorder.cut("shoulder-flexion", expected_count=1)
+    recorder.add("squat", take.frames[0])
+
+    paths = recorder.save(str(tmp_path), "session-x", {"squat": 0})
+    assert [os.path.basename(p) for p in paths] == ["session-x-shoulder-flexion-0.npz", "session-x-squat-1.npz"]
+    squat = load_recording(paths[1])
+    assert squat.frames.shape == (1, 33, 4) and squat.expected_count == 0
+    assert math.isnan(squat.timestamps[0])
+    assert replay(load_recording(paths[0])).passed
+
+
+class _ListFeedbackManager:
+    """Reference: the sort-and-slice FeedbackManager the ring buffer replaces."""
+
+    def __init__(self, window_size=5):
+        self.feedback_window = []
+        self.window_size = window_size
+        self.current_feedback = []
+        self.priority_queue = []
+        self.rep_completed = False
+        self.rep_summary = []
+
+    def start_new_rep(self):
+        self.__init__(self.window_size)
+
+    def complete_rep(self):
+        self._process_feedback()
+        high_pri = [self.priority_queue[0]['feedback']] if self.priority_queue else []
+        all_feedback = list(set(high_pri + list(self.current_feedback)))
+
+        def sort_key(feedback):
+            max_pri = FeedbackPriority.LOW
+            for item in self.priority_queue:
+                if item['feedback'] == feedback:
+                    max_pri = max(max_pri, -item['priority'])
+            return max_pri
+
+        all_feedback.sort(key=sort_key, reverse=True)
+        self.rep_summary = all_feedback[:2]
+        self.rep_completed = True
+
+    def add_feedback(self, feedback, priority):
+        self.priority_queue.append({'priority': -priority, 'feedback': feedback})
+        self.priority_queue.sort(key=lambda x: x['priority'])
+        self.priority_queue = self.priority_queue[:self.window_size * 2]
+        self.feedback_window.append({'feedback': feedback, 'priority': priority})
+        if len(self.feedback_window) > self.window_size:
+            self.feedback_window.pop(0)
+        self._process_feedback()
+
+    def _process_feedback(self):
+        feedback_count = {}
+        for item in self.feedback_window:
+            feedback_count[item['feedback']] = feedback_count.get(item['feedback'], 0) + 1
+        threshold = math.floor(len(self.feedback_window) / 2)
+        self.current_feedback = [key for key, count in feedback_count.items() if count > threshold]
+
+    def get_feedback(self):
+        return self.rep_summary if self.rep_completed else self.current_feedback
+
+
+@pytest.mark.parametrize("window_size", [1, 2, 5])
+def test_feedback_manager_matches_reference(window_size):
+    rng = random.Random(window_size)
+    messages = ["Xuống sâu hơn", "Quá sâu", "Lên chậm thôi", "Giữ vai cố định"]
+    priorities = [FeedbackPriority.LOW, FeedbackPriority.MEDIUM, FeedbackPriority.HIGH]
+    actual, expected = FeedbackManager(window_size), _ListFeedbackManager(window_size)
+    for _ in range(5000):
+        roll = rng.random()
+        if roll < 0.05:
+            actual.start_new_rep(); expected.start_new_rep()
+        elif roll < 0.1:
+            actual.complete_rep(); expected.complete_rep()
+        else:
+            feedback, priority = rng.choice(messages[:rng.randint(1, 4)]), rng.choice(priorities)
+            actual.add_feedback(feedback, priority); expected.add_feedback(feedback, priority)
+        assert actual.get_feedback() == expected.get_feedback()
+
+
+def test_landmark_frame_reads_array_without_copying():
+    array = np.random.default_rng(5).random((33, 4))
+    frame = LandmarkFrame(array)
+    assert frame.array is array
+    assert len(frame) == 33 and len(frame[:10]) == 10
+    assert (frame[13].x, frame[13].y, frame[13].z, frame[13].visibility) == tuple(array[13])
+    assert frame[-1].visibility == array[32, 3]
+    with pytest.raises(IndexError):
+        frame[33]
+    lm = landmarks_from_array(array)
+    assert AngleCalculator.angle_deg(frame[23], frame[11], frame[13]) == AngleCalculator.angle_deg(lm[23], lm[11], lm[13])
+
+
+def test_strategies_count_the_same_on_landmark_frames():
+    recording = synthetic_flexion_recording(reps=2)
+    by_frame, by_objects = ExerciseCounter(), ExerciseCounter()
+    for array, timestamp in zip(recording.frames.astype(np.float64), recording.timestamps):
+        angles = calculate_all_angles(array)
+        assert by_frame.process_frame("shoulder-flexion", LandmarkFrame(array), angles, timestamp) == \
+            by_objects.process_frame("shoulder-flexion", landmarks_from_array(array), angles, timestamp)
+    assert by_frame.count("shoulder-flexion") == 2
+
+
+def test_running_mean_matches_list_average():
+    rng = random.Random(11)
+    f, recent = RunningMean(3), []
+    for _ in range(100):
+        value = rng.uniform(0, 180)
+        recent = (recent + [value])[-3:]
+        assert f.update(value) == pytest.approx(sum(recent) / len(recent))
+    f.reset()
+    assert f.value is None and f.update(10.0) == 10.0
+
+
+def test_ema_and_one_euro_smooth_jitter_but_follow_steps():
+    rng = random.Random(13)
+    ema, euro = EMA(0.3), OneEuro(min_cutoff=1.0, beta=0.05)
+    for i in range(60):
+        noisy = 90 + rng.uniform(-5, 5)
+        ema.update(noisy, i / 30)
+        euro.update(noisy, i / 30)
+    assert abs(ema.value - 90) < 3 and abs(euro.value - 90) < 3
+    for i in range(60, 90):
+        ema.update(170, i / 30)
+        euro.update(170, i / 30)
+    assert ema.value == pytest.approx(170, abs=1) and euro.value == pytest.approx(170, abs=1)
+
+
+def test_make_filter_specs():
+    assert make_filter(None) is None
+    assert isinstance(make_filter({'type': 'mean', 'window': 2}), RunningMean)
+    with pytest.raises(ValueError):
+        make_filter({'type': 'median'})
+
+
+def test_counter_filter_overrides_reach_strategies():
+    counter = ExerciseCounter({'bicep-curl': {'left_elbow': {'type': 'ema', 'alpha': 0.5}}})
+    curl = counter.strategies['bicep-curl']
+    assert isinstance(curl.filters['left_elbow'], EMA) and 'right_elbow' not in curl.filters
+    # Defaults of other exercises are untouched
+    assert isinstance(counter.strategies['shoulder-flexion'].filters['left_elbow'], RunningMean)
+    curl.filters['left_elbow'].update(120.0)
+    counter.reset_state('bicep-curl')
+    assert curl.filters['left_elbow'].value is None
+
+
+class _BranchingKneeRaise:
+    """Reference: the hand-written knee-raise state machine the spec replaces."""
+
+    def __init__(self):
+        self.state, self.counter, self.pair_valid = 0, 0, True
+        self.recent = {'left': [], 'right': []}
+
+    def process(self, angles):
+        for side in ('left', 'right'):
+            if angles[f'{side}_knee_angle'] is not None:
+                self.recent[side] = (self.recent[side] + [angles[f'{side}_knee_angle']])[-2:]
+        left = (sum(self.recent['left']) / len(self.recent['left']) if self.recent['left'] else None) or angles['left_knee_angle']
+        right = (sum(self.recent['right']) / len(self.recent['right']) if self.recent['right'] else None) or angles['right_knee_angle']
+        lf, rf = angles['left_flexion_angle'], angles['right_flexion_angle']
+        if left is None or right is None or lf is None or rf is None:
+            return self.state
+        leg, arm = (left, rf) if left < right else (right, lf)
+        if self.state == 0 and leg > 150 and arm < 30:
+            self.state = 1
+        elif self.state == 1 and leg < 140 and arm > 80:
+            self.state = 2
+        elif self.state == 2 and leg > 150 and arm < 30:
+            self.counter += 1
+            self.state = 0
+        return self.state
+
+
+def test_knee_raise_spec_matches_branching_reference():
+    rng = random.Random(17)
+    strategy, reference = KneeRaiseStrategy(), _BranchingKneeRaise()
+    for _ in range(3000):
+        angles = {key: (None if rng.random() < 0.1 else rng.uniform(0, 180))
+                  for key in ('left_knee_angle', 'right_knee_angle', 'left_flexion_angle', 'right_flexion_angle')}
+        state, _ = strategy.process([], angles)
+        assert state == reference.process(angles)
+    assert strategy.counter == reference.counter > 0
+
+
+ELBOW_EXTENSION = {
+    "exercise": "elbow-extension",
+    "states": ["IDLE", "BENT", "EXTENDED"],
+    "params": {"bent": 70, "extended": 160},
+    "inputs": {"elbow": {"angle": "left_elbow_angle", "filter": {"type": "ema", "alpha": 1.0}}},
+    "require": ["elbow"],
+    "transitions": [
+        {"from": "IDLE", "to": "BENT", "when": {"elbow": ["<", "bent"]}, "do": ["start_rep"]},
+        {"from": "BENT", "to": "EXTENDED", "when": {"elbow": [">", "extended"]}, "min_duration": 0.5,
+         "too_fast": {"message": "Slower", "priority": "HIGH"}},
+        {"from": "EXTENDED", "to": "BENT", "when": {"elbow": ["<", "bent"]}, "do": ["count_rep", "start_rep"]},
+    ],
+    "feedback": [{"states": ["EXTENDED"], "when": {"elbow": [">=", 100]}, "message": "Now bend"}],
+}
+
+
+def test_exercise_defined_as_data():
+    strategy = SpecStrategy(compile_spec(ELBOW_EXTENSION))
+    for t, elbow in enumerate([170, 60, 165, 60, 165, 60]):
+        strategy.process([], {'left_elbow_angle': elbow}, timestamp=float(t))
+    assert strategy.counter == 2 and strategy.state_name == "BENT"
+
+    # An extension faster than min_duration voids the rep and says so
+    state, feedback = strategy.process([], {'left_elbow_angle': 165}, timestamp=5.1)
+    assert feedback == ["Slower"]
+    strategy.process([], {'left_elbow_angle': 60}, timestamp=6.0)
+    assert strategy.counter == 2
+
+    strategy.set_param("extended", 120)
+    strategy.process([], {'left_elbow_angle': 130}, timestamp=7.0)
+    assert strategy.state_name == "EXTENDED"
+    assert strategy.process([], {'left_elbow_angle': 130}, timestamp=8.0)[1] == ["Now bend"]
+
+
+def test_spec_compiler_rejects_unknown_names():
+    bad = dict(ELBOW_EXTENSION, transitions=[{"from": "IDLE", "to": "UP", "when": {"elbow": ["<", 1]}}])
+    with pytest.raises(ValueError):
+        compile_spec(bad)
+
+
+def test_squat_features_match_scalar_calculator():
+    rng = random.Random(19)
+    for _ in range(100):
+        lm = [Landmark(rng.random(), rng.random(), rng.random(), rng.choice([0.3, 0.65, 0.9])) for _ in range(33)]
+        angles = calculate_all_angles(lm, SquatStrategy.REQUIRED_ANGLES)
+        assert angles.keys() == SquatStrategy.REQUIRED_ANGLES
+        for key, (a, b, c), vt in (
+            ('left_knee_angle_strict', (23, 25, 27), 0.7), ('right_knee_angle_strict', (24, 26, 28), 0.7),
+            ('left_hip_angle', (11, 23, 25), 0.6), ('right_hip_angle', (12, 24, 26), 0.6),
+        ):
+            if all(lm[i].visibility > vt for i in (a, b, c)):
+                assert angles[key] == pytest.approx(AngleCalculator.calculate_angle(lm[a], lm[b], lm[c]))
+            else:
+                assert angles[key] is None
+
+
+def test_frame_angles_are_memoized_per_frame():
+    frame = LandmarkFrame(np.random.default_rng(21).random((33, 4)))
+    bicep = frame_angles(frame, ('left_bicep_angle', 'hip_shoulder_angle'))
+    assert set(frame.angle_cache) == {'left_bicep_angle', 'hip_shoulder_angle'}
+    full = frame_angles(frame)
+    assert list(full) == list(DEFAULT_FEATURES)
+    assert full['left_bicep_angle'] == bicep['left_bicep_angle']
+    assert full == calculate_all_angles(frame.array)
+
+
+def test_squat_uses_kernel_features_like_scalar_fallback():
+    rng = np.random.default_rng(23)
+    with_features, fallback = SquatStrategy(), SquatStrategy()
+    for t in range(500):
+        array = rng.random((33, 4))
+        array[:, 3] = rng.choice([0.5, 0.95], 33)
+        frame = LandmarkFrame(array)
+        assert with_features.process(frame, calculate_all_angles(frame, SquatStrategy.REQUIRED_ANGLES), t * 0.1) == \
+            fallback.process(frame, calculate_all_angles(array), t * 0.1)
+
+
+def test_tracker_keeps_people_apart_across_frames():
+    tracker = MultiPersonTracker()
+    rng = random.Random(29)
+    ids = {}
+    for t, angle in enumerate([0, 20, 150, 60, 10]):
+        # Left person does a rep, right person stands still; request order varies
+        people = [(-0.3, angle), (0.3, 0)]
+        rng.shuffle(people)
+        results = tracker.process("shoulder-flexion", [LandmarkFrame(_flexion_frame(a, dx)) for dx, a in people], t)
+        for r in results:
+            ids.setdefault(people[r.index][0], set()).add(r.track_id)
+    assert ids[-0.3] != ids[0.3] and len(ids[-0.3]) == len(ids[0.3]) == 1
+    counts = {tr.track_id: tr.counter.count("shoulder-flexion") for tr in tracker.tracks}
+    assert counts == {next(iter(ids[-0.3])): 1, next(iter(ids[0.3])): 0}
+
+
+def test_tracker_drops_lost_tracks_and_caps_people():
+    tracker = MultiPersonTracker(max_tracks=2, max_missed=1)
+    frames = [LandmarkFrame(_flexion_frame(0, dx)) for dx in (-0.3, 0.0, 0.3)]
+    assert [r.track_id for r in tracker.process("squat", frames)] == [1, 2]
+    tracker.process("squat", [])
+    tracker.process("squat", [])
+    assert tracker.tracks == []
+    assert [r.track_id for r in tracker.process("squat", frames[:1])] == [3]
+
+
+def test_pose_executor_keeps_sessions_on_their_worker_process():
+    recording = synthetic_flexion_recording(reps=2)
+    frames = [(float(t), frame) for t, frame in zip(recording.timestamps, recording.frames)]
+    half = len(frames) // 2
+    executor = PoseExecutor(workers=2)
+
+    async def run():
+        results = {}
+        for key in ("session:a", "session:b"):
+            # Two calls per session: the second must see the state left by the first
+            await executor.run(key, pose_service.process_batch, key, "shoulder-flexion", frames[:half])
+            batch = await executor.run(key, pose_service.process_batch, key, "shoulder-flexion", frames[half:])
+            results[key] = batch["final"]["shoulder_flexion_count"]
+        with pytest.raises(pose_service.PoseError) as error:
+            await executor.run("session:a", pose_service.process_frame, "session:a", "squat", np.zeros((10, 4)))
+        assert error.value.status_code == 400
+        return results
+
+    try:
+        assert asyncio.run(run()) == {"session:a": 2, "session:b": 2}
+    finally:
+        executor.shutdown()
+    assert executor.worker_index("session:a") == PoseExecutor(workers=2).worker_index("session:a")
+    # State lives in the workers, not in this process
+    assert "session:a" not in pose_service.SESSION_REGISTRY
+
+
+def test_rep_tracker_splits_phases_at_the_peak():
+    # Squat: down to the deepest knee angle (eccentric), then up (concentric)
+    tracker = RepTracker(peak='min', concentric_first=False)
+    tracker.start(10.0)
+    for t, angle in [(10.0, 170), (11.0, 120), (12.5, 80), (13.0, 120), (13.5, 170)]:
+        tracker.sample(angle, t)
+    event = tracker.finish(13.5, rep_index=1, valid=True, feedback=["Lean forward"])
+    assert (event.min_angle, event.max_angle) == (80, 170)
+    assert (event.eccentric_s, event.concentric_s) == (2.5, 1.0)
+    assert event.feedback == ("Lean forward",)
+    assert tracker.finish(14.0, 1, True, []) is None
+    assert accuracy([event, event._replace(valid=False)]) == 50.0
+    assert accuracy([]) is None
+
+
+def test_calibration_only_loosens_thresholds():
+    strategy = ExerciseCounter().strategies['bicep-curl']
+    strategy.start_calibration()
+    for angle in [100 + 70 * abs(math.sin(i / 5)) for i in range(60)]:
+        strategy._sample_rep(angle, 0.0)
+    result = strategy.finish_calibration()
+    thresholds = result["thresholds"]
+    # Curling only down to ~100 degrees: the "up" thresholds rise, the "down" ones stay put
+    assert thresholds['curl_up_threshold'] > 100
+    assert thresholds['curl_down_threshold'] == 162
+    assert strategy.curl_up_threshold == thresholds['curl_up_threshold']
+    assert strategy.thresholds['bicep_curl_not_high_enough'] == thresholds['bicep_curl_not_high_enough']
+
+    knee_raise = ExerciseCounter().strategies['knee-raise']
+    knee_raise.apply_thresholds({'raise_leg': 155.0, 'unknown': 1.0})
+    assert knee_raise.get_threshold('raise_leg') == 155.0
+
+
+def test_frame_gate_only_watches_the_exercise_landmarks():
+    gate = FrameGate(ExerciseCounter().required_angles('squat'))
+    frame = _flexion_frame(90)
+    # Arm landmarks are visible but a squat needs legs or hips
+    assert not gate.admit(frame)
+    frame[[11, 23, 25, 27]] = [(0.5, 0.3, 0, 0.9), (0.5, 0.6, 0, 0.9), (0.5, 0.75, 0, 0.9), (0.5, 0.9, 0, 0.9)]
+    assert gate.admit(frame)
+    still = frame.copy()
+    still[[13, 15], :2] += 0.1  # arm movement is not squat movement
+    assert not gate.admit(still)
+    moved = frame.copy()
+    moved[25, 0] += 0.01
+    assert gate.admit(moved)
+    assert gate.stats() == {"frames": 4, "skipped_low_confidence": 1, "skipped_duplicate": 1, "skip_ratio": 0.5}
+
+
+def test_stage_metrics_merge_into_percentiles(monkeypatch):
+    histogram = Histogram()
+    for ns in [500, 3_000, 3_500, 900_000]:
+        histogram.observe(ns)
+    # Buckets are log2 microseconds: <1 us, [2, 4) us, [512, 1024) us
+    assert histogram.summary() == {
+        "count": 4, "mean_us": 226.75, "p50_us": 4.0, "p90_us": 1024.0, "p99_us": 1024.0, "max_us": 900.0,
+    }
+    worker = StageMetrics(enabled=True)
+    worker.observe("angles", 3_000)
+    merged = summarize([{"angles": histogram.raw()}, worker.raw()])
+    assert merged["angles"]["count"] == 5
+
+    # Disabled (the default) the pipeline records nothing
+    monkeypatch.setattr(METRICS, "enabled", False)
+    METRICS.reset()
+    pose_service.process_frame("metrics:test", "squat", _flexion_frame(90))
+    assert pose_service.metrics_snapshot() == {}
+    monkeypatch.setattr(METRICS, "enabled", True)
+    pose_service.process_frame("metrics:test", "shoulder-flexion", _flexion_frame(90))
+    assert {"gate", "angles", "strategy", "response"} <= set(pose_service.metrics_snapshot())
+    METRICS.reset()
+    pose_service.end_session("metrics:test")
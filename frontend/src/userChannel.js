@@ -0,0 +1,79 @@
+import { API_BASE_URL } from './config'
+
+// Close codes after which reconnecting cannot help (bad or missing token)
+const AUTH_CLOSE_CODES = [4001, 4003]
+
+// One socket per tab, shared by every subscriber (header badge, chat windows)
+const listeners = new Set()
+let socket = null
+let retries = 0
+let retryTimer = null
+
+function channelUrl() {
+  const token = localStorage.getItem('token')
+  const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:'
+  const host = API_BASE_URL.startsWith('/')
+    ? `${window.location.host}${API_BASE_URL}`
+    : API_BASE_URL.replace('http://', '').replace('https://', '')
+  return `${protocol}//${host}/ws/user?token=${token}`
+}
+
+function connect() {
+  retryTimer = null
+  const current = new WebSocket(channelUrl())
+  socket = current
+
+  current.onopen = () => {
+    if (retries > 0) {
+      for (const listener of listeners) {
+        if (listener.onReconnect) listener.onReconnect()
+      }
+    }
+    retries = 0
+  }
+
+  current.onmessage = (e) => {
+    let event
+    try {
+      event = JSON.parse(e.data)
+    } catch (err) {
+      console.error('User channel event error:', err)
+      return
+    }
+    for (const listener of listeners) listener.onEvent(event)
+  }
+
+  current.onclose = (e) => {
+    if (socket !== current) return
+    socket = null
+    if (!listeners.size || AUTH_CLOSE_CODES.includes(e.code)) return
+    retries += 1
+    retryTimer = setTimeout(connect, Math.min(30000, 1000 * 2 ** Math.min(retries, 5)))
+  }
+}
+
+/**
+ * Subscribe to the signed-in user's push channel (/api/ws/user).
+ *
+ * `onEvent` receives every event ({ type, ... }); `onReconnect` runs after
+ * the socket comes back from a drop, so the caller can catch up over REST.
+ * Returns a function that unsubscribes; the socket closes with the last one.
+ */
+export function openUserChannel(onEvent, onReconnect) {
+  const listener = { onEvent, onReconnect }
+  listeners.add(listener)
+  if (!socket && !retryTimer) connect()
+
+  return () => {
+    listeners.delete(listener)
+    if (listeners.size) return
+    clearTimeout(retryTimer)
+    retryTimer = null
+    retries = 0
+    if (socket) {
+      const current = socket
+      socket = null
+      current.close()
+    }
+  }
+}